@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""ap_led_indicator.py
+Setup-mode (AP) LED indicator daemon.
+
+Blinks the red LED while the setup access point is up. The blink is a
+pigpio wave replayed by the DMA engine, so it takes no CPU and no process
+spawns once started. Instead of polling `systemctl is-active hostapd`, the
+daemon attaches to hostapd's control socket and reacts to its events; the
+LED stops when hostapd goes away and resumes if it comes back (the
+portal's fallback scan restarts it).
+
+Stop it from the portal (or anywhere) with:
+    python3 ap_led_indicator.py --stop
+which sends "stop" over CONTROL_SOCKET. The PID is also written to
+PID_FILE, so killing that PID still works as before.
+"""
+
+import argparse
+import json
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+log = logging.getLogger("ap_led_indicator")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+LED_PIN = 22                     # Red LED (30-minute alert), as boot_decider.sh used
+LED_OFF_PINS = (12,)             # West LED held off while blinking
+BLINK_PERIOD_US = 1_000_000      # 0.5 s on, 0.5 s off
+
+HOSTAPD_CTRL = "/var/run/hostapd/wlan0"  # hostapd ctrl_interface socket for wlan0
+CLIENT_SOCKET = "/tmp/piess_ap_led_hostapd"
+CONTROL_SOCKET = "/tmp/piess_ap_led.sock"
+PID_FILE = "/tmp/piess_ap_led.pid"
+
+PING_INTERVAL = 10               # Seconds between hostapd liveness checks
+AP_GONE_EXIT = 300               # Exit after hostapd has been gone this long (seconds)
+
+
+class HostapdMonitor:
+    """Attached client on hostapd's control socket."""
+
+    def __init__(self, ctrl_path: str = HOSTAPD_CTRL, client_path: str = CLIENT_SOCKET):
+        self.ctrl_path = ctrl_path
+        self.client_path = client_path
+        self.sock = None
+
+    def attach(self) -> bool:
+        """Connect and ATTACH for events. Returns False if hostapd isn't there."""
+        self.close()
+        try:
+            if os.path.exists(self.client_path):
+                os.unlink(self.client_path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(self.client_path)
+            sock.connect(self.ctrl_path)
+            sock.settimeout(2)
+            sock.send(b"ATTACH")
+            if sock.recv(4096).strip() != b"OK":
+                sock.close()
+                return False
+        except OSError:
+            return False
+        self.sock = sock
+        return True
+
+    def ping(self) -> bool:
+        """Send PING; the PONG (and any events) arrive through read_events()."""
+        try:
+            self.sock.send(b"PING")
+            return True
+        except (OSError, AttributeError):
+            return False
+
+    def read_events(self) -> list:
+        """Drain pending messages. Events look like '<3>AP-DISABLED'."""
+        messages = []
+        while True:
+            try:
+                data = self.sock.recv(4096, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                return messages
+            except OSError:
+                messages.append("DISCONNECTED")
+                return messages
+            text = data.decode(errors="replace").strip()
+            messages.append(text[3:] if text.startswith("<") else text)
+
+    def close(self) -> None:
+        if self.sock is not None:
+            try:
+                self.sock.send(b"DETACH")
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+        if os.path.exists(self.client_path):
+            try:
+                os.unlink(self.client_path)
+            except OSError:
+                pass
+
+
+class Blinker:
+    """Hardware-timed blink of one pin using a repeating pigpio wave."""
+
+    def __init__(self, pi, pin: int = LED_PIN, period_us: int = BLINK_PERIOD_US):
+        self.pi = pi
+        self.pin = pin
+        self.period_us = period_us
+        self.wave_id = None
+
+    @property
+    def running(self) -> bool:
+        return self.wave_id is not None
+
+    def start(self) -> None:
+        import pigpio
+
+        if self.running:
+            return
+        for pin in (self.pin,) + LED_OFF_PINS:
+            self.pi.set_mode(pin, pigpio.OUTPUT)
+        for pin in LED_OFF_PINS:
+            self.pi.write(pin, 0)
+        half = self.period_us // 2
+        self.pi.wave_clear()
+        self.pi.wave_add_generic([
+            pigpio.pulse(1 << self.pin, 0, half),
+            pigpio.pulse(0, 1 << self.pin, half),
+        ])
+        self.wave_id = self.pi.wave_create()
+        self.pi.wave_send_repeat(self.wave_id)
+        log.info(f"Blinking GPIO {self.pin}")
+
+    def stop(self) -> None:
+        if self.running:
+            self.pi.wave_tx_stop()
+            self.pi.wave_delete(self.wave_id)
+            self.wave_id = None
+        self.pi.write(self.pin, 0)
+
+
+def _open_control_socket(path: str = CONTROL_SOCKET):
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    os.chmod(path, 0o666)  # The portal runs as the piess user
+    server.listen(2)
+    return server
+
+
+def run() -> int:
+    # Imported here so the portal can use send_command() without pigpio
+    import pigpio
+
+    pi = pigpio.pi()
+    if not pi.connected:
+        log.error("Could not connect to pigpio. Run 'sudo pigpiod'.")
+        return 1
+
+    blinker = Blinker(pi)
+    hostapd = HostapdMonitor()
+    control = _open_control_socket()
+    with open(PID_FILE, "w") as f:
+        f.write(str(os.getpid()))
+
+    stopping = []
+
+    def terminate(signum, frame):
+        # Raise so a blocked select() returns at once rather than at its timeout
+        stopping.append(signal.Signals(signum).name)
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGINT, terminate)
+
+    ap_gone_since = None
+    last_ping = 0.0
+    try:
+        while not stopping:
+            now = time.monotonic()
+
+            if hostapd.sock is None and hostapd.attach():
+                log.info("Attached to hostapd")
+                ap_gone_since = None
+                blinker.start()
+            elif hostapd.sock is not None and now - last_ping >= PING_INTERVAL:
+                last_ping = now
+                if not hostapd.ping():
+                    hostapd.close()
+
+            if hostapd.sock is None:
+                if blinker.running:
+                    blinker.stop()
+                ap_gone_since = ap_gone_since or now
+                if now - ap_gone_since > AP_GONE_EXIT:
+                    log.info("hostapd gone, AP mode has ended")
+                    break
+
+            watched = [control] + ([hostapd.sock] if hostapd.sock else [])
+            # Without hostapd there is nothing to wake us, so retry attach every few seconds
+            timeout = PING_INTERVAL if hostapd.sock else 2
+            ready, _, _ = select.select(watched, [], [], timeout)
+
+            if hostapd.sock in ready:
+                for event in hostapd.read_events():
+                    if event.startswith(("CTRL-EVENT-TERMINATING", "DISCONNECTED")):
+                        log.info(f"hostapd event {event}, pausing indicator")
+                        hostapd.close()
+                        blinker.stop()
+                        break
+                    elif event.startswith("AP-DISABLED"):
+                        blinker.stop()
+                    elif event.startswith("AP-ENABLED"):
+                        blinker.start()
+
+            if control in ready:
+                conn, _ = control.accept()
+                with conn:
+                    conn.settimeout(1)
+                    try:
+                        command = conn.recv(64).decode(errors="replace").strip()
+                    except OSError:
+                        command = ""
+                    if command == "stop":
+                        conn.sendall(b"OK\n")
+                        stopping.append("stop command")
+                    elif command == "status":
+                        conn.sendall((json.dumps({
+                            "pid": os.getpid(),
+                            "blinking": blinker.running,
+                            "hostapd": hostapd.sock is not None,
+                        }) + "\n").encode())
+                    else:
+                        conn.sendall(b"ERR unknown command\n")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        blinker.stop()
+        hostapd.close()
+        control.close()
+        for path in (CONTROL_SOCKET, PID_FILE):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        pi.stop()
+        log.info(f"Stopped ({stopping[0] if stopping else 'AP ended'})")
+    return 0
+
+
+def send_command(command: str, path: str = CONTROL_SOCKET, timeout: float = 3):
+    """Send a command to a running indicator. Returns the reply, or None."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(command.encode())
+            return sock.recv(4096).decode(errors="replace").strip()
+    except OSError:
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="PieSS setup-mode LED indicator")
+    parser.add_argument("--stop", action="store_true", help="stop the running indicator")
+    parser.add_argument("--status", action="store_true", help="show the running indicator's state")
+    args = parser.parse_args()
+
+    if args.stop or args.status:
+        reply = send_command("stop" if args.stop else "status")
+        print(reply or "Indicator not running")
+        return 0 if reply else 1
+
+    logging.basicConfig(level=logging.INFO, format="[ap_led_indicator] %(message)s")
+    return run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
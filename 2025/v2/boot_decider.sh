@@ -11,10 +11,33 @@ fi
 
 echo "[boot_decider] Starting boot decision process..."
 
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+# Record a boot stage in /tmp/piess_boot_timeline.jsonl (never fails the boot)
+timeline() {
+    python3 "$SCRIPT_DIR/boot_timeline.py" mark "$@" 2>/dev/null || true
+}
+timeline decider_start
+
 # LED GPIO pins
-LED_30M_PIN=22  # Red LED
 LED_W_PIN=12    # West LED (for AP mode indicator)
 
+# Scan results handed to wifi_portal.py (nmcli terse format)
+SCAN_SNAPSHOT=/tmp/piess_scan_snapshot.txt
+
+# Captive-portal wildcard DNS for the setup AP, and the portal's port
+CAPTIVE_DNS_CONF=/etc/dnsmasq.d/piess-captive.conf
+PORTAL_PORT=8080
+
+# Send phones' port 80 connectivity probes to the portal (idempotent)
+captive_redirect() {
+    local action=$1  # -A to add, -D to remove
+    if [[ "$action" == "-A" ]] && iptables -t nat -C PREROUTING -i wlan0 -p tcp --dport 80 -j REDIRECT --to-ports $PORTAL_PORT 2>/dev/null; then
+        return 0
+    fi
+    iptables -t nat $action PREROUTING -i wlan0 -p tcp --dport 80 -j REDIRECT --to-ports $PORTAL_PORT 2>/dev/null || true
+}
+
 # Function to control GPIO
 gpio_export() {
     local pin=$1
@@ -37,9 +60,12 @@ gpio_cleanup() {
     echo $pin > /sys/class/gpio/unexport 2>/dev/null || true
 }
 
-# Give NetworkManager time to initialize and attempt connections
-echo "[boot_decider] Waiting for NetworkManager to settle (20s)..."
-sleep 20
+# Try to get online: wait for NetworkManager's autoconnect while actively
+# bringing up the best visible known networks. Exits 0 (online) or 1 (not)
+# as soon as the outcome is clear, at most 30s
+echo "[boot_decider] Connecting to known networks (up to 30s)..."
+ORCHESTRATOR_RC=0
+python3 "$SCRIPT_DIR/boot_orchestrator.py" --deadline 30 || ORCHESTRATOR_RC=$?
 
 # Check network connectivity
 STATUS=$(nmcli -t -f STATE,CONNECTIVITY general)
@@ -49,13 +75,29 @@ echo "[boot_decider] Network status: $STATUS"
 STATE=$(echo "$STATUS" | cut -d: -f1)
 CONNECTIVITY=$(echo "$STATUS" | cut -d: -f2)
 
-if [[ "$CONNECTIVITY" == "full" || "$CONNECTIVITY" == "limited" ]]; then
+# Any other exit status means the orchestrator itself failed; fall back to
+# NetworkManager's own verdict
+if [[ $ORCHESTRATOR_RC -eq 0 ]]; then
+    ONLINE=yes
+elif [[ $ORCHESTRATOR_RC -eq 1 ]]; then
+    ONLINE=no
+elif [[ "$CONNECTIVITY" == "full" || "$CONNECTIVITY" == "limited" ]]; then
+    ONLINE=yes
+else
+    ONLINE=no
+fi
+
+if [[ "$ONLINE" == "yes" ]]; then
     echo "[boot_decider] Internet available - starting ISS tracker"
+    timeline decision_made --detail tracker
     
     # Ensure AP services are stopped
     systemctl stop hostapd 2>/dev/null || true
     systemctl stop dnsmasq 2>/dev/null || true
     systemctl stop wifi_portal 2>/dev/null || true
+    systemctl stop ap_led_indicator 2>/dev/null || true
+    captive_redirect -D
+    rm -f "$CAPTIVE_DNS_CONF"
     
     # Make sure AP mode indicator LED is off
     gpio_export $LED_W_PIN
@@ -66,6 +108,7 @@ if [[ "$CONNECTIVITY" == "full" || "$CONNECTIVITY" == "limited" ]]; then
     
 else
     echo "[boot_decider] No internet - starting WiFi configuration portal"
+    timeline decision_made --detail portal
     
     # Ensure ISS tracker is stopped
     systemctl stop iss_tracker 2>/dev/null || true
@@ -73,6 +116,18 @@ else
     # Enable WiFi radio
     nmcli radio wifi on
     
+    # Take a full scan while wlan0 is still in client mode, so the portal's
+    # first page already lists nearby networks
+    echo "[boot_decider] Scanning networks before starting AP mode..."
+    if timeout 20 nmcli -t -f IN-USE,SSID,SIGNAL,SECURITY dev wifi list --rescan yes > "${SCAN_SNAPSHOT}.tmp" 2>/dev/null; then
+        mv "${SCAN_SNAPSHOT}.tmp" "$SCAN_SNAPSHOT"
+        chmod 644 "$SCAN_SNAPSHOT"
+        echo "[boot_decider] Saved $(wc -l < "$SCAN_SNAPSHOT") networks to $SCAN_SNAPSHOT"
+    else
+        rm -f "${SCAN_SNAPSHOT}.tmp"
+        echo "[boot_decider] WARNING: pre-AP scan failed, portal will start with an empty list"
+    fi
+    
     # Configure wlan0 for AP mode - MUST happen before starting services
     echo "[boot_decider] Configuring wlan0 interface..."
     ip link set wlan0 down 2>/dev/null || true
@@ -89,6 +144,12 @@ else
         echo "[boot_decider] WARNING: wlan0 IP not set correctly!"
     fi
     
+    # Resolve every name to the Pi and send port 80 to the portal, so phones'
+    # captive-portal probes open the setup page as soon as they join
+    echo "[boot_decider] Enabling captive-portal redirect..."
+    python3 "$SCRIPT_DIR/captive_portal.py" --dnsmasq > "$CAPTIVE_DNS_CONF" || rm -f "$CAPTIVE_DNS_CONF"
+    captive_redirect -A
+    
     # Start dnsmasq first (needs IP to be set)
     echo "[boot_decider] Starting dnsmasq..."
     systemctl start dnsmasq
@@ -97,6 +158,7 @@ else
     # Then start hostapd
     echo "[boot_decider] Starting hostapd..."
     systemctl start hostapd
+    timeline ap_up
     sleep 2
     
     # Finally start web portal
@@ -105,37 +167,10 @@ else
     
     echo "[boot_decider] WiFi portal started at http://192.168.4.1:8080"
     
-    # Start AP mode indicator LED (blinking red West LED)
+    # Start AP mode indicator LED (blinking red LED). The daemon blinks it
+    # with a hardware-timed pigpio wave and follows hostapd's control socket
     echo "[boot_decider] Starting AP mode LED indicator..."
-    gpio_export $LED_30M_PIN
-    gpio_export $LED_W_PIN
-    
-    # Create LED blink script in background
-    (
-        while true; do
-            # Check if we're still in AP mode (hostapd running)
-            if ! systemctl is-active --quiet hostapd; then
-                # AP mode ended, turn off LED and exit
-                gpio_cleanup $LED_30M_PIN
-                gpio_cleanup $LED_W_PIN
-                exit 0
-            fi
-            
-            # Blink pattern: Red LED on West position
-            # 0.5 seconds on, 0.5 seconds off = urgent indication
-            gpio_set $LED_30M_PIN 1  # Red LED on
-            gpio_set $LED_W_PIN 0
-            sleep 0.5
-            
-            gpio_set $LED_30M_PIN 0  # Red LED off
-            sleep 0.5
-        done
-    ) &
-    
-    # Store the background process PID
-    LED_BLINK_PID=$!
-    echo $LED_BLINK_PID > /tmp/piess_ap_led.pid
-    echo "[boot_decider] AP mode LED indicator started (PID: $LED_BLINK_PID)"
+    systemctl start ap_led_indicator || echo "[boot_decider] WARNING: AP LED indicator failed to start"
 fi
 
 echo "[boot_decider] Boot decision complete"
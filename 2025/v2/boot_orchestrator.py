@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""boot_orchestrator.py
+Get PieSS online at boot before falling back to setup (AP) mode.
+
+While one thread waits for NetworkManager to report connectivity (its own
+autoconnect often gets there first), the main thread works through the
+known networks that are visible right now, best ranked first, and
+activates their saved NetworkManager profiles. Whichever gets online first
+wins; if nothing does by the deadline, boot_decider.sh starts the portal.
+
+Standard library only, run by boot_decider.sh as root:
+    python3 boot_orchestrator.py --deadline 30
+
+Exit status: 0 online, 1 not online (start AP mode).
+"""
+
+import argparse
+import subprocess
+import sys
+import threading
+import time
+
+import known_networks
+import nm_monitor
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+WIFI_IFACE = "wlan0"
+BOOT_DEADLINE = 30         # Seconds before giving up and starting AP mode
+RADIO_WAIT = 8             # Longest wait for wlan0 to become usable (seconds)
+ATTEMPT_TIMEOUT = 15       # Longest single `nmcli connection up` (seconds)
+MAX_ATTEMPTS = 3           # Known networks tried per boot
+ONLINE_SETTLE = 5          # Connectivity check after an activation succeeds (seconds)
+
+NMCLI = nm_monitor.NMCLI
+
+
+def log(message: str) -> None:
+    print(f"[boot_orchestrator] {message}", flush=True)
+
+
+class BootTimer:
+    """Seconds since the orchestrator started, recorded per step."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.steps = []
+
+    def mark(self, step: str) -> float:
+        elapsed = time.monotonic() - self.started
+        self.steps.append((step, elapsed))
+        return elapsed
+
+    def summary(self) -> str:
+        return ", ".join(f"{step} {elapsed:.1f}s" for step, elapsed in self.steps)
+
+
+def _nmcli(args, timeout: float):
+    try:
+        result = subprocess.run(NMCLI + args, capture_output=True, text=True, timeout=timeout)
+        return result.returncode, result.stdout.strip(), result.stderr.strip()
+    except (OSError, subprocess.TimeoutExpired) as exc:
+        return 1, "", str(exc)
+
+
+def saved_profiles() -> set:
+    """Names of NetworkManager's saved Wi-Fi connection profiles."""
+    _, out, _ = _nmcli(["-t", "-f", "NAME,TYPE", "connection", "show"], timeout=5)
+    profiles = set()
+    for line in out.splitlines():
+        name, _, kind = line.rpartition(":")
+        if kind == "802-11-wireless":
+            profiles.add(name.replace("\\:", ":"))
+    return profiles
+
+
+def visible_ssids() -> set:
+    """SSIDs in range, using NetworkManager's scan list (rescanning if stale)."""
+    _, out, _ = _nmcli(["-t", "-f", "SSID", "dev", "wifi", "list", "--rescan", "auto"], timeout=15)
+    return {line.replace("\\:", ":") for line in out.splitlines() if line}
+
+
+def candidates() -> list:
+    """Known networks that are both visible and have a saved profile, best first."""
+    history = known_networks.load()
+    if not history:
+        return []
+    usable = saved_profiles() & visible_ssids()
+    return [ssid for ssid in known_networks.ranked(history) if ssid in usable]
+
+
+def try_known_networks(online: threading.Event, deadline: float, timer: BootTimer):
+    """Activate visible known networks in rank order. Returns the SSID that worked."""
+    nm_monitor.wait_for_device_state(
+        WIFI_IFACE, states=("disconnected", "connected"), timeout=RADIO_WAIT, nmcli=NMCLI)
+    if online.is_set():
+        return None
+
+    # NetworkManager may already be joining something on its own; let it finish
+    if nm_monitor.device_state(WIFI_IFACE, NMCLI).startswith("connecting"):
+        log("NetworkManager is already connecting, waiting for it")
+        nm_monitor.wait_for_device_state(
+            WIFI_IFACE, timeout=min(ATTEMPT_TIMEOUT, deadline - time.monotonic()), nmcli=NMCLI)
+        if online.is_set() or nm_monitor.device_state(WIFI_IFACE, NMCLI) == "connected":
+            return None
+
+    networks = candidates()
+    timer.mark("candidates")
+    log(f"Visible known networks: {networks or 'none'}")
+
+    for ssid in networks[:MAX_ATTEMPTS]:
+        remaining = deadline - time.monotonic()
+        if online.is_set() or remaining < 3:
+            break
+        wait = int(min(ATTEMPT_TIMEOUT, remaining))
+        log(f"Trying '{ssid}' (up to {wait}s)...")
+        started = time.monotonic()
+        rc, _, err = _nmcli(["--wait", str(wait), "connection", "up", "id", ssid,
+                             "ifname", WIFI_IFACE], timeout=wait + 5)
+        elapsed = time.monotonic() - started
+        if rc == 0:
+            log(f"Connected to '{ssid}' in {elapsed:.1f}s")
+            known_networks.record_success(ssid, elapsed, source="boot")
+            return ssid
+        log(f"'{ssid}' failed after {elapsed:.1f}s: {err}")
+        known_networks.record_failure(ssid)
+    return None
+
+
+def orchestrate(deadline_seconds: float = BOOT_DEADLINE) -> bool:
+    """Return True once the Pi is online, False if the deadline passes first."""
+    timer = BootTimer()
+    deadline = timer.started + deadline_seconds
+    online = threading.Event()
+
+    def probe():
+        if nm_monitor.wait_for_connectivity(timeout=deadline_seconds, nmcli=NMCLI):
+            online.set()
+
+    prober = threading.Thread(target=probe, name="connectivity-probe", daemon=True)
+    prober.start()
+
+    joined = try_known_networks(online, deadline, timer)
+    if joined and not online.is_set():
+        timer.mark(f"joined {joined}")
+        # Associated; give NetworkManager a moment to confirm connectivity
+        settle = min(ONLINE_SETTLE, max(0.0, deadline - time.monotonic()))
+        if nm_monitor.wait_for_connectivity(timeout=settle, nmcli=NMCLI):
+            online.set()
+
+    online.wait(max(0.0, deadline - time.monotonic()))
+    timer.mark("online" if online.is_set() else "deadline")
+    log(f"Timings: {timer.summary()}")
+    return online.is_set()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Connect to a known network at boot")
+    parser.add_argument("--deadline", type=float, default=BOOT_DEADLINE,
+                        help="seconds before giving up (default %(default)s)")
+    args = parser.parse_args()
+
+    ok = orchestrate(args.deadline)
+    log("Online" if ok else "No connectivity, AP mode needed")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""boot_timeline.py
+Shared record of where boot time goes.
+
+Each boot stage (in boot_decider.sh, the portal and the tracker) appends
+one JSON line to TIMELINE_FILE with the CLOCK_BOOTTIME and monotonic
+clocks, which every process on the Pi shares, plus the kernel boot ID so
+lines from an earlier boot are never mixed in.
+
+Standard library only:
+    python3 boot_timeline.py mark decision_made --detail tracker
+    python3 boot_timeline.py report
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+log = logging.getLogger("boot_timeline")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+TIMELINE_FILE = os.environ.get("PIESS_BOOT_TIMELINE", "/tmp/piess_boot_timeline.jsonl")
+BOOT_ID_FILE = "/proc/sys/kernel/random/boot_id"
+
+# Stages in the order they normally happen, for the report
+STAGES = (
+    "decider_start",
+    "decision_made",
+    "ap_up",
+    "portal_listening",
+    "tracker_start",
+    "first_led_output",
+    "tracker_first_prediction",
+)
+
+_marked = set()  # Stages this process has already recorded (mark(once=True))
+
+
+def boot_id() -> str:
+    try:
+        with open(BOOT_ID_FILE, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return "unknown"
+
+
+def mark(stage: str, detail: str = None, once: bool = True, path: str = TIMELINE_FILE) -> None:
+    """
+    Append a timestamp for stage. Never raises: timing must not break boot.
+
+    Args:
+        stage: Stage name, usually one of STAGES
+        detail: Optional extra text (e.g. which mode was chosen)
+        once: Only record the first call per stage in this process
+    """
+    if once and stage in _marked:
+        return
+    _marked.add(stage)
+
+    record = {
+        "stage": stage,
+        "boottime": round(time.clock_gettime(time.CLOCK_BOOTTIME), 3),
+        "monotonic": round(time.monotonic(), 3),
+        "wall": round(time.time(), 3),
+        "boot_id": boot_id(),
+        "pid": os.getpid(),
+        "process": os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "python",
+    }
+    if detail:
+        record["detail"] = detail
+
+    try:
+        try:
+            # Open without O_CREAT first: /tmp's protected_regular refuses
+            # O_CREAT on another user's existing file, even for root
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        except FileNotFoundError:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        try:
+            # Created by root at boot but appended to by the piess services
+            if os.fstat(fd).st_uid == os.getuid():
+                os.fchmod(fd, 0o666)
+            os.write(fd, (json.dumps(record) + "\n").encode())
+        finally:
+            os.close(fd)
+    except OSError as exc:
+        log.warning(f"Could not record boot stage '{stage}': {exc}")
+
+
+def load(path: str = TIMELINE_FILE, current_boot_only: bool = True) -> list:
+    """Return timeline records, oldest first."""
+    current = boot_id()
+    records = []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if not current_boot_only or record.get("boot_id") == current:
+                    records.append(record)
+    except OSError:
+        pass
+    return sorted(records, key=lambda r: r["boottime"])
+
+
+def report(records: list) -> str:
+    """Render records as a table of time since kernel start and stage deltas."""
+    if not records:
+        return "No boot timeline recorded for this boot."
+    lines = [f"{'since boot':>10s} {'delta':>8s}  {'stage':26s} {'process':22s} detail"]
+    previous = None
+    for r in records:
+        delta = f"+{r['boottime'] - previous:.2f}" if previous is not None else ""
+        lines.append(f"{r['boottime']:9.2f}s {delta:>8s}  {r['stage']:26s} "
+                     f"{r['process'] + ':' + str(r['pid']):22s} {r.get('detail', '')}")
+        previous = r["boottime"]
+
+    missing = [s for s in STAGES if s not in {r["stage"] for r in records}]
+    if missing:
+        lines.append(f"Not reached (yet): {', '.join(missing)}")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Record or show the PieSS boot timeline")
+    sub = parser.add_subparsers(dest="command", required=True)
+    mark_cmd = sub.add_parser("mark", help="record a stage")
+    mark_cmd.add_argument("stage")
+    mark_cmd.add_argument("--detail")
+    report_cmd = sub.add_parser("report", help="show this boot's timeline")
+    report_cmd.add_argument("--all-boots", action="store_true", help="include earlier boots")
+    report_cmd.add_argument("--json", action="store_true", help="print raw records")
+    args = parser.parse_args()
+
+    if args.command == "mark":
+        mark(args.stage, args.detail, once=False)
+        return 0
+
+    records = load(current_boot_only=not args.all_boots)
+    if args.json:
+        for r in records:
+            print(json.dumps(r))
+    else:
+        print(report(records))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""buffered_log.py
+SD-card-friendly logging for the PieSS services.
+
+Every record lands in an in-memory ring buffer (the last RING_SIZE events,
+at all levels) for on-demand dumps. Records at or above the output level
+are queued and written in batches: one write() per flush, at most once
+every MIN_FLUSH_INTERVAL seconds, with a background flush every
+FLUSH_INTERVAL seconds. WARNING and above flush straight away so errors are
+never stuck in memory when a service dies.
+
+Usage:
+    log = buffered_log.setup("iss_tracker")
+    log.info("Next visible pass ...")
+    buffered_log.dump()          # last N events as dicts
+
+Environment:
+    PIESS_LOG_LEVEL   Output level (default INFO)
+"""
+
+import atexit
+import collections
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+RING_SIZE = 500              # Events kept in memory for dumps
+FLUSH_INTERVAL = 30.0        # Background flush period (seconds)
+MIN_FLUSH_INTERVAL = 5.0     # Rate limit for size-triggered flushes (seconds)
+FLUSH_BATCH = 50             # Queued lines that trigger an early flush
+IMMEDIATE_LEVEL = logging.WARNING  # Records at/above this flush immediately
+OUTPUT_LEVEL = os.environ.get("PIESS_LOG_LEVEL", "INFO").upper()
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_handler = None
+
+
+class RingBufferHandler(logging.Handler):
+    """Keep recent records in memory and write batched output to a stream."""
+
+    def __init__(self, stream, output_level=logging.INFO, ring_size: int = RING_SIZE):
+        super().__init__(level=logging.DEBUG)
+        self.stream = stream
+        self.output_level = output_level
+        self.ring = collections.deque(maxlen=ring_size)
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.writes = 0  # write() calls made, for comparing against per-line logging
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            message = record.getMessage()
+            self.ring.append({
+                "time": record.created,
+                "level": record.levelname,
+                "logger": record.name,
+                "message": message,
+            })
+            if record.levelno < self.output_level:
+                return
+
+            line = self.format(record)
+            with self.lock:
+                self.pending.append(line)
+                urgent = record.levelno >= IMMEDIATE_LEVEL
+                due = (len(self.pending) >= FLUSH_BATCH and
+                       time.monotonic() - self.last_flush >= MIN_FLUSH_INTERVAL)
+            if urgent or due:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        with self.lock:
+            if not self.pending:
+                return
+            chunk = "\n".join(self.pending) + "\n"
+            self.pending = []
+            self.last_flush = time.monotonic()
+        try:
+            self.stream.write(chunk)
+            self.stream.flush()
+            self.writes += 1
+        except (OSError, ValueError):
+            pass  # Stream gone (e.g. journal restarted); keep the ring buffer
+
+    def dump(self, limit: int = None) -> list:
+        """Return the buffered events, oldest first."""
+        events = list(self.ring)
+        return events[-limit:] if limit else events
+
+
+def _flush_loop(handler: RingBufferHandler) -> None:
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        handler.flush()
+
+
+def _dump_to_stream(signum, frame) -> None:
+    """SIGUSR1: write the whole ring buffer to the output stream."""
+    if _handler is None:
+        return
+    lines = [json.dumps(event) for event in _handler.dump()]
+    with _handler.lock:
+        _handler.pending.append("--- ring buffer dump ---")
+        _handler.pending.extend(lines)
+        _handler.pending.append("--- end of dump ---")
+    _handler.flush()
+
+
+def setup(name: str, stream=None) -> logging.Logger:
+    """
+    Install the ring-buffer handler on the root logger (once) and return the
+    named logger.
+
+    Args:
+        name: Logger name, shown in each line (e.g. "wifi_portal")
+        stream: Output stream (default sys.stdout, i.e. the journal or the
+                service's StandardOutput= file)
+    """
+    global _handler
+
+    if _handler is None:
+        level = getattr(logging, OUTPUT_LEVEL, logging.INFO)
+        _handler = RingBufferHandler(stream or sys.stdout, output_level=level)
+        _handler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(logging.DEBUG)
+
+        threading.Thread(target=_flush_loop, args=(_handler,), name="log-flush", daemon=True).start()
+        atexit.register(_handler.flush)
+        try:
+            signal.signal(signal.SIGUSR1, _dump_to_stream)
+        except ValueError:
+            pass  # Not in the main thread
+
+    return logging.getLogger(name)
+
+
+def dump(limit: int = None) -> list:
+    """Return the last events from the ring buffer (empty if not set up)."""
+    return _handler.dump(limit) if _handler else []
+
+
+def dump_text():
+    """Ring buffer as JSON lines, returned as (content_type, body) for HTTP."""
+    return "application/x-ndjson", "".join(json.dumps(event) + "\n" for event in dump())
+
+
+def flush() -> None:
+    """Write out any queued lines now."""
+    if _handler:
+        _handler.flush()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""captive_portal.py
+Captive-portal detection for the setup access point.
+
+Phones and laptops probe a well-known URL after joining a network and only
+show their "sign in to network" sheet once the probe gets an unexpected
+answer. In AP mode dnsmasq resolves every name to the Pi (see
+dnsmasq_config()) and boot_decider.sh redirects port 80 to the portal, so
+those probes land here. Each one is answered straight away with a
+precomputed redirect to the setup page.
+
+Standard library only, so boot_decider.sh can generate the dnsmasq config
+with the system python3:
+    python3 captive_portal.py --dnsmasq > /etc/dnsmasq.d/piess-captive.conf
+"""
+
+import argparse
+import logging
+
+log = logging.getLogger("captive_portal")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+PORTAL_IP = "192.168.4.1"
+PORTAL_URL = f"http://{PORTAL_IP}/"  # Port 80 is redirected to the portal in AP mode
+
+# Connectivity-check paths requested by the major platforms
+PROBE_PATHS = (
+    "/generate_204",               # Android, Chrome OS
+    "/gen_204",                    # Android (older / some vendors)
+    "/hotspot-detect.html",        # Apple iOS / macOS
+    "/library/test/success.html",  # Apple (older)
+    "/connecttest.txt",            # Windows 10+
+    "/ncsi.txt",                   # Windows (older)
+    "/redirect",                   # Windows, after connecttest.txt
+    "/canonical.html",             # Firefox
+    "/success.txt",                # Firefox
+    "/kindle-wifi/wifistub.html",  # Kindle
+)
+
+# Precomputed once: the body and headers never change
+_REDIRECT_BODY = f'<html><body><a href="{PORTAL_URL}">PieSS Wi-Fi setup</a></body></html>'
+_REDIRECT_HEADERS = {
+    "Location": PORTAL_URL,
+    "Content-Type": "text/html",
+    "Cache-Control": "no-store",  # A cached probe answer would hide the portal later
+}
+_PORTAL_HOSTS = {PORTAL_IP, f"{PORTAL_IP}:80", f"{PORTAL_IP}:8080", "localhost", "localhost:8080",
+                 "127.0.0.1", "127.0.0.1:8080"}
+
+
+def redirect_response():
+    """(body, status, headers) tuple sending a client to the setup page"""
+    return _REDIRECT_BODY, 302, _REDIRECT_HEADERS
+
+
+def register(app) -> None:
+    """
+    Add the probe routes to a Flask app, plus a 404 handler that redirects
+    requests for any other site (wildcard DNS) to the setup page.
+    """
+    def probe():
+        return redirect_response()
+
+    for path in PROBE_PATHS:
+        app.add_url_rule(path, endpoint=f"captive{path}", view_func=probe)
+
+    @app.errorhandler(404)
+    def not_found(error):
+        from flask import request  # Only needed once registered with Flask
+        if request.host not in _PORTAL_HOSTS:
+            return redirect_response()
+        return error
+
+
+def dnsmasq_config(portal_ip: str = PORTAL_IP) -> str:
+    """dnsmasq options resolving every name to the portal and advertising it"""
+    return "\n".join([
+        "# Generated by captive_portal.py - PieSS setup AP only",
+        f"address=/#/{portal_ip}",
+        "no-resolv",
+        # RFC 8910 captive-portal URI (DHCP option 114) for clients that read it
+        f'dhcp-option=114,"http://{portal_ip}/"',
+        "",
+    ])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="PieSS captive-portal helpers")
+    parser.add_argument("--dnsmasq", action="store_true",
+                        help="print the dnsmasq wildcard DNS config")
+    parser.add_argument("--ip", default=PORTAL_IP, help="portal address (default %(default)s)")
+    args = parser.parse_args()
+
+    if args.dnsmasq:
+        print(dnsmasq_config(args.ip), end="")
+        return 0
+    parser.print_help()
+    return 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,36 +1,344 @@
-cd /home/piess/PieSS/2025/v2
-source venv/bin/activate
-
-# Create a quick debug script
-cat > check_passes.py << 'EOF'
-from skyfield.api import Topos, load
-from datetime import datetime, timedelta
-
-ts = load.timescale()
-satellites = load.tle_file('stations.tle')
-iss = satellites[0]
-
-# Your location
-observer = Topos(43.2596, -79.7925, elevation_m=0)
-
-# Next 48 hours
-t0 = ts.now()
-t1 = ts.from_datetime(t0.utc_datetime() + timedelta(hours=48))
-
-times, events = iss.find_events(observer, t0, t1, altitude_degrees=15.0)
-
-print("All ISS passes in next 48 hours (min 15° elevation):")
-for i in range(0, len(times), 3):
-    if i+2 < len(times):
-        rise = times[i]
-        peak = times[i+1]
-        setting = times[i+2]
-        
-        # Get max elevation
-        difference = iss - observer
-        alt, az, dist = difference.at(peak).altaz()
-        
-        print(f"Rise: {rise.utc_datetime()} UTC | Peak: {peak.utc_datetime()} UTC (alt: {alt.degrees:.1f}°) | Set: {setting.utc_datetime()} UTC")
-EOF
-
-python3 check_passes.py
\ No newline at end of file
+#!/usr/bin/env python3
+"""check_passes.py
+Show upcoming ISS passes, or predict passes in bulk.
+
+status (default): ask the running tracker (GET /status on its metrics
+endpoint), which answers from memory in milliseconds. If it isn't
+running, read the schedule it last wrote (shared_schedule.py, memory
+mapped); only without one are the passes computed here.
+
+predict: batch prediction with predictor.find_passes_multi() for any date
+range, elevation mask and any number of observers (the satellite is
+propagated once per batch of observers), streamed as text, JSON, CSV or
+NDJSON.
+
+Usage:
+    python3 check_passes.py                       # tracker status, else local
+    python3 check_passes.py status --json
+    python3 check_passes.py predict --days 30 --filter visible
+    python3 check_passes.py predict --satellite "ISS (ZARYA)" --satellite "CSS (TIANHE)"
+    python3 check_passes.py predict --observers sites.csv --start 2026-01-01 \\
+        --end 2026-02-01 --min-elevation 10 --format ndjson > passes.ndjson
+
+The observers CSV has a header row with name, lat, lon and optionally
+elevation (metres).
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+STATUS_URL = f"http://127.0.0.1:{os.environ.get('PIESS_METRICS_PORT', '9101')}/status"
+STATUS_TIMEOUT = 1.0  # Seconds; the tracker answers in a few milliseconds
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = os.path.join(SCRIPT_DIR, "stations.tle")
+EPHEMERIS_FILE = os.path.join(SCRIPT_DIR, "de421.bsp")
+SATELLITE = "ISS (ZARYA)"
+
+# Standalone defaults (same fallback location as iss_tracker.get_location)
+DEFAULT_LAT = 43.577090
+DEFAULT_LON = -79.727520
+DEFAULT_ELEVATION = 128.0
+MIN_ELEVATION = 15.0
+HOURS = 48
+OBSERVER_BATCH = 500  # Observers predicted together in one propagation
+
+FIELDS = ["observer", "satellite", "rise", "peak", "set", "duration_s", "max_altitude",
+          "rise_azimuth", "set_azimuth", "visible", "sunlit"]
+FILTERS = {
+    "all": lambda p: True,
+    "night": lambda p: p.night,                   # Observer in darkness
+    "sunlit": lambda p: p.sunlit,                 # Satellite in sunlight
+    "visible": lambda p: p.night and p.sunlit,    # Both: can actually be seen
+}
+
+
+# ----------------------------
+# STATUS
+# ----------------------------
+
+def query_tracker(url: str = STATUS_URL, timeout: float = STATUS_TIMEOUT):
+    """Return the tracker's /status dict, or None if it isn't answering."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            return json.loads(resp.read().decode())
+    except (OSError, ValueError):
+        return None
+
+
+def read_shared(path: str = None):
+    """Status from the tracker's shared schedule file, or None if there is no usable one."""
+    import shared_schedule
+
+    try:
+        shared = shared_schedule.SharedSchedule(path or shared_schedule.SHARED_SCHEDULE_FILE)
+    except (OSError, ValueError) as exc:
+        print(f"Ignoring shared schedule ({exc})", file=sys.stderr)
+        return None
+    now = datetime.now(timezone.utc)
+    passes = [p for p in shared.passes() if p.set > now]
+    shared.close()
+    if not passes:
+        return None
+
+    status = {"source": f"shared file ({shared.source}, written {shared.generated:%Y-%m-%d %H:%M} UTC)",
+              "passes": [p.as_record() for p in passes]}
+    epochs = [p.tle_epoch for p in passes if p.tle_epoch is not None]
+    if epochs:
+        epoch = datetime.fromtimestamp(min(epochs), tz=timezone.utc)
+        status["tle_epoch"] = epoch.isoformat()
+        status["tle_age_hours"] = round((now - epoch).total_seconds() / 3600, 2)
+    position = passes[0].position_at(now)
+    if position:
+        status["live"] = {"altitude": round(position[0], 2), "azimuth": round(position[1], 2)}
+    return status
+
+
+def compute_locally(lat: float, lon: float, elevation: float, hours: float, min_elevation: float) -> dict:
+    """Compute passes here, in the same shape as the tracker's /status."""
+    import predictor  # Pulls in Skyfield; only needed without the tracker
+    from skyfield.api import Topos
+
+    (satellite,), ts, eph = _load_prediction_data(CACHE_FILE, [SATELLITE])
+    observer = Topos(lat, lon, elevation_m=elevation)
+    t0 = ts.now()
+    t1 = ts.from_datetime(t0.utc_datetime() + timedelta(hours=hours))
+    passes = predictor.find_passes(satellite, observer, t0, t1, min_elevation, eph)
+
+    epoch = satellite.epoch.utc_datetime()
+    return {
+        "source": "local",
+        "location": {"latitude": lat, "longitude": lon, "elevation_m": elevation},
+        "tle_epoch": epoch.isoformat(),
+        "tle_age_hours": round((datetime.now(timezone.utc) - epoch).total_seconds() / 3600, 2),
+        "passes": [p.as_record() for p in passes],
+    }
+
+
+def _visibility(flag) -> str:
+    return {True: "night", False: "daylight"}.get(flag, "?")
+
+
+def print_status(status: dict) -> None:
+    location = status.get("location") or {}
+    print(f"Source: {status.get('source', 'tracker')}")
+    if location:
+        print(f"Location: {location['latitude']:.4f}, {location['longitude']:.4f}")
+    if status.get("tle_age_hours") is not None:
+        print(f"TLE age: {status['tle_age_hours']:.1f} h")
+    if "alert_stage" in status:
+        print(f"Alert stage: {status['alert_stage']}")
+    if status.get("seconds_to_rise") is not None and status["seconds_to_rise"] > 0:
+        print(f"Next visible pass rises in {status['seconds_to_rise'] // 60} min")
+    live = status.get("live")
+    if live:
+        distance = f", {live['distance_km']:.0f} km" if "distance_km" in live else ""
+        print(f"ISS now: alt {live['altitude']:.1f}°, az {live['azimuth']:.1f}°{distance}")
+
+    passes = status.get("passes") or []
+    print(f"\nUpcoming passes ({len(passes)}):")
+    for p in passes:
+        alt = "?" if p["max_altitude"] is None else f"{p['max_altitude']:.1f}°"
+        print(f"{p.get('satellite') or SATELLITE}: Rise: {p['rise']} | Peak: {p['peak']} (alt: {alt}) | "
+              f"Set: {p['set']} | {_visibility(p.get('visible'))}")
+
+
+def run_status(args) -> int:
+    status = None if args.local else query_tracker(args.url) or read_shared(args.shared)
+    if status is None:
+        if not args.local:
+            print("Tracker not running and no shared schedule, computing passes locally...", file=sys.stderr)
+        status = compute_locally(args.lat, args.lon, args.elevation, args.hours, args.min_elevation)
+
+    if args.json:
+        print(json.dumps(status, indent=1))
+    else:
+        print_status(status)
+    return 0
+
+
+# ----------------------------
+# BATCH PREDICTION
+# ----------------------------
+
+def _load_prediction_data(tle_file: str, names: list, need_ephemeris: bool = False,
+                          ephemeris: str = EPHEMERIS_FILE):
+    """Return ([satellites], timescale, ephemeris or None) from local files only."""
+    import predictor
+    from skyfield.api import load
+
+    by_name, ts, _ = predictor.load_satellites(tle_file)
+    missing = [name for name in names if name not in by_name]
+    if missing:
+        raise SystemExit(f"Not in {tle_file}: {', '.join(missing)} (have: {', '.join(sorted(by_name))})")
+    eph = None
+    if os.path.exists(ephemeris):
+        eph = load(ephemeris)
+    elif need_ephemeris:
+        raise SystemExit(f"Ephemeris {ephemeris} not found; night/sunlit filtering needs it "
+                         f"(point --ephemeris at a copy of de421.bsp)")
+    return [by_name[name] for name in names], ts, eph
+
+
+def load_observers(path: str) -> list:
+    """Read (name, lat, lon, elevation_m) rows from a CSV with a header."""
+    def pick(row, *keys, default=None):
+        for key in keys:
+            if row.get(key) not in (None, ""):
+                return row[key]
+        return default
+
+    observers = []
+    with open(path, newline="") as f:
+        for n, row in enumerate(csv.DictReader(f), start=1):
+            row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            try:
+                observers.append((
+                    pick(row, "name", "id", default=f"observer{n}"),
+                    float(pick(row, "lat", "latitude")),
+                    float(pick(row, "lon", "lng", "longitude")),
+                    float(pick(row, "elevation", "elevation_m", "alt", default=0.0)),
+                ))
+            except (TypeError, ValueError):
+                raise SystemExit(f"{path} row {n}: need numeric lat and lon")
+    return observers
+
+
+def parse_time(text: str) -> datetime:
+    """ISO date or datetime; naive values are UTC."""
+    dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+class PassWriter:
+    """Stream pass records to out as text, JSON, CSV or NDJSON."""
+
+    def __init__(self, fmt: str, out=sys.stdout):
+        self.fmt = fmt
+        self.out = out
+        self.count = 0
+        if fmt == "csv":
+            self.csv = csv.DictWriter(out, fieldnames=FIELDS)
+            self.csv.writeheader()
+        elif fmt == "json":
+            out.write("[")
+
+    def write(self, record: dict) -> None:
+        if self.fmt == "ndjson":
+            self.out.write(json.dumps(record) + "\n")
+        elif self.fmt == "json":
+            self.out.write(("," if self.count else "") + "\n " + json.dumps(record))
+        elif self.fmt == "csv":
+            self.csv.writerow(record)
+        else:
+            self.out.write(
+                f"{record['observer']:16s} {record['satellite']:14s} Rise: {record['rise']} | Peak: {record['peak']} "
+                f"(alt: {record['max_altitude']:.1f}°) | Set: {record['set']} | "
+                f"{_visibility(record['visible'])}{', sunlit' if record['sunlit'] else ''}\n")
+        self.count += 1
+
+    def close(self) -> None:
+        if self.fmt == "json":
+            self.out.write("\n]\n" if self.count else "]\n")
+        self.out.flush()
+
+
+def run_predict(args) -> int:
+    import predictor
+    from skyfield.api import Topos
+
+    satellites, ts, eph = _load_prediction_data(
+        args.tle, args.satellite or [SATELLITE], need_ephemeris=args.filter != "all", ephemeris=args.ephemeris)
+
+    start = parse_time(args.start) if args.start else datetime.now(timezone.utc)
+    end = parse_time(args.end) if args.end else start + timedelta(days=args.days)
+    if end <= start:
+        raise SystemExit("--end must be after --start")
+    t0, t1 = ts.from_datetime(start), ts.from_datetime(end)
+
+    if args.observers:
+        observers = load_observers(args.observers)
+    else:
+        observers = [("observer", args.lat, args.lon, args.elevation)]
+
+    keep = FILTERS[args.filter]
+    writer = PassWriter(args.format)
+    try:
+        # Batches share one propagation; output streams batch by batch
+        for first in range(0, len(observers), OBSERVER_BATCH):
+            batch = observers[first:first + OBSERVER_BATCH]
+            topos = [Topos(lat, lon, elevation_m=elevation) for _, lat, lon, elevation in batch]
+            found = predictor.find_passes_many(satellites, topos, t0, t1, args.min_elevation, eph, step=args.step)
+            for k, (name, _, _, _) in enumerate(batch):
+                passes = sorted((p for per_satellite in found for p in per_satellite[k]), key=lambda p: p.rise.tt)
+                for p in passes:
+                    if keep(p):
+                        writer.write(dict(observer=name, **p.as_record()))
+    except BrokenPipeError:  # e.g. piped into head
+        return 0
+    writer.close()
+    return 0
+
+
+# ----------------------------
+# COMMAND LINE
+# ----------------------------
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Show or predict ISS passes")
+    sub = parser.add_subparsers(dest="command")
+
+    status = sub.add_parser("status", help="tracker state and upcoming passes (default)")
+    status.add_argument("--json", action="store_true", help="print JSON instead of text")
+    status.add_argument("--url", default=STATUS_URL, help="tracker status URL (default %(default)s)")
+    status.add_argument("--local", action="store_true", help="skip the tracker and compute locally")
+    status.add_argument("--shared", metavar="FILE", help="shared schedule file (default shared_schedule.SHARED_SCHEDULE_FILE)")
+    status.add_argument("--lat", type=float, default=DEFAULT_LAT, help="latitude for local computation")
+    status.add_argument("--lon", type=float, default=DEFAULT_LON, help="longitude for local computation")
+    status.add_argument("--elevation", type=float, default=DEFAULT_ELEVATION, help="metres, local computation")
+    status.add_argument("--hours", type=float, default=HOURS, help="window for local computation")
+    status.add_argument("--min-elevation", type=float, default=MIN_ELEVATION, help="degrees above horizon")
+
+    predict = sub.add_parser("predict", help="batch pass prediction")
+    predict.add_argument("--start", help="ISO date/time, UTC unless given (default now)")
+    window = predict.add_mutually_exclusive_group()
+    window.add_argument("--end", help="ISO date/time, UTC unless given")
+    window.add_argument("--days", type=float, default=2.0, help="length of the window (default %(default)s)")
+    predict.add_argument("--min-elevation", type=float, default=MIN_ELEVATION,
+                         help="elevation mask in degrees (default %(default)s)")
+    predict.add_argument("--observers", metavar="CSV", help="observers CSV (name, lat, lon, elevation)")
+    predict.add_argument("--lat", type=float, default=DEFAULT_LAT, help="single observer latitude")
+    predict.add_argument("--lon", type=float, default=DEFAULT_LON, help="single observer longitude")
+    predict.add_argument("--elevation", type=float, default=DEFAULT_ELEVATION, help="single observer metres")
+    predict.add_argument("--filter", choices=sorted(FILTERS), default="all",
+                         help="night: observer dark; sunlit: satellite lit; visible: both")
+    predict.add_argument("--format", choices=["text", "json", "csv", "ndjson"], default="text")
+    predict.add_argument("--tle", default=CACHE_FILE, help="TLE file (default %(default)s)")
+    predict.add_argument("--ephemeris", default=EPHEMERIS_FILE,
+                         help="JPL ephemeris for the night/sunlit flags (default %(default)s)")
+    predict.add_argument("--satellite", action="append",
+                         help=f"satellite name in the TLE file, repeatable (default {SATELLITE})")
+    predict.add_argument("--step", type=float, default=60.0, help="search grid in seconds (default %(default)s)")
+    return parser
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    # Plain `check_passes.py [--json ...]` keeps meaning the status view
+    if not argv or argv[0] not in ("status", "predict", "-h", "--help"):
+        argv = ["status"] + argv
+    args = build_parser().parse_args(argv)
+    return run_predict(args) if args.command == "predict" else run_status(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
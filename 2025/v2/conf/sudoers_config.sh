@@ -13,5 +13,8 @@ piess ALL=(ALL) NOPASSWD: /usr/bin/systemctl restart dnsmasq
 # Allow piess user to use nmcli for network operations
 piess ALL=(ALL) NOPASSWD: /usr/bin/nmcli
 
+# Allow piess user to scan with iw while the AP stays up
+piess ALL=(ALL) NOPASSWD: /usr/sbin/iw
+
 # Allow piess user to manage IP addresses (for AP mode)
 piess ALL=(ALL) NOPASSWD: /usr/sbin/ip
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""connect_jobs.py
+Background Wi-Fi connect attempts for the setup portal.
+
+A connect attempt can take close to a minute (nmcli timeout plus
+NetworkManager settling), far longer than a phone waits for an HTTP
+response. Jobs run on a worker thread and are polled by ID instead.
+
+Only one attempt runs at a time: the radio can only join one network.
+Submitting while an attempt is running (a phone retrying a timed-out POST,
+a double tap) returns the running job rather than starting another, and
+resubmitting credentials that just succeeded returns that result.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+import uuid
+
+log = logging.getLogger("connect_jobs")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+JOB_HISTORY = 20          # Finished jobs kept for status lookups
+RESUBMIT_WINDOW = 120.0   # Seconds a successful job answers identical resubmissions
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class ConnectJobs:
+    """Run connect_fn(ssid, password) one job at a time on a worker thread."""
+
+    def __init__(self, connect_fn, status_fn=None):
+        """
+        Args:
+            connect_fn: Callable(ssid, password) -> (success, message)
+            status_fn: Optional callable() -> network status text, recorded
+                       when a job finishes
+        """
+        self.connect_fn = connect_fn
+        self.status_fn = status_fn
+        self._lock = threading.Lock()
+        self._jobs = {}      # job id -> job dict (insertion ordered)
+        self._active = None  # id of the pending/running job
+
+    @staticmethod
+    def _key(ssid: str, password: str) -> str:
+        return hashlib.sha256(f"{ssid}\0{password}".encode()).hexdigest()
+
+    def submit(self, ssid: str, password: str):
+        """
+        Start a connect job, or return the existing one for the same request.
+
+        Returns:
+            (job, created): created is False if an existing job was returned.
+            If a different network is already being joined, that job is
+            returned with created=False.
+        """
+        key = self._key(ssid, password)
+        now = time.time()
+
+        with self._lock:
+            if self._active is not None:
+                return self._public(self._jobs[self._active]), False
+
+            # A retried POST after success should show that result, not reconnect
+            for job in reversed(list(self._jobs.values())):
+                if (job["_key"] == key and job["state"] == SUCCEEDED and
+                        now - job["finished"] < RESUBMIT_WINDOW):
+                    return self._public(job), False
+
+            job = {
+                "id": uuid.uuid4().hex[:12],
+                "ssid": ssid,
+                "state": PENDING,
+                "message": "Waiting to connect",
+                "status": "",
+                "created": now,
+                "finished": None,
+                "_key": key,
+            }
+            self._jobs[job["id"]] = job
+            self._active = job["id"]
+            self._trim()
+
+        log.info(f"Queued connect job {job['id']} for '{ssid}'")
+        threading.Thread(target=self._run, args=(job["id"], password),
+                         name=f"connect-{job['id']}", daemon=True).start()
+        return self._public(job), True
+
+    def get(self, job_id: str):
+        """Return a copy of the job, or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def busy(self) -> bool:
+        with self._lock:
+            return self._active is not None
+
+    def _run(self, job_id: str, password: str) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job["state"] = RUNNING
+            job["message"] = f"Connecting to {job['ssid']}..."
+            ssid = job["ssid"]
+
+        try:
+            success, message = self.connect_fn(ssid, password)
+        except Exception as exc:
+            success, message = False, f"Failed to connect: {exc}"
+
+        status = ""
+        if self.status_fn:
+            try:
+                status = self.status_fn()
+            except Exception as exc:
+                status = f"Unable to retrieve status ({exc})"
+
+        with self._lock:
+            job["state"] = SUCCEEDED if success else FAILED
+            job["message"] = message
+            job["status"] = status
+            job["finished"] = time.time()
+            self._active = None
+        log.info(f"Connect job {job_id} {job['state']}: {message}")
+
+    def _trim(self) -> None:
+        """Drop the oldest finished jobs beyond JOB_HISTORY (lock held)."""
+        finished = [jid for jid, j in self._jobs.items() if j["finished"] is not None]
+        for jid in finished[:max(0, len(self._jobs) - JOB_HISTORY)]:
+            del self._jobs[jid]
+
+    @staticmethod
+    def _public(job: dict) -> dict:
+        return {k: v for k, v in job.items() if not k.startswith("_")}
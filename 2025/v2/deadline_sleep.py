@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""deadline_sleep.py
+Sleep until an absolute UTC deadline instead of trusting one long time.sleep().
+
+A Pi without an RTC boots with a stale clock and NTP steps it forward a few
+minutes later; a suspended system stops the clock the scheduler thinks it is
+sleeping on. Both silently break a single multi-hour sleep. sleep_until()
+re-checks the wall clock at bounded intervals, compares it with the monotonic
+and boot-time clocks to spot jumps, and reports how late it actually woke.
+"""
+
+import logging
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+log = logging.getLogger("deadline_sleep")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+MAX_SLEEP_STEP = 30.0        # Longest single sleep before re-checking (seconds)
+CLOCK_JUMP_THRESHOLD = 5.0   # Wall/monotonic disagreement treated as a jump (seconds)
+WAKE_TOLERANCE = 1.0         # Lateness above this is reported as a missed deadline
+
+# Result of one sleep_until() call.
+#   lateness:     seconds between the deadline and the actual wake-up (negative
+#                 if we returned early because the clock jumped)
+#   clock_jumped: True if the wall clock stepped or the system was suspended
+#   already_due:  True if the deadline had passed before any sleep (lateness 0)
+WakeResult = namedtuple("WakeResult", ["lateness", "clock_jumped", "already_due"], defaults=(False,))
+
+
+def _boottime() -> float:
+    """Seconds since boot, including time spent suspended (Linux only)."""
+    try:
+        return time.clock_gettime(time.CLOCK_BOOTTIME)
+    except (AttributeError, OSError):
+        return time.monotonic()
+
+
+def sleep_until(deadline: datetime, max_step: float = MAX_SLEEP_STEP,
+                jump_threshold: float = CLOCK_JUMP_THRESHOLD,
+                tick=None) -> WakeResult:
+    """
+    Sleep until the given timezone-aware UTC deadline.
+
+    Sleeps in steps of at most max_step seconds. After every step the elapsed
+    wall-clock time is compared with the monotonic clock (NTP steps) and the
+    boot-time clock (suspend). If either disagrees by more than
+    jump_threshold, returns immediately with clock_jumped=True so the caller
+    can re-plan against the corrected clock.
+
+    Args:
+        deadline: Timezone-aware datetime to wake at
+        max_step: Longest single sleep (seconds)
+        jump_threshold: Clock disagreement treated as a jump (seconds)
+        tick: Optional callable run after every step (e.g. a heartbeat)
+    """
+    if deadline.tzinfo is None:
+        deadline = deadline.replace(tzinfo=timezone.utc)
+    deadline_ts = deadline.timestamp()
+
+    # A deadline already behind us is not an oversleep (e.g. a pass less
+    # than the alert lead away): don't report the gap as lateness
+    if deadline_ts <= time.time():
+        return WakeResult(0.0, False, True)
+
+    while True:
+        wall0 = time.time()
+        remaining = deadline_ts - wall0
+        if remaining <= 0:
+            break
+
+        mono0 = time.monotonic()
+        boot0 = _boottime()
+        time.sleep(min(remaining, max_step))
+        mono_elapsed = time.monotonic() - mono0
+        wall_elapsed = time.time() - wall0
+        boot_elapsed = _boottime() - boot0
+
+        stepped = abs(wall_elapsed - mono_elapsed) > jump_threshold
+        suspended = (boot_elapsed - mono_elapsed) > jump_threshold
+        if stepped or suspended:
+            reason = "suspend" if suspended else "clock step"
+            log.warning(
+                f"Clock jump detected ({reason}): wall {wall_elapsed:+.1f}s vs "
+                f"monotonic {mono_elapsed:+.1f}s"
+            )
+            return WakeResult(time.time() - deadline_ts, True)
+
+        if tick is not None:
+            tick()
+
+    lateness = time.time() - deadline_ts
+    if lateness > WAKE_TOLERANCE:
+        log.warning(f"Woke {lateness:.2f}s after deadline (tolerance {WAKE_TOLERANCE}s)")
+    return WakeResult(lateness, False)
+
+
+def utc_now() -> datetime:
+    """Current time as a timezone-aware UTC datetime."""
+    return datetime.now(timezone.utc)
@@ -5,12 +5,20 @@ Main program for tracking the ISS and raising a flag with LEDs and a servo.
 Features:
 - Automatic IP-based location detection
 - Night-time only alerts (based on sunrise/sunset)
+- Offline-first: several days of passes kept on disk, with alerts widened
+  (or the flag left down) as the TLE ages
+- Other bright stations too (SATELLITES), scheduled by priority
+- Pluggable pass sources (pass_providers.py): central schedule server,
+  local SGP4 or a remote feed, with fallback and a cached pass store;
+  Skyfield is only imported when passes are predicted on the device itself
 - Direction LEDs
 - Progressive LED alerts with accelerating blink patterns
 - Servo movement with torque hold
 - Automatic TLE caching
 """
 
+import json
+import logging
 import os
 import time
 from datetime import datetime, timedelta, timezone
@@ -18,8 +26,18 @@ from datetime import datetime, timedelta, timezone
 import requests
 import pigpio
 from gpiozero import LED
-from skyfield.api import Topos, load
-from skyfield import almanac
+
+import boot_timeline
+import buffered_log
+import metrics
+import pass_providers
+import profiling
+import schedule_client
+import sd_notify
+import shared_schedule
+from deadline_sleep import sleep_until, utc_now, WAKE_TOLERANCE
+
+log = logging.getLogger("iss_tracker")
 
 # ----------------------------
 # CONFIGURATION
@@ -27,16 +45,32 @@ from skyfield import almanac
 
 # File and TLE configuration
 CACHE_FILE = 'stations.tle'  # Local cached TLE file
-TLE_URL = 'https://celestrak.org/NORAD/elements/gp.php?CATNR=25544&FORMAT=tle'
+TLE_URL = 'https://celestrak.org/NORAD/elements/gp.php?GROUP=stations&FORMAT=tle'
 TLE_REFRESH_HOURS = 12  # Refresh TLE data every 12 hours
 
+# Where passes come from, tried in order until one answers (see pass_providers.py):
+# "server" (schedule_server.py at PIESS_SCHEDULE_URL), "local" (SGP4 here),
+# "spotthestation" or "open-notify" (ISS feeds). Leave out "local" on units
+# too small to run Skyfield.
+PASS_PROVIDERS = os.environ.get("PIESS_PASS_PROVIDERS", "server,local").split(",")
+
+# Satellites to alert for, highest priority first (names as in the TLE file).
+# When two passes are too close to alert for both, the higher one wins.
+SATELLITES = ["ISS (ZARYA)", "CSS (TIANHE)"]
+
+# systemd watchdog: longest sleep between heartbeats (seconds)
+HEARTBEAT_STEP = 5.0
+
+# Time zone of the fallback location, used when geolocation gives none
+DEFAULT_TIMEZONE = "America/Toronto"
+
 # Visibility filters
 MIN_ELEVATION = 15.0     # Minimum degrees above horizon
 
-# Alert timings (seconds before rise)
-ALERT_30M = 1800  # 30 minutes
-ALERT_10M = 600   # 10 minutes
-ALERT_5M = 300    # 5 minutes
+# Alert timings (seconds before rise, LED, blink period) are
+# schedule_client.ALERT_PLAN, shared with the schedule server, as is the
+# guard between passes (schedule_client.SCHEDULE_GUARD).
+SCHEDULE_GUARD = schedule_client.SCHEDULE_GUARD
 
 # Servo GPIO configuration
 SERVO_PIN = 16
@@ -72,6 +106,25 @@ led_e = LED(LED_E_PIN)
 led_s = LED(LED_S_PIN)
 led_w = LED(LED_W_PIN)
 
+# Alert LEDs by their name in schedule event timelines
+ALERT_LEDS = {"led_30m": led_30m, "led_10m": led_10m, "led_5m": led_5m}
+
+# Scheduler heartbeat for the systemd watchdog (no-op outside systemd)
+heartbeat = sd_notify.Heartbeat()
+
+# Current state, served as JSON at /status on the metrics endpoint
+tracker_status = {
+    "alert_stage": "starting",
+    "location": None,
+    "tle_epoch": None,
+    "predicted_at": None,
+    "source": None,
+    "next_pass": None,
+    "schedule": [],
+    "passes": [],
+}
+_live = {}   # Live alt/az in /status: satellite, observer and timescale, or the pass being followed
+
 
 # ----------------------------
 # HELPER FUNCTIONS
@@ -84,9 +137,11 @@ def set_servo(position: int, hold_torque: bool = True) -> None:
     is not powered continuously (less heat / noise).
     """
     pi.set_servo_pulsewidth(SERVO_PIN, position)
+    metrics.gpio_writes.inc()
     if not hold_torque:
         time.sleep(1)
         pi.set_servo_pulsewidth(SERVO_PIN, 0)
+        metrics.gpio_writes.inc()
 
 
 def reset_leds() -> None:
@@ -98,6 +153,7 @@ def reset_leds() -> None:
     led_e.off()
     led_s.off()
     led_w.off()
+    metrics.gpio_writes.inc(7)
 
 
 def update_direction_leds(azimuth: float) -> None:
@@ -118,6 +174,7 @@ def update_direction_leds(azimuth: float) -> None:
         led_s.on()
     elif 225 <= azimuth < 315:
         led_w.on()
+    metrics.gpio_writes.inc(5)
 
 
 def azimuth_to_direction(azimuth: float) -> str:
@@ -146,7 +203,7 @@ def azimuth_to_direction(azimuth: float) -> str:
 
 def test_hardware():
     """Run a quick hardware test on startup to verify all components"""
-    print("Running hardware self-test...")
+    log.info("Running hardware self-test...")
     
     # Test sequence
     test_items = [
@@ -161,25 +218,22 @@ def test_hardware():
     
     # Test LEDs
     for name, led in test_items:
-        print(f"  Testing {name} LED... ", end="", flush=True)
         led.on()
         time.sleep(0.5)
         led.off()
-        print("OK")
+        log.info(f"  Testing {name} LED... OK")
         time.sleep(0.2)
     
     # Test servo
-    print("  Testing servo UP... ", end="", flush=True)
     set_servo(SERVO_UP, hold_torque=False)
     time.sleep(1)
-    print("OK")
+    log.info("  Testing servo UP... OK")
     
-    print("  Testing servo DOWN... ", end="", flush=True)
     set_servo(SERVO_DOWN, hold_torque=False)
     time.sleep(1)
-    print("OK")
+    log.info("  Testing servo DOWN... OK")
     
-    print("Hardware self-test complete!\n")
+    log.info("Hardware self-test complete!")
 
 
 def blink_led(led, duration: float, blink_rate: float, check_interval: float = 0.1):
@@ -192,37 +246,44 @@ def blink_led(led, duration: float, blink_rate: float, check_interval: float = 0
         blink_rate: Time for one complete on/off cycle (seconds)
         check_interval: How often to check timing (seconds)
     """
-    start_time = time.time()
+    start_time = time.monotonic()
     on_time = blink_rate / 2
     off_time = blink_rate / 2
     
     led_state = False
     last_toggle = start_time
     
-    while (time.time() - start_time) < duration:
-        current_time = time.time()
+    while (time.monotonic() - start_time) < duration:
+        current_time = time.monotonic()
         elapsed_since_toggle = current_time - last_toggle
         
         if led_state and elapsed_since_toggle >= on_time:
             led.off()
             led_state = False
             last_toggle = current_time
+            metrics.blink_jitter_seconds.observe(elapsed_since_toggle - on_time)
+            metrics.gpio_writes.inc()
         elif not led_state and elapsed_since_toggle >= off_time:
             led.on()
             led_state = True
             last_toggle = current_time
+            metrics.blink_jitter_seconds.observe(elapsed_since_toggle - off_time)
+            metrics.gpio_writes.inc()
         
+        heartbeat.beat()
         time.sleep(check_interval)
     
     led.off()
+    metrics.gpio_writes.inc()
 
 
 def get_location():
     """Detect geographical location via IP geolocation.
 
     Tries multiple providers in order.
-    Returns (latitude, longitude, altitude_meters).
-    Altitude defaults to 0.0 (not critical for ISS tracking).
+    Returns (latitude, longitude, altitude_meters, time zone name).
+    Altitude defaults to 0.0 (not critical for ISS tracking). The zone
+    (e.g. "America/Toronto") is what feeds quoting local times need.
     """
 
     providers = [
@@ -231,18 +292,21 @@ def get_location():
             "url": "https://ipapi.co/json/",
             "lat": lambda d: d.get("latitude"),
             "lon": lambda d: d.get("longitude"),
+            "tz": lambda d: d.get("timezone"),
         },
         {
             "name": "ipinfo",
             "url": "https://ipinfo.io/json",
             "lat": lambda d: float(d["loc"].split(",")[0]) if "loc" in d else None,
             "lon": lambda d: float(d["loc"].split(",")[1]) if "loc" in d else None,
+            "tz": lambda d: d.get("timezone"),
         },
         {
             "name": "ifconfig",
             "url": "https://ifconfig.co/json",
             "lat": lambda d: d.get("latitude"),
             "lon": lambda d: d.get("longitude"),
+            "tz": lambda d: d.get("time_zone"),
         },
     ]
 
@@ -264,103 +328,111 @@ def get_location():
 
             lat = float(lat)
             lon = float(lon)
+            tz = provider["tz"](data) or DEFAULT_TIMEZONE
 
-            print(
+            log.info(
                 f"Detected location via {provider['name']}: "
-                f"{lat:.4f}, {lon:.4f}, alt 0m"
+                f"{lat:.4f}, {lon:.4f}, alt 0m, {tz}"
             )
 
-            return lat, lon, 0.0
+            return lat, lon, 0.0, tz
 
         except Exception as exc:
-            print(f"Location provider {provider['name']} failed ({exc})")
+            log.warning(f"Location provider {provider['name']} failed ({exc})")
 
     # Final fallback (only if all providers fail)
-    print("All location providers failed, using default coordinates.")
-    return 43.577090, -79.727520, 128.0
-
-
-def get_satellite_data():
-    """Load TLE data for ISS, using local cache when available."""
-    ts = load.timescale()
-    should_download = True
-
-    if os.path.exists(CACHE_FILE):
-        age = time.time() - os.path.getmtime(CACHE_FILE)
-        if age < (TLE_REFRESH_HOURS * 3600):
-            should_download = False
-
-    try:
-        satellites = load.tle_file(
-            TLE_URL,
-            filename=CACHE_FILE,
-            reload=should_download,
-        )
-    except Exception as exc:
-        # If download failed but cache exists, try using the cached file only.
-        print(f"TLE download failed ({exc}).")
-        if os.path.exists(CACHE_FILE):
-            print("Using cached TLE file.")
-            satellites = load.tle_file(CACHE_FILE)
-        else:
-            raise
-
-    by_name = {sat.name: sat for sat in satellites}
-    return by_name['ISS (ZARYA)'], ts
-
-
-def get_sunrise_sunset(observer_topos: Topos, date_t, ts, ephemeris):
+    log.warning("All location providers failed, using default coordinates.")
+    return 43.577090, -79.727520, 128.0, DEFAULT_TIMEZONE
+
+
+def set_stage(stage: str) -> None:
+    """Record the current alert stage for /status."""
+    tracker_status["alert_stage"] = stage
+
+
+def status_json():
+    """/status route: tracker state plus live position and TLE age."""
+    status = dict(tracker_status)
+    now = utc_now()
+    status["now"] = now.isoformat()
+
+    if status["tle_epoch"]:
+        epoch = datetime.fromisoformat(status["tle_epoch"])
+        status["tle_age_hours"] = round((now - epoch).total_seconds() / 3600, 2)
+
+    next_pass = status["next_pass"]
+    if next_pass:
+        rise = datetime.fromisoformat(next_pass["rise"].replace("Z", "+00:00"))
+        status["seconds_to_rise"] = round((rise - now).total_seconds())
+
+    if "satellite" in _live:
+        satellite, observer, ts = _live["satellite"], _live["observer"], _live["ts"]
+        alt, az, distance = (satellite - observer).at(ts.now()).altaz()
+        status["live"] = {
+            "altitude": round(alt.degrees, 2),
+            "azimuth": round(az.degrees, 2),
+            "distance_km": round(distance.km, 1),
+        }
+    elif "pass" in _live:
+        # Following a server schedule: only the pass's own track is known
+        position = _live["pass"].position_at(now)
+        if position:
+            status["live"] = {"altitude": round(position[0], 2), "azimuth": round(position[1], 2)}
+    return "application/json", json.dumps(status)
+
+
+def play_alerts(scheduled) -> None:
     """
-    Calculate sunrise and sunset times for a given date.
-    Returns (sunrise_time, sunset_time) as Skyfield Time objects.
-    
-    Args:
-        observer_topos: Observer's location
-        date_t: Skyfield Time object for the date
-        ts: Skyfield timescale
-        ephemeris: Ephemeris data
+    Run a pass's event timeline up to its rise. Each LED step blinks until
+    the next later event; steps already over (a late start) are skipped.
     """
-    earth = ephemeris['earth']
-    observer = earth + observer_topos
-    
-    # Start at midnight of the given date
-    dt = date_t.utc_datetime().replace(hour=0, minute=0, second=0, microsecond=0)
-    t0 = ts.from_datetime(dt)
-    t1 = ts.from_datetime(dt + timedelta(days=1))
-    
-    # Find sunrise/sunset events
-    times, events = almanac.find_discrete(t0, t1, almanac.sunrise_sunset(ephemeris, observer_topos))
-    
-    sunrise = None
-    sunset = None
-    
-    for t, is_sunrise in zip(times, events):
-        if is_sunrise:
-            sunrise = t
-        else:
-            sunset = t
-    
-    return sunrise, sunset
+    events = [e for e in scheduled.events if e[0] <= 0 and e[1] != "direction"]
+    flag_up = False
+    for i, (offset, target, value) in enumerate(events):
+        heartbeat.beat()
+        start = scheduled.rise + timedelta(seconds=offset)
+        end = scheduled.rise + timedelta(seconds=next((e[0] for e in events[i + 1:] if e[0] > offset), 0))
+        if utc_now() >= end:
+            continue
+        sleep_until(start, max_step=HEARTBEAT_STEP, tick=heartbeat.beat)
+
+        if target == "servo":
+            if value == "up":
+                log.info("Raising flag")
+                set_stage("flag_raised")
+                set_servo(SERVO_UP, hold_torque=True)
+                flag_up = True
+                raise_error = (utc_now() - start).total_seconds()
+                if abs(raise_error) > WAKE_TOLERANCE:
+                    log.warning(f"Flag raised {raise_error:+.1f}s off schedule")
+            continue
+
+        led = ALERT_LEDS.get(target)
+        if led is None:
+            log.warning(f"Ignoring unknown schedule event '{target}'")
+            continue
+        for other in ALERT_LEDS.values():
+            if other is not led:
+                other.off()
+        if not flag_up:
+            set_stage("alert_" + target.split("_", 1)[1])
+        log.info(f"{-offset // 60:.0f}-minute alert ({value:g}s blink)")
+        blink_led(led, (end - utc_now()).total_seconds(), value)
+
+
+def track_pass(scheduled, until: datetime) -> None:
+    """Show the pass's direction on the direction LEDs until the given time."""
+    while True:
+        heartbeat.beat()
+        now = utc_now()
+        if now > until:
+            break
 
+        position = scheduled.position_at(now)
+        if position and position[0] > 0:
+            update_direction_leds(position[1])
 
-def is_visible_at_night(observer_topos: Topos, pass_time_t, ts, ephemeris) -> bool:
-    """
-    Check if a pass occurs during night time (sun below horizon).
-    
-    Args:
-        observer_topos: Observer's location
-        pass_time_t: Skyfield Time object for the pass
-        ts: Skyfield timescale
-        ephemeris: Ephemeris data
-    """
-    # Check sun elevation - simpler and more reliable than sunrise/sunset bracketing
-    sun = ephemeris['sun']
-    earth = ephemeris['earth']
-    observer = earth + observer_topos
-    alt, _, _ = observer.at(pass_time_t).observe(sun).apparent().altaz()
-    
-    # Sun must be at least 6 degrees below horizon (civil twilight)
-    return alt.degrees < -6.0
+        time.sleep(0.5)
 
 
 # ----------------------------
@@ -368,182 +440,168 @@ def is_visible_at_night(observer_topos: Topos, pass_time_t, ts, ephemeris) -> bo
 # ----------------------------
 
 def main() -> None:
-    print("--- Starting ISS Tracker ---")
+    buffered_log.setup("iss_tracker")
+    log.info("--- Starting ISS Tracker ---")
+    boot_timeline.mark("tracker_start")
 
-    # Load ephemeris for sun calculations
-    eph = load('de421.bsp')
+    try:
+        metrics.add_route("/logs", buffered_log.dump_text)
+        metrics.add_route("/status", status_json)
+        metrics.start_server()
+    except OSError as exc:
+        log.warning(f"Metrics endpoint disabled ({exc})")
 
     # Detect location automatically
-    latitude, longitude, elevation = get_location()
-    observer_location = Topos(latitude, longitude, elevation_m=elevation)
+    started = time.monotonic()
+    latitude, longitude, elevation, tz = get_location()
+    metrics.location_lookup_seconds.observe(time.monotonic() - started)
+    tracker_status["location"] = {"latitude": latitude, "longitude": longitude, "elevation_m": elevation,
+                                  "timezone": tz}
+    registration = dict(tracker_status["location"], min_elevation=MIN_ELEVATION,
+                        satellites=SATELLITES, guard=SCHEDULE_GUARD)
 
     # Reset LEDs and servo
     reset_leds()
     set_servo(SERVO_DOWN, hold_torque=False)
     
-    # Run hardware test
+    # Run hardware test (the first time the LEDs light up after boot)
+    boot_timeline.mark("first_led_output")
     test_hardware()
+    heartbeat.ready("Predicting passes")
+
+    providers = pass_providers.build_providers(PASS_PROVIDERS, CACHE_FILE, TLE_URL, TLE_REFRESH_HOURS)
+    store = pass_providers.PassStore()
 
     while True:
+        heartbeat.beat()
         try:
-            # Load ISS TLE data
-            iss, ts = get_satellite_data()
-
-            # Calculate passes for next 24 hours
-            t0 = ts.now()
-            t1 = ts.from_datetime(t0.utc_datetime() + timedelta(days=1))
-            times, events = iss.find_events(
-                observer_location, t0, t1, altitude_degrees=MIN_ELEVATION
+            set_stage("predicting")
+            prediction_started = time.monotonic()
+
+            # First provider that answers, unless the stored passes are still good
+            source, schedule = pass_providers.get_passes(providers, store, registration)
+            provider = next((p for p in providers if p.name == source), None)
+            tracker_status["source"] = source
+            _live.clear()
+            if provider and provider.live:
+                _live.update(provider.live)
+            if provider and provider.tle_epoch:
+                tracker_status["tle_epoch"] = provider.tle_epoch.isoformat()
+            tracker_status["passes"] = (provider.predicted if provider and provider.predicted is not None
+                                        else [p.as_record() for p in schedule])
+            try:
+                shared_schedule.write(schedule, source)  # For check_passes.py and other readers
+            except OSError as exc:
+                log.warning(f"Could not write shared schedule: {exc}")
+
+            next_pass = next((p for p in schedule if p.rise > utc_now()), None)
+            metrics.prediction_seconds.observe(time.monotonic() - prediction_started)
+            boot_timeline.mark("tracker_first_prediction")  # Only the first call is recorded
+
+            tracker_status["schedule"] = [p.as_record() for p in schedule]
+            tracker_status["predicted_at"] = utc_now().isoformat()
+            tracker_status["next_pass"] = None
+
+            # If we didn't find any visible pass, wait an hour and try again
+            if next_pass is None:
+                log.info("No visible pass ahead, sleeping 1 hour.")
+                set_stage("no_visible_pass")
+                heartbeat.status("No visible pass ahead")
+                sleep_until(utc_now() + timedelta(hours=1), max_step=HEARTBEAT_STEP, tick=heartbeat.beat)
+                continue
+
+            if "by_name" in _live:
+                _live.update(satellite=_live["by_name"][next_pass.satellite])
+            else:
+                _live["pass"] = next_pass
+            if next_pass.tle_epoch and not tracker_status["tle_epoch"]:
+                # Passes reused from the store after a restart carry their epoch
+                tracker_status["tle_epoch"] = datetime.fromtimestamp(next_pass.tle_epoch, tz=timezone.utc).isoformat()
+
+            # Widen the alerts by the expected timing error of the elements,
+            # and leave the flag down when that error is too large
+            margin = next_pass.uncertainty() or 0.0
+            raise_flag = margin <= schedule_client.MAX_RISE_ERROR
+            metrics.rise_uncertainty.set(margin)
+            if margin:
+                next_pass = next_pass._replace(
+                    events=schedule_client.widen_timeline(next_pass.events, margin, flag=raise_flag))
+            if not raise_flag:
+                log.warning(f"Elements too old for this pass (rise ±{margin:.0f}s), LED countdown only")
+
+            rise_dt, set_dt = next_pass.rise, next_pass.set + timedelta(seconds=margin)
+            record = next_pass.as_record()
+            tracker_status["next_pass"] = {key: record[key] for key in ("satellite", "rise", "peak", "set")}
+            tracker_status["next_pass"].update(rise_uncertainty_s=round(margin), raise_flag=raise_flag)
+
+            # Calculate duration and time to rise
+            duration_sec = (next_pass.set - rise_dt).total_seconds()
+            seconds_to_rise = (rise_dt - utc_now()).total_seconds()
+
+            # Start direction (azimuth at rise)
+            start_direction = ("unknown" if next_pass.rise_azimuth is None
+                               else azimuth_to_direction(next_pass.rise_azimuth))
+
+            # Convert to EST (UTC-5)
+            est_offset = timezone(timedelta(hours=-5))
+            rise_dt_est = rise_dt.astimezone(est_offset)
+            
+            # Format time to rise as Xh Ym Zs
+            hours = int(seconds_to_rise // 3600)
+            minutes = int((seconds_to_rise % 3600) // 60)
+            seconds = int(seconds_to_rise % 60)
+
+            log.info(
+                f"Next visible pass: {next_pass.satellite} at {rise_dt.strftime('%Y-%m-%d %H:%M:%S')} UTC / "
+                f"{rise_dt_est.strftime('%Y-%m-%d %H:%M:%S')} EST, "
+                f"duration {duration_sec:.0f}s, start direction {start_direction}, "
+                f"starts in {hours}h {minutes}m {seconds}s"
             )
 
-            next_pass_found = False
-
-            # Iterate to find first visible pass
-            for i in range(len(times)):
-                if events[i] != 0:
-                    # 0 = rise, 1 = peak, 2 = set
-                    continue
-
-                if i + 2 >= len(times):
-                    # Ensure we have rise-peak-set trio
-                    break
-
-                rise_t, peak_t, set_t = times[i], times[i + 1], times[i + 2]
-
-                # Skip if peak occurs during daylight
-                if not is_visible_at_night(observer_location, peak_t, ts, eph):
-                    print(f"Skipping pass at {rise_t.utc_iso()} (daylight)")
-                    continue
-
-                next_pass_found = True
-
-                # Calculate duration and time to rise
-                now_ts = ts.now()
-                rise_dt = rise_t.utc_datetime()
-                set_dt = set_t.utc_datetime()
-                duration_sec = (set_dt - rise_dt).total_seconds()
-                seconds_to_rise = (rise_dt - now_ts.utc_datetime()).total_seconds()
-
-                # Calculate start direction (azimuth at rise)
-                difference = iss - observer_location
-                alt, az, _ = difference.at(rise_t).altaz()
-                start_direction = azimuth_to_direction(az.degrees)
-
-                # Convert to EST (UTC-5)
-                est_offset = timezone(timedelta(hours=-5))
-                rise_dt_est = rise_dt.replace(tzinfo=timezone.utc).astimezone(est_offset)
-                
-                # Format time to rise as Xh Ym Zs
-                hours = int(seconds_to_rise // 3600)
-                minutes = int((seconds_to_rise % 3600) // 60)
-                seconds = int(seconds_to_rise % 60)
-
-                print(
-                    f"Next visible pass: {rise_dt.strftime('%Y-%m-%d %H:%M:%S')} UTC / "
-                    f"{rise_dt_est.strftime('%Y-%m-%d %H:%M:%S')} EST, "
-                    f"duration {duration_sec:.0f}s, start direction {start_direction}, "
-                    f"starts in {hours}h {minutes}m {seconds}s"
-                )
-
-                # Sleep until 32 minutes before rise (gives time for LEDs to start)
-                time_to_wait = seconds_to_rise - 1920  # 32 minutes
-                if time_to_wait > 0:
-                    time.sleep(time_to_wait)
-
-                # Progressive countdown with accelerating blink patterns
-                while True:
-                    now = ts.now().utc_datetime()
-                    remaining = (rise_dt - now).total_seconds()
-
-                    if now > set_dt:
-                        # Pass is over
-                        break
-
-                    # 30-10 minute countdown (Red LED with progressive blinking)
-                    if remaining > ALERT_10M:
-                        if remaining > 1500:  # 25-30 min
-                            print("30-minute alert (very slow blink)")
-                            blink_led(led_30m, min(300, remaining - 1500), 4.0)
-                        elif remaining > 1200:  # 20-25 min
-                            print("25-minute alert (slow blink)")
-                            blink_led(led_30m, min(300, remaining - 1200), 3.0)
-                        elif remaining > 900:  # 15-20 min
-                            print("20-minute alert (medium blink)")
-                            blink_led(led_30m, min(300, remaining - 900), 2.0)
-                        elif remaining > ALERT_10M:  # 10-15 min
-                            print("15-minute alert (fast blink)")
-                            blink_led(led_30m, min(300, remaining - ALERT_10M), 1.0)
-
-                    # 10-5 minute countdown (Yellow LED with progressive blinking)
-                    elif remaining > ALERT_5M:
-                        led_30m.off()
-                        if remaining > 480:  # 8-10 min
-                            print("10-minute alert (slow blink)")
-                            blink_led(led_10m, min(120, remaining - 480), 3.0)
-                        elif remaining > 360:  # 6-8 min
-                            print("8-minute alert (medium blink)")
-                            blink_led(led_10m, min(120, remaining - 360), 2.0)
-                        elif remaining > ALERT_5M:  # 5-6 min
-                            print("6-minute alert (fast blink)")
-                            blink_led(led_10m, min(60, remaining - ALERT_5M), 1.0)
-
-                    # 5-0 minute countdown (Green LED with progressive blinking)
-                    elif remaining > 0:
-                        led_10m.off()
-                        if remaining > 180:  # 3-5 min
-                            print("5-minute alert (medium blink)")
-                            blink_led(led_5m, min(120, remaining - 180), 2.0)
-                        elif remaining > 60:  # 1-3 min
-                            print("3-minute alert (fast blink)")
-                            blink_led(led_5m, min(120, remaining - 60), 1.0)
-                        elif remaining > 0:  # 0-1 min
-                            print("1-minute alert (rapid blink, raising flag)")
-                            set_servo(SERVO_UP, hold_torque=True)
-                            blink_led(led_5m, remaining, 0.5)
-                            break
-
-                    time.sleep(0.5)
-
-                # During the pass - only show directional LEDs
-                led_5m.off()
-                print("Pass in progress - showing direction")
-                
-                while True:
-                    now = ts.now().utc_datetime()
-                    if now > set_dt:
-                        break
-                    
-                    difference = iss - observer_location
-                    alt, az, _ = difference.at(ts.now()).altaz()
-                    
-                    if alt.degrees > 0:
-                        update_direction_leds(az.degrees)
-                    
-                    time.sleep(0.5)
-
-                # Reset hardware after pass
-                print("Pass complete, lowering flag.")
-                reset_leds()
-                set_servo(SERVO_DOWN, hold_torque=False)
-                break  # Break out of event loop, re-calc passes
+            # Sleep until 2 minutes before the first alert (gives time for LEDs to start).
+            # Deadline-based so NTP steps and suspend trigger a re-plan.
+            first_alert = min(offset for offset, _, _ in next_pass.events)
+            heartbeat.status(f"Next pass {next_pass.satellite} {rise_dt.strftime('%Y-%m-%d %H:%M:%S')} UTC")
+            set_stage("waiting")
+            wake = sleep_until(
+                rise_dt + timedelta(seconds=first_alert - 120), max_step=HEARTBEAT_STEP, tick=heartbeat.beat
+            )
+            if not wake.already_due:
+                metrics.wake_lateness_seconds.observe(wake.lateness)
+            if wake.clock_jumped:
+                log.warning("Clock moved while waiting, re-planning passes.")
+                continue
 
-            # If we didn't find any visible pass, wait an hour and try again
-            if not next_pass_found:
-                print("No visible pass in next 24h, sleeping 1 hour.")
-                time.sleep(3600)
+            # Progressive countdown with accelerating blink patterns
+            play_alerts(next_pass)
+
+            # During the pass - only show directional LEDs
+            led_5m.off()
+            log.info("Pass in progress - showing direction")
+            set_stage("tracking")
+
+            with profiling.phase("tracking_loop"):
+                track_pass(next_pass, set_dt)
+
+            # Reset hardware after pass
+            log.info("Pass complete, lowering flag.")
+            reset_leds()
+            set_servo(SERVO_DOWN, hold_torque=False)
 
         except Exception as e:
-            print(f"Error: {e}")
+            log.exception(f"Error: {e}")
+            set_stage("error")
             reset_leds()
             set_servo(SERVO_DOWN, hold_torque=False)
-            time.sleep(60)
+            heartbeat.status(f"Error: {e}")
+            sleep_until(utc_now() + timedelta(seconds=60), max_step=HEARTBEAT_STEP, tick=heartbeat.beat)
 
 
 if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
-        print("Exiting on Ctrl+C, cleaning up GPIO.")
+        log.info("Exiting on Ctrl+C, cleaning up GPIO.")
         reset_leds()
         set_servo(SERVO_DOWN, hold_torque=False)
         pi.stop()
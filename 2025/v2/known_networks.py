@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""known_networks.py
+Ranked history of Wi-Fi networks PieSS has joined successfully.
+
+The portal records every successful connect here and boot_orchestrator.py
+reads it to decide which networks to try first at boot. Only SSIDs and
+timings are kept: the credentials live in NetworkManager's own connection
+profiles, which `nmcli connection up` reuses.
+
+Standard library only (read by boot_orchestrator.py under the system
+python3). Show the ranking with:
+    python3 known_networks.py
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger("known_networks")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+KNOWN_NETWORKS_FILE = os.environ.get(
+    "PIESS_KNOWN_NETWORKS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "known_networks.json"),
+)
+MAX_NETWORKS = 20          # Oldest entries beyond this are forgotten
+RECENCY_HALF_LIFE = 30     # Days for a success to count half as much in the ranking
+
+_lock = threading.Lock()
+
+
+def load(path: str = KNOWN_NETWORKS_FILE) -> dict:
+    """Return {ssid: entry}; empty if the file is missing or unreadable."""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save(networks: dict, path: str) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(networks, f, indent=1, sort_keys=True)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+def _update(ssid: str, success: bool, connect_seconds: float = None, source: str = "portal",
+            path: str = KNOWN_NETWORKS_FILE) -> None:
+    with _lock:
+        networks = load(path)
+        entry = networks.setdefault(ssid, {
+            "successes": 0, "failures": 0, "last_success": None,
+            "last_failure": None, "avg_connect_seconds": None,
+        })
+        now = time.time()
+        if success:
+            entry["successes"] += 1
+            entry["last_success"] = now
+            entry["source"] = source
+            if connect_seconds is not None:
+                avg = entry["avg_connect_seconds"]
+                entry["avg_connect_seconds"] = round(
+                    connect_seconds if avg is None else 0.7 * avg + 0.3 * connect_seconds, 2)
+        else:
+            entry["failures"] += 1
+            entry["last_failure"] = now
+
+        # Forget the networks least recently seen working
+        if len(networks) > MAX_NETWORKS:
+            for name in ranked(networks)[MAX_NETWORKS:]:
+                del networks[name]
+        try:
+            _save(networks, path)
+        except OSError as exc:
+            log.warning(f"Could not save known networks: {exc}")
+
+
+def record_success(ssid: str, connect_seconds: float = None, source: str = "portal",
+                   path: str = KNOWN_NETWORKS_FILE) -> None:
+    """Remember that ssid connected (and how long it took)."""
+    _update(ssid, True, connect_seconds, source, path)
+
+
+def record_failure(ssid: str, path: str = KNOWN_NETWORKS_FILE) -> None:
+    """Remember a failed attempt, which lowers ssid's ranking."""
+    _update(ssid, False, path=path)
+
+
+def score(entry: dict, now: float = None) -> float:
+    """Recency-weighted successes minus failures; higher is tried first."""
+    now = time.time() if now is None else now
+    last = entry.get("last_success")
+    if not last:
+        return -float(entry.get("failures", 0))
+    age_days = max(0.0, (now - last) / 86400)
+    recency = 0.5 ** (age_days / RECENCY_HALF_LIFE)
+    return recency * (1 + entry.get("successes", 0)) - 0.5 * entry.get("failures", 0)
+
+
+def ranked(networks: dict = None) -> list:
+    """SSIDs ordered best first."""
+    networks = load() if networks is None else networks
+    now = time.time()
+    return sorted(networks, key=lambda ssid: score(networks[ssid], now), reverse=True)
+
+
+if __name__ == "__main__":
+    networks = load()
+    if not networks:
+        print(f"No known networks in {KNOWN_NETWORKS_FILE}")
+    for ssid in ranked(networks):
+        e = networks[ssid]
+        print(f"{score(e):6.2f}  {ssid:32s} ok={e['successes']} failed={e['failures']} "
+              f"avg={e['avg_connect_seconds']}s")
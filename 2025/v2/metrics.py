@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""metrics.py
+Tiny in-process metrics registry with a Prometheus text endpoint.
+
+Updating a metric is a plain attribute update (no locks, no I/O) so it can
+sit in the LED blink loop. Rendering happens only when something scrapes
+http://127.0.0.1:9101/metrics.
+
+Usage as a local scraper stand-in:
+    python3 metrics.py                      # scrape the running tracker
+    python3 metrics.py http://host:port/metrics
+"""
+
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = int(os.environ.get("PIESS_METRICS_PORT", "9101"))
+
+_registry = []
+_routes = {}
+
+log = logging.getLogger("metrics")
+
+
+# ----------------------------
+# METRIC TYPES
+# ----------------------------
+
+class Counter:
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        _registry.append(self)
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+    def samples(self):
+        yield self.name, self.value
+
+
+class Gauge:
+    """Value that can go up and down.
+
+    If fn is given, it is called at scrape time instead of reading value,
+    which keeps expensive readings (RSS, ages) off the hot path.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, fn=None):
+        self.name = name
+        self.help = help_text
+        self.value = 0.0
+        self.fn = fn
+        _registry.append(self)
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def samples(self):
+        yield self.name, self.fn() if self.fn else self.value
+
+
+class Summary:
+    """Count, sum and maximum of observed values (e.g. durations)."""
+
+    kind = "summary"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        _registry.append(self)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.last = value
+        if value > self.max:
+            self.max = value
+
+    def samples(self):
+        yield f"{self.name}_sum", self.sum
+        yield f"{self.name}_count", self.count
+
+    def extra_gauges(self):
+        """Max and last value, exported as separate gauge families."""
+        yield f"{self.name}_max", self.max
+        yield f"{self.name}_last", self.last
+
+
+# ----------------------------
+# RENDERING / SERVING
+# ----------------------------
+
+def resident_memory_bytes() -> float:
+    """Resident set size of this process, read from /proc."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return float(pages * os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def _format(value) -> str:
+    """Sample value as Prometheus text: integers exactly, floats at full precision."""
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def render() -> str:
+    """Render every registered metric in Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        try:
+            for name, value in metric.samples():
+                lines.append(f"{name} {_format(value)}")
+        except Exception as exc:
+            lines.append(f"# {metric.name} unavailable: {exc}")
+        for name, value in getattr(metric, "extra_gauges", tuple)():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def add_route(path: str, fn) -> None:
+    """Serve fn() at path on the metrics endpoint.
+
+    fn returns (content_type, body_text) and runs on the server thread.
+    """
+    _routes[path] = fn
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serve GET /metrics plus any routes added with add_route()."""
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            content_type, text = "text/plain; version=0.0.4", render()
+        elif path in _routes:
+            try:
+                content_type, text = _routes[path]()
+            except Exception as exc:
+                self.send_error(500, str(exc))
+                return
+        else:
+            self.send_error(404)
+            return
+        body = text.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise flood the journal
+
+
+def start_server(host: str = METRICS_HOST, port: int = METRICS_PORT):
+    """Start the metrics endpoint on a daemon thread. Returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+    thread.start()
+    log.info(f"Metrics available at http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def scrape(url: str = f"http://{METRICS_HOST}:{METRICS_PORT}/metrics", timeout: float = 2.0) -> dict:
+    """Fetch a metrics endpoint and parse it into {sample_name: value}."""
+    from urllib.request import urlopen
+
+    with urlopen(url, timeout=timeout) as resp:
+        text = resp.read().decode()
+
+    values = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name, _, value = line.rpartition(" ")
+        values[name] = float(value)
+    return values
+
+
+# ----------------------------
+# TRACKER METRICS
+# ----------------------------
+
+prediction_seconds = Summary("piess_prediction_seconds", "Time spent computing the next visible pass")
+tle_epoch = Gauge("piess_tle_epoch_timestamp_seconds", "Epoch of the loaded TLE (unix time)")
+rise_uncertainty = Gauge("piess_rise_uncertainty_seconds", "Expected rise-time error of the next pass from TLE age")
+tle_refresh_seconds = Summary("piess_tle_refresh_seconds", "Time spent loading or downloading TLE data")
+location_lookup_seconds = Summary("piess_location_lookup_seconds", "Time spent on IP geolocation")
+wake_lateness_seconds = Summary("piess_wake_lateness_seconds", "Lateness of deadline wake-ups")
+blink_jitter_seconds = Summary("piess_blink_jitter_seconds", "LED toggle lateness versus the blink schedule")
+gpio_writes = Counter("piess_gpio_writes_total", "GPIO writes to LEDs and servo")
+passes_found = Counter("piess_passes_found_total", "Visible passes scheduled, each counted once")
+passes_skipped = Counter("piess_passes_skipped_total", "Passes skipped (daylight, too low, or conflicting with a higher priority pass), each counted once")
+Gauge("piess_process_resident_memory_bytes", "Resident set size of the tracker", fn=resident_memory_bytes)
+
+
+def _tle_age() -> float:
+    return time.time() - tle_epoch.value if tle_epoch.value else 0.0
+
+
+Gauge("piess_tle_age_seconds", "Age of the loaded TLE epoch", fn=_tle_age)
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else f"http://{METRICS_HOST}:{METRICS_PORT}/metrics"
+    try:
+        for sample, value in scrape(target).items():
+            print(f"{sample:45s} {value:g}")
+    except OSError as exc:
+        print(f"Could not scrape {target}: {exc}")
+        sys.exit(1)
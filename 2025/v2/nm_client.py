@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""nm_client.py
+Long-lived D-Bus connection to NetworkManager for the setup portal.
+
+Every `sudo nmcli ...` the portal runs costs a fork, sudo/PAM and nmcli's
+own start-up, which is slow on a Pi. NMClient keeps one D-Bus connection
+open (via the pure-Python jeepney library) and answers device status, scan
+lists, rescans and connect requests over it.
+
+Every method returns None when D-Bus is unavailable or refuses the call
+(jeepney missing, polkit denial, NetworkManager restarting), and the caller
+falls back to its existing nmcli subprocess path.
+
+Environment:
+    PIESS_NM_BUS   "SYSTEM" (default) or "SESSION", to test against a
+                   stand-in NetworkManager on a private session bus
+
+Compare per-operation latency against nmcli on the device:
+    python3 nm_client.py --bench
+"""
+
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    from jeepney import DBusAddress, Properties, new_method_call
+    from jeepney.io.blocking import open_dbus_connection
+    from jeepney.wrappers import DBusErrorResponse, unwrap_msg
+except ImportError:  # Optional dependency; nmcli subprocesses are used instead
+    open_dbus_connection = None
+    DBusErrorResponse = Exception
+
+log = logging.getLogger("nm_client")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+NM_BUS = os.environ.get("PIESS_NM_BUS", "SYSTEM").upper()
+NM_NAME = "org.freedesktop.NetworkManager"
+NM_PATH = "/org/freedesktop/NetworkManager"
+DEVICE_IFACE = "org.freedesktop.NetworkManager.Device"
+WIRELESS_IFACE = "org.freedesktop.NetworkManager.Device.Wireless"
+AP_IFACE = "org.freedesktop.NetworkManager.AccessPoint"
+ACTIVE_IFACE = "org.freedesktop.NetworkManager.Connection.Active"
+SETTINGS_PATH = "/org/freedesktop/NetworkManager/Settings"
+SETTINGS_IFACE = "org.freedesktop.NetworkManager.Settings"
+CONNECTION_IFACE = "org.freedesktop.NetworkManager.Settings.Connection"
+CALL_TIMEOUT = 10  # Seconds to wait for a D-Bus reply
+
+# NMDeviceState values -> the words `nmcli dev status` prints
+DEVICE_STATES = {
+    10: "unmanaged", 20: "unavailable", 30: "disconnected",
+    40: "connecting (prepare)", 50: "connecting (configuring)",
+    60: "connecting (need authentication)", 70: "connecting (getting IP configuration)",
+    80: "connecting (checking IP connectivity)", 90: "connecting (starting secondary connections)",
+    100: "connected", 110: "deactivating", 120: "connection failed",
+}
+
+# NM80211ApFlags / NM80211ApSecurityFlags bits used to pick key-mgmt
+AP_PRIVACY = 0x1
+KEY_MGMT_PSK = 0x100
+KEY_MGMT_8021X = 0x200
+KEY_MGMT_SAE = 0x400
+
+# NMDeviceType values -> nmcli TYPE column
+DEVICE_TYPES = {1: "ethernet", 2: "wifi", 5: "bt", 13: "bridge", 14: "loopback", 30: "wifi-p2p"}
+
+
+class NMClient:
+    """Thread-safe wrapper around one D-Bus connection to NetworkManager."""
+
+    def __init__(self, bus: str = NM_BUS):
+        self.bus = bus
+        self._conn = None
+        self._lock = threading.Lock()
+        self.timings = {}  # operation -> [count, total seconds]
+
+    @property
+    def available(self) -> bool:
+        return open_dbus_connection is not None
+
+    # ----------------------------
+    # D-Bus plumbing
+    # ----------------------------
+
+    def _call(self, msg):
+        """Send one message and return the reply body (reconnects once)."""
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = open_dbus_connection(bus=self.bus)
+            try:
+                return unwrap_msg(self._conn.send_and_get_reply(msg, timeout=CALL_TIMEOUT))
+            except (OSError, ConnectionError, TimeoutError):
+                self._close()
+                if attempt == 2:
+                    raise
+
+    def _close(self):
+        try:
+            if self._conn is not None:
+                self._conn.close()
+        except OSError:
+            pass
+        self._conn = None
+
+    def _method(self, path, interface, method, signature=None, body=()):
+        addr = DBusAddress(path, bus_name=NM_NAME, interface=interface)
+        return self._call(new_method_call(addr, method, signature, body))
+
+    def _prop(self, path, interface, name):
+        addr = DBusAddress(path, bus_name=NM_NAME, interface=interface)
+        return self._call(Properties(addr).get(name))[0][1]
+
+    def _props(self, path, interface):
+        addr = DBusAddress(path, bus_name=NM_NAME, interface=interface)
+        return {k: v[1] for k, v in self._call(Properties(addr).get_all())[0].items()}
+
+    def _run(self, name, fn, *args):
+        """Run fn under the lock, timing it; None if D-Bus is unusable."""
+        if not self.available:
+            return None
+        started = time.monotonic()
+        try:
+            with self._lock:
+                result = fn(*args)
+        except (DBusErrorResponse, OSError, ConnectionError, TimeoutError, KeyError) as exc:
+            log.info(f"D-Bus {name} failed ({exc}), falling back to nmcli")
+            return None
+        entry = self.timings.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += time.monotonic() - started
+        return result
+
+    def _device_path(self, iface):
+        return self._method(NM_PATH, NM_NAME, "GetDeviceByIpIface", "s", (iface,))[0]
+
+    # ----------------------------
+    # Operations
+    # ----------------------------
+
+    def device_state(self, iface: str):
+        """nmcli-style state of iface ('connected', 'disconnected', ...)."""
+        def op():
+            state = self._prop(self._device_path(iface), DEVICE_IFACE, "State")
+            return DEVICE_STATES.get(state, str(state))
+        return self._run("device_state", op)
+
+    def device_status_table(self):
+        """Text equivalent of `nmcli -t -f DEVICE,TYPE,STATE,CONNECTION dev status`."""
+        def op():
+            lines = []
+            for path in self._method(NM_PATH, NM_NAME, "GetDevices")[0]:
+                props = self._props(path, DEVICE_IFACE)
+                connection = "--"
+                if props.get("ActiveConnection", "/") != "/":
+                    connection = self._prop(props["ActiveConnection"], ACTIVE_IFACE, "Id")
+                lines.append(":".join([
+                    props.get("Interface", "?"),
+                    DEVICE_TYPES.get(props.get("DeviceType"), "unknown"),
+                    DEVICE_STATES.get(props.get("State"), "unknown"),
+                    connection,
+                ]))
+            return "\n".join(lines)
+        return self._run("device_status", op)
+
+    def request_scan(self, iface: str):
+        """Ask NetworkManager to rescan. Returns True, or None on failure."""
+        def op():
+            self._method(self._device_path(iface), WIRELESS_IFACE, "RequestScan", "a{sv}", ({},))
+            return True
+        return self._run("request_scan", op)
+
+    def access_points(self, iface: str):
+        """
+        NetworkManager's current scan list as portal network dicts, each with
+        "age": seconds since NM last saw it (None if never).
+        """
+        def op():
+            now = time.clock_gettime(time.CLOCK_BOOTTIME)  # LastSeen's clock
+            device = self._device_path(iface)
+            active = self._prop(device, WIRELESS_IFACE, "ActiveAccessPoint")
+            networks = []
+            for path in self._method(device, WIRELESS_IFACE, "GetAllAccessPoints")[0]:
+                props = self._props(path, AP_IFACE)
+                security = []
+                if props.get("WpaFlags"):
+                    security.append("WPA1")
+                if props.get("RsnFlags"):
+                    security.append("WPA2")
+                if not security and props.get("Flags", 0) & 0x1:
+                    security.append("WEP")
+                networks.append({
+                    "ssid": bytes(props.get("Ssid", b"")).decode("utf-8", errors="replace"),
+                    "signal": int(props.get("Strength", 0)),
+                    "security": " ".join(security) or "Open",
+                    "in_use": path == active,
+                    "age": now - props["LastSeen"] if props.get("LastSeen", -1) >= 0 else None,
+                })
+            return networks
+        return self._run("access_points", op)
+
+    def _ap_flags(self, device, ssid: bytes):
+        """(Flags, WpaFlags, RsnFlags) of the strongest AP broadcasting ssid, or None."""
+        best = None
+        for path in self._method(device, WIRELESS_IFACE, "GetAllAccessPoints")[0]:
+            props = self._props(path, AP_IFACE)
+            if bytes(props.get("Ssid", b"")) != ssid:
+                continue
+            if best is None or props.get("Strength", 0) > best.get("Strength", 0):
+                best = props
+        if best is None:
+            return None
+        return best.get("Flags", 0), best.get("WpaFlags", 0), best.get("RsnFlags", 0)
+
+    @staticmethod
+    def _security(flags, password: str):
+        """
+        802-11-wireless-security settings for the AP's advertised security,
+        as `nmcli dev wifi connect` would pick them. None for an open
+        network; raises ValueError for ones a password alone can't join.
+        """
+        if not password:
+            return None
+        if flags is None:
+            # Not in the scan list (hidden or out of range): assume WPA-PSK
+            return {"key-mgmt": ("s", "wpa-psk"), "psk": ("s", password)}
+        privacy, wpa, rsn = flags
+        if (wpa | rsn) & KEY_MGMT_PSK:
+            return {"key-mgmt": ("s", "wpa-psk"), "psk": ("s", password)}
+        if rsn & KEY_MGMT_SAE:
+            return {"key-mgmt": ("s", "sae"), "psk": ("s", password)}
+        if (wpa | rsn) & KEY_MGMT_8021X:
+            raise ValueError("WPA-Enterprise networks need more than a password")
+        if privacy & AP_PRIVACY:
+            # 5/13 ASCII or 10/26 hex characters are keys, anything else a passphrase
+            is_key = len(password) in (5, 13) or (
+                len(password) in (10, 26) and all(c in "0123456789abcdefABCDEF" for c in password))
+            return {"key-mgmt": ("s", "none"), "wep-key0": ("s", password),
+                    "wep-key-type": ("u", 1 if is_key else 2)}
+        return None
+
+    def _saved_connection(self, ssid: bytes):
+        """(path, settings) of a saved Wi-Fi profile for ssid, or None."""
+        for path in self._method(SETTINGS_PATH, SETTINGS_IFACE, "ListConnections")[0]:
+            settings = self._method(path, CONNECTION_IFACE, "GetSettings")[0]
+            wireless = settings.get("802-11-wireless", {})
+            if "ssid" in wireless and bytes(wireless["ssid"][1]) == ssid:
+                return path, settings
+        return None
+
+    def connect(self, ssid: str, password: str, iface: str):
+        """
+        Activate a connection to ssid, with key-mgmt taken from the AP's
+        advertised security (WPA/WPA2-PSK, WPA3-SAE or WEP). A saved
+        profile for the SSID is updated and reused, so retries don't pile
+        up profiles.
+
+        Returns (returncode, stdout, stderr) like run_cmd(), or None on
+        D-Bus failure so the caller can use `nmcli dev wifi connect`.
+        """
+        def op():
+            device = self._device_path(iface)
+            raw_ssid = ssid.encode()
+            try:
+                security = self._security(self._ap_flags(device, raw_ssid), password)
+            except ValueError as exc:
+                return 1, "", str(exc)
+
+            saved = self._saved_connection(raw_ssid)
+            if saved is None:
+                settings = {
+                    "connection": {"id": ("s", ssid), "type": ("s", "802-11-wireless")},
+                    "802-11-wireless": {"ssid": ("ay", raw_ssid)},
+                }
+                if security:
+                    settings["802-11-wireless-security"] = security
+                _, active = self._method(
+                    NM_PATH, NM_NAME, "AddAndActivateConnection", "a{sa{sv}}oo", (settings, device, "/"),
+                )
+                return 0, f"Activation started ({active})", ""
+
+            path, settings = saved
+            wireless = dict(settings["802-11-wireless"])
+            if security:
+                settings["802-11-wireless-security"] = security
+                wireless["security"] = ("s", "802-11-wireless-security")
+            else:
+                settings.pop("802-11-wireless-security", None)
+                wireless.pop("security", None)
+            settings["802-11-wireless"] = wireless
+            self._method(path, CONNECTION_IFACE, "Update", "a{sa{sv}}", (settings,))
+            active = self._method(NM_PATH, NM_NAME, "ActivateConnection", "ooo", (path, device, "/"))[0]
+            return 0, f"Activation started ({active}, saved profile)", ""
+        return self._run("connect", op)
+
+    def stats(self) -> dict:
+        """Average latency per operation in milliseconds."""
+        return {name: round(total / count * 1000, 1)
+                for name, (count, total) in self.timings.items() if count}
+
+
+def _bench(iface: str = "wlan0", rounds: int = 10) -> None:
+    """Print D-Bus versus nmcli subprocess latency for read operations."""
+    client = NMClient()
+    commands = {
+        "device_state": ["nmcli", "-t", "-f", "DEVICE,STATE", "dev", "status"],
+        "device_status": ["nmcli", "-t", "-f", "DEVICE,TYPE,STATE,CONNECTION", "dev", "status"],
+        "access_points": ["nmcli", "-t", "-f", "IN-USE,SSID,SIGNAL,SECURITY", "dev", "wifi", "list", "--rescan", "no"],
+    }
+    calls = {
+        "device_state": lambda: client.device_state(iface),
+        "device_status": client.device_status_table,
+        "access_points": lambda: client.access_points(iface),
+    }
+
+    print(f"{'operation':16s} {'nmcli (ms)':>12s} {'D-Bus (ms)':>12s}")
+    for name, cmd in commands.items():
+        started = time.monotonic()
+        for _ in range(rounds):
+            subprocess.run(["sudo"] + cmd, capture_output=True)
+        nmcli_ms = (time.monotonic() - started) / rounds * 1000
+
+        for _ in range(rounds):
+            calls[name]()
+        dbus_ms = client.stats().get(name)
+        print(f"{name:16s} {nmcli_ms:12.1f} {dbus_ms if dbus_ms is not None else 'n/a':>12}")
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        _bench()
+    else:
+        print("Usage: python3 nm_client.py --bench")
+        sys.exit(2)
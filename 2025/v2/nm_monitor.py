@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""nm_monitor.py
+Wait for NetworkManager state changes instead of sleeping a fixed time.
+
+`nmcli monitor` prints a line for every device state and connectivity
+change. The helpers here start the monitor, check the current state (so
+nothing that already happened is missed), then return as soon as a
+matching line arrives or the deadline passes.
+
+Standard library only, so boot_decider.sh can run it with the system
+python3 before the venv is involved:
+    python3 nm_monitor.py --wait-connectivity --timeout 20
+    python3 nm_monitor.py --wait-device wlan0 --timeout 15
+
+Set PIESS_NMCLI to a script that mimics nmcli output to test without
+NetworkManager.
+"""
+
+import argparse
+import logging
+import os
+import re
+import select
+import subprocess
+import sys
+import time
+
+log = logging.getLogger("nm_monitor")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+NMCLI = os.environ.get("PIESS_NMCLI", "nmcli").split()
+ONLINE_CONNECTIVITY = ("full", "limited")  # Same test boot_decider.sh always used
+
+_DEVICE_LINE = re.compile(r"^(\S+): (.+)$")
+_CONNECTIVITY_LINE = re.compile(r"Connectivity is now '(\w+)'")
+
+
+def _query(args, nmcli=None, timeout: float = 5) -> str:
+    try:
+        result = subprocess.run((nmcli or NMCLI) + args, capture_output=True, text=True, timeout=timeout)
+        return result.stdout.strip()
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+
+
+def device_state(iface: str, nmcli=None) -> str:
+    """Current NetworkManager state of iface (e.g. 'connected'), or ''."""
+    for line in _query(["-t", "-f", "DEVICE,STATE", "dev", "status"], nmcli).splitlines():
+        dev, _, state = line.partition(":")
+        if dev == iface:
+            return state
+    return ""
+
+
+def connectivity(nmcli=None) -> str:
+    """Current NetworkManager connectivity ('full', 'limited', 'none', ...)."""
+    return _query(["-t", "-f", "CONNECTIVITY", "general"], nmcli)
+
+
+def _wait(matches, check_now, timeout: float, nmcli=None) -> bool:
+    """
+    Start `nmcli monitor`, then return True as soon as check_now() is true or
+    a monitor line satisfies matches(line). False once timeout expires and a
+    last check_now() also fails.
+
+    The pipe is read unbuffered with os.read() and split into lines here: a
+    buffered reader would hold back the later lines of a burst, and select()
+    would never report them.
+    """
+    deadline = time.monotonic() + timeout
+    try:
+        proc = subprocess.Popen((nmcli or NMCLI) + ["monitor"], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, bufsize=0)
+    except OSError as exc:
+        log.warning(f"nmcli monitor unavailable ({exc}), polling instead")
+        proc = None
+
+    try:
+        # Started the monitor first, so a change between here and the first
+        # monitor line cannot be missed
+        if check_now():
+            return True
+
+        pending = b""
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # A change the monitor didn't report (or reported too late)
+                return check_now()
+
+            if proc is None:
+                time.sleep(min(1.0, remaining))
+                if check_now():
+                    return True
+                continue
+
+            ready, _, _ = select.select([proc.stdout], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(proc.stdout.fileno(), 4096)
+            if not chunk:
+                # Monitor exited: fall back to polling for the rest of the deadline
+                proc.wait()
+                proc = None
+                continue
+            *lines, pending = (pending + chunk).split(b"\n")
+            for line in lines:
+                if matches(line.decode("utf-8", errors="replace").strip()):
+                    return True
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def wait_for_device_state(iface: str, states=("connected",), timeout: float = 15, nmcli=None) -> bool:
+    """Return True as soon as iface reaches one of states, False at the deadline."""
+    def matches(line):
+        m = _DEVICE_LINE.match(line)
+        return bool(m) and m.group(1) == iface and m.group(2) in states
+
+    return _wait(matches, lambda: device_state(iface, nmcli) in states, timeout, nmcli)
+
+
+def wait_for_connectivity(levels=ONLINE_CONNECTIVITY, timeout: float = 20, nmcli=None) -> bool:
+    """Return True as soon as NetworkManager reports connectivity in levels."""
+    def matches(line):
+        m = _CONNECTIVITY_LINE.search(line)
+        return bool(m) and m.group(1) in levels
+
+    return _wait(matches, lambda: connectivity(nmcli) in levels, timeout, nmcli)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Wait for NetworkManager state changes")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--wait-connectivity", action="store_true",
+                       help="wait for full or limited connectivity")
+    group.add_argument("--wait-device", metavar="IFACE",
+                       help="wait for IFACE to reach the 'connected' state")
+    parser.add_argument("--timeout", type=float, default=20, help="deadline in seconds")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    if args.wait_connectivity:
+        ok = wait_for_connectivity(timeout=args.timeout)
+    else:
+        ok = wait_for_device_state(args.wait_device, timeout=args.timeout)
+
+    print(f"[nm_monitor] {'ready' if ok else 'timed out'} after {time.monotonic() - started:.1f}s")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,581 @@
+#!/usr/bin/env python3
+"""pass_providers.py
+Where the tracker's passes come from, behind one interface.
+
+Each provider turns a device location into schedule_client.ScheduledPass
+entries:
+- "server": the central schedule (schedule_server.py via schedule_client)
+- "local": SGP4 on this device (predictor; Skyfield is imported on first use)
+- "spotthestation": NASA Spot the Station text feed (ISS only, visible passes)
+- "open-notify": the iss-pass.json feed the original PieSS used (ISS only,
+  every pass, no direction)
+
+get_passes() asks the providers in order until one answers and keeps the
+answer in a PassStore on disk, so it is reused until its TTL runs out,
+no upcoming pass is left in it, or its provider has newer data (local
+predictions are redone once new elements are downloaded). Only night
+passes above the minimum elevation are kept, whichever provider answered.
+When every provider fails, a stored schedule with a pass still ahead is
+used past its TTL. Low-power units leave "local" out of the order and
+never load Skyfield.
+
+Feed parsers take the raw response, so recorded responses can be replayed:
+    python3 pass_providers.py spotthestation --replay saved_feed.txt
+"""
+
+import argparse
+import functools
+import json
+import logging
+import math
+import os
+import re
+import sys
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import metrics
+import profiling
+import schedule_client
+from schedule_client import ScheduledPass
+
+log = logging.getLogger("pass_providers")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PASS_STORE_FILE = os.path.join(SCRIPT_DIR, "pass_store.json")
+STORE_FORMAT = 2         # 2: stored passes are night-filtered whatever their provider
+REQUEST_TIMEOUT = 10     # Seconds per feed request
+
+LOCAL_DAYS = 3           # Days predicted locally, enough to ride out days offline
+
+# How long each provider's answer is reused before asking again (seconds).
+# Local passes are kept until new elements could be downloaded.
+SERVER_TTL = 3600        # Cheap to ask again: unchanged schedules come back as 304
+FEED_TTL = 1800          # As the 2025 v1 script polled Spot the Station
+
+NIGHT_SUN_ALTITUDE = -6.0  # As predictor.NIGHT_SUN_ALTITUDE, for feeds that don't say
+
+FEED_SATELLITE = "ISS (ZARYA)"  # Both feeds only list the ISS
+OPEN_NOTIFY_URL = "http://api.open-notify.org/iss-pass.json?lat={latitude}&lon={longitude}&alt={elevation_m:.0f}&n=10"
+SPOTTHESTATION_URL = ("https://spotthestation.nasa.gov/trajectory_data.cfm?latitude={latitude}"
+                      "&longitude={longitude}&elevation={elevation_m:.0f}&type=text&apikey={api_key}")
+NASA_API_KEY = os.environ.get("PIESS_NASA_API_KEY", "")
+
+COMPASS = {name: 22.5 * i for i, name in enumerate(
+    "N NNE NE ENE E ESE SE SSE S SSW SW WSW W WNW NW NNW".split())}
+
+
+class PassTally:
+    """
+    A metrics counter bumped once per pass, however often the pass is
+    predicted again: a pass of the same satellite rising within
+    match_window seconds of one already counted is the same pass.
+    """
+
+    def __init__(self, counter, match_window: float = 300):
+        self.counter = counter
+        self.match_window = match_window
+        self.seen = {}  # satellite -> rise times (unix) already counted
+
+    def count(self, satellite: str, rise: float) -> None:
+        now = time.time()
+        rises = [r for r in self.seen.get(satellite, []) if r > now - 86400]
+        if not any(abs(r - rise) < self.match_window for r in rises):
+            rises.append(rise)
+            self.counter.inc()
+        self.seen[satellite] = rises
+
+
+found_tally = PassTally(metrics.passes_found)
+skipped_tally = PassTally(metrics.passes_skipped)
+
+
+class ProviderError(Exception):
+    """A provider could not produce passes; the next one is tried."""
+
+
+class PassProvider:
+    """
+    Source of upcoming passes. Subclasses set name and ttl and implement
+    fetch(). After a fetch, tle_epoch (datetime), predicted (records of
+    every pass considered, including skipped ones) and live (Skyfield
+    objects for a live position) may be filled in for /status.
+    """
+
+    name = "base"
+    ttl = FEED_TTL
+
+    def __init__(self):
+        self.tle_epoch = None
+        self.predicted = None
+        self.live = None
+
+    def outdated(self, fetched: float) -> bool:
+        """True if passes this provider gave at fetched (unix time) should be replaced before their TTL."""
+        return False
+
+    def fetch(self, location: dict) -> list:
+        """
+        Passes for a location, sorted by rise. Raises ProviderError.
+
+        Args:
+            location: Registration dict (latitude, longitude, elevation_m,
+                min_elevation, satellites, guard, and timezone, the
+                observer's IANA zone, for feeds quoting local times)
+        """
+        raise NotImplementedError
+
+
+class ServerProvider(PassProvider):
+    """The central schedule server; schedule_client keeps its own copy for outages."""
+
+    name = "server"
+    ttl = SERVER_TTL
+
+    def __init__(self, url: str = schedule_client.SCHEDULE_URL):
+        super().__init__()
+        self.url = url
+
+    def fetch(self, location: dict) -> list:
+        if not self.url:
+            raise ProviderError("PIESS_SCHEDULE_URL is not set")
+        with profiling.phase("fetch_schedule"):
+            passes = schedule_client.fetch_schedule(location, url=self.url)
+        if passes is None:
+            raise ProviderError(f"no schedule from {self.url}")
+        return passes
+
+
+class LocalProvider(PassProvider):
+    """
+    SGP4 on the device for the next LOCAL_DAYS days; Skyfield and
+    de421.bsp are loaded on first use. Each pass carries its TLE epoch, so
+    alerts widen as the elements age while the unit is offline. Stored
+    passes last the whole predicted window and are only redone early once
+    newer elements have been downloaded.
+    """
+
+    name = "local"
+
+    def __init__(self, tle_file: str, tle_url: str, tle_refresh_hours: float, ephemeris: str = "de421.bsp",
+                 days: float = LOCAL_DAYS):
+        super().__init__()
+        self.ttl = days * 86400
+        self.days = days
+        self.tle_file = tle_file
+        self.tle_url = tle_url
+        self.tle_refresh_hours = tle_refresh_hours
+        self.ephemeris = ephemeris
+        self._eph = None
+
+    def outdated(self, fetched: float) -> bool:
+        """
+        Download elements if the TLE file is due a refresh (with urllib, so
+        no Skyfield is loaded) and report whether it is newer than fetched.
+        A failed download keeps the stored passes.
+        """
+        try:
+            age = time.time() - os.path.getmtime(self.tle_file)
+        except OSError:
+            return True
+        if self.tle_url and age >= self.tle_refresh_hours * 3600:
+            try:
+                data = _download(self.tle_url)
+                if not re.search(rb"^1 .*\n2 ", data, re.MULTILINE):
+                    raise ValueError("response has no TLE lines")
+                tmp = self.tle_file + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, self.tle_file)
+                log.info(f"Downloaded new elements to {self.tle_file}")
+            except (OSError, ValueError) as exc:
+                log.info(f"TLE download failed ({exc}), keeping stored passes")
+                return False
+        return os.path.getmtime(self.tle_file) > fetched
+
+    def _satellites(self, names: list):
+        """
+        Load TLE data for names, using local cache when available.
+
+        Returns:
+            (satellites in priority order, timescale); names missing from the
+            TLE file are logged and left out
+        """
+        import predictor
+
+        started = time.monotonic()
+        by_name, ts, downloaded = predictor.load_satellites(self.tle_file, self.tle_url, self.tle_refresh_hours)
+        satellites = [by_name[name] for name in names if name in by_name]
+        for name in names:
+            if name not in by_name:
+                log.warning(f"{name} not in {self.tle_file}, skipping it")
+        if not satellites:
+            raise ProviderError(f"None of {names} found in {self.tle_file}")
+        metrics.tle_refresh_seconds.observe(time.monotonic() - started)
+        # The oldest elements loaded, so the age gauge errs on the stale side
+        self.tle_epoch = min(sat.epoch.utc_datetime() for sat in satellites)
+        metrics.tle_epoch.set(self.tle_epoch.timestamp())
+        if not downloaded:
+            age = (datetime.now(timezone.utc) - self.tle_epoch).total_seconds() / 86400
+            log.info(f"Using elements {age:.1f} days old, rise times "
+                     f"±{schedule_client.rise_uncertainty(age):.0f}s now")
+        return satellites, ts
+
+    def _plan(self, passes, location: dict) -> list:
+        """
+        Night-time passes that can be alerted for one after another, keeping
+        the higher priority satellite where two conflict. Daylight and
+        conflicting passes are logged and skipped.
+        """
+        import predictor
+
+        visible = []
+        for p in passes:
+            if p.night:
+                visible.append(p)
+            else:
+                log.info(f"Skipping {p.satellite} pass at {p.rise.utc_iso()} (daylight)")
+                skipped_tally.count(p.satellite, p.rise.utc_datetime().timestamp())
+
+        schedule, dropped = predictor.merge_schedule(visible, location["satellites"], location["guard"])
+        for p in dropped:
+            log.info(f"Skipping {p.satellite} pass at {p.rise.utc_iso()} (conflicts with a higher priority pass)")
+            skipped_tally.count(p.satellite, p.rise.utc_datetime().timestamp())
+        return schedule
+
+    def fetch(self, location: dict) -> list:
+        import predictor
+        from skyfield.api import Topos, load
+
+        if self._eph is None:
+            self._eph = load(self.ephemeris)  # For sun calculations
+        observer = Topos(location["latitude"], location["longitude"], elevation_m=location["elevation_m"])
+
+        with profiling.phase("get_satellite_data"):
+            satellites, ts = self._satellites(location["satellites"])
+        by_name = {sat.name: sat for sat in satellites}
+        self.live = {"satellite": satellites[0], "observer": observer, "ts": ts, "by_name": by_name}
+
+        # Several days of passes, all satellites propagated together
+        t0 = ts.now()
+        t1 = ts.from_datetime(t0.utc_datetime() + timedelta(days=self.days))
+        with profiling.phase("find_passes"):
+            passes = predictor.find_passes_satellites(
+                satellites, observer, t0, t1, location["min_elevation"], self._eph)
+        self.predicted = [p.as_record() for p in passes]
+
+        with profiling.phase("night_filter"):
+            planned = self._plan(passes, location)
+
+        # Same shape as a server schedule, with a track for the direction LEDs
+        return [
+            schedule_client.from_prediction(p, *predictor.sample_track(
+                by_name[p.satellite], observer, p.rise, p.set, schedule_client.TRACK_STEP),
+                tle_epoch=round(by_name[p.satellite].epoch.utc_datetime().timestamp(), 1))
+            for p in planned
+        ]
+
+
+# ----------------------------
+# REMOTE FEEDS
+# ----------------------------
+
+def feed_pass(rise: float, duration: float, max_altitude: float = None, rise_azimuth: float = None,
+              set_azimuth: float = None, night: bool = None, satellite: str = FEED_SATELLITE) -> ScheduledPass:
+    """
+    ScheduledPass from a feed that only gives times (and maybe elevation and
+    direction). The track is empty, so the direction LEDs stay off; night
+    is None when the feed doesn't say (visible_passes() works it out).
+    """
+    rise_dt = datetime.fromtimestamp(rise, tz=timezone.utc)
+    return ScheduledPass(
+        satellite=satellite,
+        rise=rise_dt,
+        peak=rise_dt + timedelta(seconds=duration / 2),
+        set=rise_dt + timedelta(seconds=duration),
+        max_altitude=max_altitude,
+        rise_azimuth=rise_azimuth,
+        set_azimuth=set_azimuth,
+        night=night,
+        sunlit=night,
+        events=schedule_client.alert_timeline(duration),
+        track_alt=[],
+        track_az=[],
+    )
+
+
+def sun_altitude(when: datetime, latitude: float, longitude: float) -> float:
+    """
+    Sun's altitude in degrees for an observer, from the low-precision
+    solar coordinates of the Astronomical Almanac (within 0.01° of
+    Skyfield with de421, far inside the twilight margin), so feed-only
+    units can tell night passes without loading Skyfield.
+    """
+    d = when.timestamp() / 86400 - 10957.5  # Days since J2000.0
+    anomaly = math.radians(357.529 + 0.98560028 * d)
+    ecliptic_lon = math.radians(280.459 + 0.98564736 * d + 1.915 * math.sin(anomaly)
+                                + 0.020 * math.sin(2 * anomaly))
+    obliquity = math.radians(23.439 - 0.00000036 * d)
+    ra = math.atan2(math.cos(obliquity) * math.sin(ecliptic_lon), math.cos(ecliptic_lon))
+    dec = math.asin(math.sin(obliquity) * math.sin(ecliptic_lon))
+    hour_angle = math.radians(280.46061837 + 360.98564736629 * d + longitude) - ra
+    lat = math.radians(latitude)
+    return math.degrees(math.asin(math.sin(lat) * math.sin(dec) + math.cos(lat) * math.cos(dec) * math.cos(hour_angle)))
+
+
+def visible_passes(passes: list, location: dict) -> list:
+    """
+    Passes the tracker should alert for: night passes (night worked out
+    from the sun at peak where the provider left it None) no lower than
+    location["min_elevation"] where the provider gives max_altitude.
+    Skipped passes are logged.
+    """
+    visible = []
+    for p in passes:
+        if p.night is None:
+            p = p._replace(night=sun_altitude(p.peak, location["latitude"], location["longitude"]) < NIGHT_SUN_ALTITUDE)
+        if not p.night:
+            log.info(f"Skipping {p.satellite} pass at {p.rise:%Y-%m-%d %H:%M:%S} UTC (daylight)")
+            skipped_tally.count(p.satellite, p.rise.timestamp())
+        elif p.max_altitude is not None and p.max_altitude < location["min_elevation"]:
+            log.info(f"Skipping {p.satellite} pass at {p.rise:%Y-%m-%d %H:%M:%S} UTC "
+                     f"(max {p.max_altitude:.0f}° below {location['min_elevation']:.0f}°)")
+            skipped_tally.count(p.satellite, p.rise.timestamp())
+        else:
+            visible.append(p)
+    return visible
+
+
+def parse_open_notify(data: bytes) -> list:
+    """Passes in an iss-pass.json response. Raises ValueError if it isn't one."""
+    document = json.loads(data.decode("utf-8"))
+    if document.get("message") != "success":
+        raise ValueError(f"open-notify says {document.get('message')!r}")
+    return [feed_pass(entry["risetime"], entry["duration"]) for entry in document["response"]]
+
+
+def _compass(line: str):
+    """Azimuth of the compass point in e.g. "Approach: 10° above SW", or None."""
+    match = re.search(r"\b([NESW]{1,3})\s*$", line.strip())
+    return COMPASS.get(match.group(1)) if match else None
+
+
+def parse_spotthestation(data: bytes, tz) -> list:
+    """
+    Passes in a Spot the Station text response. Each sighting has its date
+    two lines above "Maximum Elevation:" and its duration in minutes on the
+    line after; "Approach:"/"Departure:" lines, when present, give the
+    direction. Only visible passes are listed, so all are night passes.
+
+    Args:
+        tz: Observer's zone (tzinfo); the feed gives sighting times in it
+    """
+    lines = data.decode("utf-8").split("\n")
+    passes = []
+    for i, line in enumerate(lines):
+        if "Maximum Elevation:" not in line or i < 2 or i + 1 >= len(lines):
+            continue
+        rise = datetime.strptime(lines[i - 2].strip(), "%A %b %d, %Y %I:%M %p").replace(tzinfo=tz)
+        duration = int("".join(filter(str.isdigit, lines[i + 1]))) * 60
+        altitude = re.search(r"(\d+(?:\.\d+)?)", line.split(":", 1)[1])
+        nearby = lines[i + 1:i + 5]
+        approach = next((_compass(l) for l in nearby if "Approach:" in l), None)
+        departure = next((_compass(l) for l in nearby if "Departure:" in l), None)
+        passes.append(feed_pass(rise.timestamp(), duration, float(altitude.group(1)) if altitude else None,
+                                approach, departure, night=True))
+    return passes
+
+
+def _download(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=REQUEST_TIMEOUT) as resp:
+        return resp.read()
+
+
+class FeedProvider(PassProvider):
+    """
+    A remote pass feed: url is formatted with the location, opener fetches
+    it (urllib by default; pass one returning a recorded response to replay
+    it) and parser turns the bytes into passes. A local_time feed's parser
+    also gets tz, the observer's zone from location["timezone"].
+    """
+
+    ttl = FEED_TTL
+
+    def __init__(self, name: str, url: str, parser, opener=None, local_time: bool = False, **params):
+        super().__init__()
+        self.name = name
+        self.url = url
+        self.parser = parser
+        self.opener = opener or _download
+        self.local_time = local_time
+        self.params = params
+
+    def fetch(self, location: dict) -> list:
+        if FEED_SATELLITE not in location["satellites"]:
+            raise ProviderError(f"{self.name} only lists {FEED_SATELLITE}")
+        parser = self.parser
+        if self.local_time:
+            try:
+                parser = functools.partial(parser, tz=ZoneInfo(location["timezone"]))
+            except (KeyError, ValueError, ZoneInfoNotFoundError) as exc:
+                raise ProviderError(f"{self.name} needs the observer's time zone ({exc!r})")
+        url = self.url.format(**location, **self.params)
+        try:
+            passes = parser(self.opener(url))
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            raise ProviderError(f"{self.name} feed unusable ({exc})")
+        return sorted(passes, key=lambda p: p.rise)
+
+
+def build_providers(names: list, tle_file: str, tle_url: str, tle_refresh_hours: float) -> list:
+    """Providers for a configured order of names; unknown names are logged and skipped."""
+    providers = []
+    for name in names:
+        name = name.strip()
+        if name == "server":
+            if not schedule_client.SCHEDULE_URL:
+                log.info("PIESS_SCHEDULE_URL not set, leaving out the server provider")
+                continue
+            providers.append(ServerProvider())
+        elif name == "local":
+            providers.append(LocalProvider(tle_file, tle_url, tle_refresh_hours))
+        elif name == "spotthestation":
+            providers.append(FeedProvider(name, SPOTTHESTATION_URL, parse_spotthestation, local_time=True,
+                                          api_key=NASA_API_KEY))
+        elif name == "open-notify":
+            providers.append(FeedProvider(name, OPEN_NOTIFY_URL, parse_open_notify))
+        elif name:
+            log.warning(f"Unknown pass provider '{name}', skipping it")
+    return providers
+
+
+# ----------------------------
+# PASS STORE
+# ----------------------------
+
+class PassStore:
+    """
+    The last answer from any provider, kept on disk so a restart reuses it.
+    An entry is valid while its TTL lasts, its location matches and it still
+    has a pass that hasn't risen.
+    """
+
+    def __init__(self, path: str = PASS_STORE_FILE):
+        self.path = path
+        self.entry = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                entry = json.load(f)
+            entry["passes"] = [ScheduledPass.from_compact(p) for p in entry["passes"]]
+            return entry if entry.get("format") == STORE_FORMAT else None
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def put(self, source: str, passes: list, ttl: float, location: dict) -> None:
+        now = time.time()
+        self.entry = {"format": STORE_FORMAT, "source": source, "location": location,
+                      "fetched": now, "expires": now + ttl, "passes": passes}
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(dict(self.entry, passes=[p.to_compact() for p in passes]), f)
+            os.replace(tmp, self.path)
+        except OSError as exc:
+            log.warning(f"Could not save pass store: {exc}")
+
+    def is_valid(self, location: dict, now: datetime, allow_expired: bool = False) -> bool:
+        """True if the stored passes can be used at now (past their TTL if allow_expired)."""
+        entry = self.entry
+        if not entry or entry["location"] != location:
+            return False
+        if not allow_expired and now.timestamp() >= entry["expires"]:
+            return False
+        return any(p.rise > now for p in entry["passes"])
+
+    def upcoming(self, now: datetime) -> list:
+        """Stored passes that haven't set yet."""
+        return [p for p in self.entry["passes"] if p.set > now] if self.entry else []
+
+
+def get_passes(providers: list, store: PassStore, location: dict, now: datetime = None):
+    """
+    Upcoming passes from the store if still valid, else from the first
+    provider that answers, kept to visible_passes(). Raises ProviderError when nothing is available.
+
+    Returns:
+        (source name, passes)
+    """
+    now = now or datetime.now(timezone.utc)
+    if store.is_valid(location, now):
+        source = store.entry["source"]
+        stored_by = next((p for p in providers if p.name == source), None)
+        if stored_by is None or not stored_by.outdated(store.entry["fetched"]):
+            return source, store.upcoming(now)
+
+    for provider in providers:
+        try:
+            passes = provider.fetch(location)
+        except ProviderError as exc:
+            log.warning(f"Pass provider {provider.name} failed: {exc}")
+            continue
+        except Exception as exc:  # A broken provider must not stop the others
+            log.exception(f"Pass provider {provider.name} crashed: {exc}")
+            continue
+        passes = visible_passes(passes, location)
+        for p in passes:
+            found_tally.count(p.satellite, p.rise.timestamp())
+        store.put(provider.name, passes, provider.ttl, location)
+        return provider.name, store.upcoming(now)
+
+    if store.is_valid(location, now, allow_expired=True):
+        log.warning(f"No provider answered, using stored passes from {store.entry['source']}")
+        return store.entry["source"], store.upcoming(now)
+    raise ProviderError(f"No passes from {', '.join(p.name for p in providers) or 'any provider'}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fetch passes from PieSS pass providers")
+    parser.add_argument("providers", help="comma-separated order, e.g. server,local or spotthestation")
+    parser.add_argument("--lat", type=float, default=43.577090)
+    parser.add_argument("--lon", type=float, default=-79.727520)
+    parser.add_argument("--elevation", type=float, default=128.0, help="metres")
+    parser.add_argument("--timezone", default="America/Toronto", help="observer's IANA zone, for local-time feeds")
+    parser.add_argument("--replay", metavar="FILE", help="feed response recorded earlier, instead of the network")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[pass_providers] %(message)s")
+    providers = build_providers(args.providers.split(","), "stations.tle",
+                                "https://celestrak.org/NORAD/elements/gp.php?GROUP=stations&FORMAT=tle", 12)
+    if args.replay:
+        with open(args.replay, "rb") as f:
+            recorded = f.read()
+        for provider in providers:
+            if isinstance(provider, FeedProvider):
+                provider.opener = lambda url: recorded
+    location = {"latitude": args.lat, "longitude": args.lon, "elevation_m": args.elevation,
+                "timezone": args.timezone, "min_elevation": 15.0, "satellites": [FEED_SATELLITE],
+                "guard": schedule_client.SCHEDULE_GUARD}
+
+    for provider in providers:
+        try:
+            passes = provider.fetch(location)
+        except ProviderError as exc:
+            print(f"{provider.name}: {exc}")
+            continue
+        print(f"{provider.name}: {len(passes)} pass(es)")
+        for p in passes:
+            alt = f"{p.max_altitude:.0f}°" if p.max_altitude is not None else "?"
+            print(f"  {p.satellite}: Rise: {p.rise:%Y-%m-%d %H:%M:%S} | Set: {p.set:%H:%M:%S} UTC | max {alt}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -84,6 +84,8 @@ apt install -y \
     pigpio \
     hostapd \
     dnsmasq \
+    iw \
+    iptables \
     git \
     nano \
     curl \
@@ -111,6 +113,7 @@ REQUIRED_FILES=(
     "services/boot_decider.service"
     "services/iss_tracker.service"
     "services/wifi_portal.service"
+    "services/ap_led_indicator.service"
     "services/pigpiod.service"
     "templates/wifi_portal.html"
     "templates/wifi_result.html"
@@ -155,16 +158,18 @@ fi
 # Install Python packages
 print_info "Installing Python packages..."
 sudo -u ${PIESS_USER} bash -c "source venv/bin/activate && pip install --upgrade pip"
-sudo -u ${PIESS_USER} bash -c "source venv/bin/activate && pip install flask==3.0.0 skyfield==1.48 requests==2.31.0 pigpio==1.78 gpiozero==2.0.1"
+sudo -u ${PIESS_USER} bash -c "source venv/bin/activate && pip install flask==3.0.0 waitress==3.0.0 skyfield==1.48 requests==2.31.0 pigpio==1.78 gpiozero==2.0.1 jeepney==0.8.0"
 print_success "Python packages installed"
 
 # Create requirements.txt
 cat > requirements.txt << 'EOF'
 flask==3.0.0
+waitress==3.0.0
 skyfield==1.48
 requests==2.31.0
 pigpio==1.78
 gpiozero==2.0.1
+jeepney==0.8.0
 EOF
 chown ${PIESS_USER}:${PIESS_USER} requirements.txt
 
@@ -183,12 +188,16 @@ chmod 600 /etc/hostapd/hostapd.conf
 # Update SSID and password if needed
 sed -i "s/^ssid=.*/ssid=${AP_SSID}/" /etc/hostapd/hostapd.conf
 sed -i "s/^wpa_passphrase=.*/wpa_passphrase=${AP_PASSWORD}/" /etc/hostapd/hostapd.conf
+# Control socket the AP LED indicator attaches to for hostapd events
+grep -q "^ctrl_interface=" /etc/hostapd/hostapd.conf || echo "ctrl_interface=/var/run/hostapd" >> /etc/hostapd/hostapd.conf
 
 print_success "hostapd configured (SSID: ${AP_SSID}, Password: ${AP_PASSWORD})"
 
 # Step 8: Configure dnsmasq
 print_header "Step 8: Configuring DHCP Server"
 cp ${PIESS_DIR}/conf/dnsmasq.conf /etc/dnsmasq.conf
+# Captive-portal DNS config is regenerated by boot_decider.sh in AP mode
+mkdir -p /etc/dnsmasq.d
 print_success "dnsmasq configured"
 
 # Step 9: Configure sudo permissions
@@ -203,6 +212,7 @@ piess ALL=(ALL) NOPASSWD: /usr/bin/systemctl stop dnsmasq
 piess ALL=(ALL) NOPASSWD: /usr/bin/systemctl restart dnsmasq
 piess ALL=(ALL) NOPASSWD: /usr/bin/nmcli
 piess ALL=(ALL) NOPASSWD: /usr/sbin/ip
+piess ALL=(ALL) NOPASSWD: /usr/sbin/iw
 piess ALL=(ALL) NOPASSWD: /usr/bin/kill
 piess ALL=(ALL) NOPASSWD: /bin/sh
 piess ALL=(ALL) NOPASSWD: /bin/rm
@@ -211,6 +221,11 @@ EOF
 chmod 0440 /etc/sudoers.d/piess-sudoers
 print_success "Sudo permissions configured"
 
+# Allow the portal to talk to NetworkManager over D-Bus without sudo
+mkdir -p /etc/polkit-1/rules.d
+cp ${PIESS_DIR}/conf/50-piess-networkmanager.rules /etc/polkit-1/rules.d/
+print_success "NetworkManager D-Bus permissions configured"
+
 # Step 10: Install systemd services
 print_header "Step 10: Installing System Services"
 
@@ -218,6 +233,7 @@ print_header "Step 10: Installing System Services"
 cp ${PIESS_DIR}/services/boot_decider.service /etc/systemd/system/
 cp ${PIESS_DIR}/services/iss_tracker.service /etc/systemd/system/
 cp ${PIESS_DIR}/services/wifi_portal.service /etc/systemd/system/
+cp ${PIESS_DIR}/services/ap_led_indicator.service /etc/systemd/system/
 
 print_success "Service files installed"
 
@@ -245,6 +261,7 @@ systemctl enable iss_tracker.service
 systemctl disable hostapd
 systemctl disable dnsmasq
 systemctl disable wifi_portal
+systemctl disable ap_led_indicator
 print_success "Services enabled"
 
 # Step 14: Configure boot to CLI
@@ -309,6 +326,7 @@ echo "  ├── services/               - Systemd service files"
 echo "  │   ├── boot_decider.service"
 echo "  │   ├── iss_tracker.service"
 echo "  │   ├── wifi_portal.service"
+echo "  │   ├── ap_led_indicator.service"
 echo "  │   └── pigpiod.service"
 echo "  ├── templates/              - Web interface templates"
 echo "  │   ├── wifi_portal.html"
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""portal_events.py
+Server-sent events for the setup portal.
+
+Scan and access point changes are published to an EventBroker; every open
+GET /events stream gets its own queue and receives them as SSE frames, so
+the page can update in place instead of being reloaded.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger("portal_events")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+MAX_SUBSCRIBERS = 4       # Each stream holds a server thread
+KEEPALIVE_INTERVAL = 15   # Seconds between comment frames on an idle stream
+STREAM_LIFETIME = 600     # Close streams after this long; EventSource reconnects
+QUEUE_SIZE = 32           # Events buffered per slow client before dropping
+
+
+class EventBroker:
+    """Fan published events out to per-client queues."""
+
+    def __init__(self, max_subscribers: int = MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self):
+        """Return a new queue, or None if the subscriber limit is reached."""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            q = queue.Queue(maxsize=QUEUE_SIZE)
+            self._subscribers.add(q)
+            return q
+
+    def unsubscribe(self, q) -> None:
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event: str, data=None) -> None:
+        """Send an event (with JSON-serialisable data) to every subscriber."""
+        frame = f"event: {event}\ndata: {json.dumps(data if data is not None else {})}\n\n"
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(frame)
+            except queue.Full:
+                log.info(f"Dropping '{event}' for a slow event client")
+
+    def stream(self, q, initial=None):
+        """
+        Generator of SSE frames for one subscriber; unsubscribes when the
+        client goes away or STREAM_LIFETIME passes.
+
+        Args:
+            q: Queue from subscribe()
+            initial: Optional (event, data) sent first, so a new client
+                     starts from the current state
+        """
+        deadline = time.monotonic() + STREAM_LIFETIME
+        try:
+            yield "retry: 3000\n\n"
+            if initial is not None:
+                event, data = initial
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            while time.monotonic() < deadline:
+                try:
+                    yield q.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(q)
@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+"""predictor.py
+ISS pass prediction shared by iss_tracker.py and check_passes.py.
+
+find_passes() samples the satellite's altitude on a fixed time grid in one
+vectorised SGP4 call, then refines every peak, rise and set for all passes
+at once (golden-section search and bisection on the interpolated track,
+one vectorised call per iteration). find_passes_many() does the same for
+many satellites and observers sharing one SatrecArray propagation, and
+merge_schedule() resolves overlapping passes by priority. Skyfield itself
+is only used for the sun.
+"""
+
+import logging
+import math
+import os
+import time
+from datetime import timedelta
+from typing import NamedTuple
+
+import numpy as np
+from skyfield import almanac
+from skyfield.api import Topos, load
+from skyfield.framelib import itrs
+from sgp4.api import SatrecArray
+from skyfield.sgp4lib import theta_GMST1982
+
+log = logging.getLogger("predictor")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+GRID_STEP = 60.0         # Seconds between altitude samples
+PEAK_ITERATIONS = 30     # Golden-section steps: 2 grid steps -> well under 0.01 s
+EDGE_ITERATIONS = 24     # Bisection steps: half a pass -> well under 0.1 s
+NIGHT_SUN_ALTITUDE = -6.0  # Sun below civil twilight counts as night
+OBSERVER_BLOCK_SAMPLES = 4_000_000  # Altitude grid cells held at once (observers x samples)
+PEAK_PRUNE = 30.0        # Grid maxima this far below the horizon/mask are never passes
+
+EARTH_RADIUS_KM = 6378.137  # For the satellite's shadow test
+_GOLDEN = (math.sqrt(5) - 1) / 2
+_DAY = 86400.0
+
+
+class Pass(NamedTuple):
+    """One complete pass above the elevation mask."""
+
+    rise: object           # Skyfield Time
+    peak: object
+    set: object
+    max_altitude: float    # Degrees
+    rise_azimuth: float    # Degrees
+    set_azimuth: float
+    night: bool            # Observer's sun below NIGHT_SUN_ALTITUDE at peak (None without ephemeris)
+    sunlit: bool           # Satellite in sunlight at peak (None without ephemeris)
+    satellite: str = ""    # Name, as in the TLE file
+
+    @property
+    def duration(self) -> float:
+        return (self.set.tt - self.rise.tt) * _DAY
+
+    def as_record(self) -> dict:
+        """JSON-friendly dict, as served by /status and written by check_passes."""
+        return {
+            "satellite": self.satellite,
+            "rise": self.rise.utc_iso(),
+            "peak": self.peak.utc_iso(),
+            "set": self.set.utc_iso(),
+            "duration_s": round(self.duration),
+            "max_altitude": round(self.max_altitude, 1),
+            "rise_azimuth": round(self.rise_azimuth, 1),
+            "set_azimuth": round(self.set_azimuth, 1),
+            "visible": self.night,
+            "sunlit": self.sunlit,
+        }
+
+
+def load_satellites(cache_file: str, url: str = None, refresh_hours: float = None):
+    """
+    Load TLEs from cache_file, downloading url first if the cache is older
+    than refresh_hours. Falls back to the cache if the download fails.
+
+    Returns:
+        (satellites_by_name, timescale, downloaded)
+    """
+    ts = load.timescale()
+    should_download = url is not None
+    if url is not None and os.path.exists(cache_file) and refresh_hours is not None:
+        should_download = time.time() - os.path.getmtime(cache_file) >= refresh_hours * 3600
+
+    if should_download:
+        try:
+            satellites = load.tle_file(url, filename=cache_file, reload=True)
+        except Exception as exc:
+            log.warning(f"TLE download failed ({exc}).")
+            if not os.path.exists(cache_file):
+                raise
+            log.info("Using cached TLE file.")
+            satellites = load.tle_file(cache_file)
+            should_download = False
+    else:
+        satellites = load.tle_file(cache_file)
+    return {sat.name: sat for sat in satellites}, ts, should_download
+
+
+def get_sunrise_sunset(observer_topos: Topos, date_t, ts, ephemeris):
+    """
+    Calculate sunrise and sunset times for a given date.
+    Returns (sunrise_time, sunset_time) as Skyfield Time objects.
+    """
+    dt = date_t.utc_datetime().replace(hour=0, minute=0, second=0, microsecond=0)
+    t0 = ts.from_datetime(dt)
+    t1 = ts.from_datetime(dt + timedelta(days=1))
+    times, events = almanac.find_discrete(t0, t1, almanac.sunrise_sunset(ephemeris, observer_topos))
+
+    sunrise = None
+    sunset = None
+    for t, is_sunrise in zip(times, events):
+        if is_sunrise:
+            sunrise = t
+        else:
+            sunset = t
+    return sunrise, sunset
+
+
+def is_visible_at_night(observer_topos: Topos, pass_time_t, ephemeris) -> bool:
+    """True if the sun is below civil twilight for the observer at pass_time_t."""
+    observer = ephemeris['earth'] + observer_topos
+    alt, _, _ = observer.at(pass_time_t).observe(ephemeris['sun']).apparent().altaz()
+    return alt.degrees < NIGHT_SUN_ALTITUDE
+
+
+def _sunlit(satellite_km: np.ndarray, sun_km: np.ndarray) -> np.ndarray:
+    """True where the line from the satellite to the sun misses the Earth."""
+    toward_sun = sun_km - satellite_km
+    toward_sun /= np.linalg.norm(toward_sun, axis=1)[:, None]
+    b = np.einsum("ij,ij->i", satellite_km, toward_sun)
+    miss = b * b - (satellite_km ** 2).sum(axis=1) + EARTH_RADIUS_KM ** 2
+    return (miss <= 0) | (b >= 0)
+
+
+class SatelliteTrack:
+    """
+    SGP4 positions of one satellite in the Earth-fixed frame, at times given
+    as days after t0.
+
+    Goes straight from SGP4's TEME output to Earth-fixed coordinates with
+    the GMST rotation SGP4 is defined against, skipping the precession and
+    nutation series Skyfield evaluates for every time in .at(). Polar
+    motion (tens of metres) is ignored, which moves rise and set times by
+    well under a second.
+
+    After propagate(grid), itrf_km() no longer calls SGP4: positions come
+    from cubic Hermite interpolation of the grid's TEME positions and
+    velocities, which for a 60 s grid in low orbit is good to about a metre.
+    """
+
+    def __init__(self, satellite, t0):
+        self.satellite = satellite
+        self.t0 = t0
+        utc = t0.utc_datetime()
+        self.jd_utc = utc.timestamp() / _DAY + 2440587.5
+        self.jd_ut1 = self.jd_utc + float(t0.dut1) / _DAY
+        self._grid = None
+
+    def _sgp4(self, days):
+        """TEME position (km) and velocity (km/day), each (len(days), 3)."""
+        whole = np.floor(self.jd_utc) + np.zeros_like(days)
+        fraction = (self.jd_utc - np.floor(self.jd_utc)) + days
+        _, r, v = self.satellite.model.sgp4_array(whole, fraction)
+        return r, v * _DAY
+
+    def _interpolate(self, days):
+        grid, r, v = self._grid
+        i = np.clip((days // grid[1]).astype(int), 0, len(grid) - 2)
+        h = (grid[i + 1] - grid[i])[:, None]
+        s = ((days - grid[i]) / h[:, 0])[:, None]
+        s2, s3 = s * s, s * s * s
+        return ((2 * s3 - 3 * s2 + 1) * r[i] + (s3 - 2 * s2 + s) * h * v[i]
+                + (3 * s2 - 2 * s3) * r[i + 1] + (s3 - s2) * h * v[i + 1])
+
+    def _to_itrf(self, days, r, direction: int = 1):
+        """Rotate TEME to Earth-fixed (direction -1: Earth-fixed to TEME)."""
+        theta, _ = theta_GMST1982(self.jd_ut1, days)
+        cos_t, sin_t = np.cos(theta), direction * np.sin(theta)
+        x, y, z = r[:, 0], r[:, 1], r[:, 2]
+        return np.column_stack([cos_t * x + sin_t * y, cos_t * y - sin_t * x, z])
+
+    def propagate(self, grid) -> np.ndarray:
+        """Run SGP4 once over an evenly spaced grid from 0 and keep it for itrf_km()."""
+        grid = np.asarray(grid, dtype=float)
+        return self.use_grid(grid, *self._sgp4(grid))
+
+    def use_grid(self, grid, r, v) -> np.ndarray:
+        """Keep TEME r (km) and v (km/day) over grid for itrf_km(); returns grid positions."""
+        self._grid = (grid, r, v)
+        return self._to_itrf(grid, r)
+
+    def itrf_km(self, days) -> np.ndarray:
+        """Earth-fixed positions (km), shape (len(days), 3)."""
+        days = np.asarray(days, dtype=float)
+        r = self._sgp4(days)[0] if self._grid is None else self._interpolate(days)
+        return self._to_itrf(days, r)
+
+    def time(self, days):
+        """Skyfield Time(s) for days after t0."""
+        return self.t0.ts.tt_jd(self.t0.tt + np.asarray(days))
+
+
+
+class SunTrack:
+    """
+    The sun's Earth-fixed position over 0..span days after track.t0.
+    Skyfield (and its nutation series) runs only on hourly samples, held in
+    TEME where the sun barely moves in an hour and interpolated linearly
+    from there. Shared by every satellite with the same t0.
+    """
+
+    def __init__(self, track: SatelliteTrack, span: float, ephemeris):
+        self.track = track
+        self.hours = np.arange(math.floor(span * 24) + 2) / 24
+        sun = ephemeris['earth'].at(track.time(self.hours)).observe(ephemeris['sun']).apparent()
+        self.teme = track._to_itrf(self.hours, sun.frame_xyz(itrs).km.T, direction=-1)
+
+    def itrf_km(self, days) -> np.ndarray:
+        days = np.asarray(days, dtype=float)
+        i = np.clip(np.floor(days * 24).astype(int), 0, len(self.hours) - 2)
+        s = ((days - self.hours[i]) * 24)[:, None]
+        return self.track._to_itrf(days, (1 - s) * self.teme[i] + s * self.teme[i + 1])
+
+
+def propagate_satellites(satellites, t0, grid) -> list:
+    """
+    SatelliteTracks for all satellites over grid, from a single SatrecArray
+    call (one C loop over satellites x times) instead of one per satellite.
+
+    Returns:
+        [(track, grid_itrf_km)] in the order given
+    """
+    tracks = [SatelliteTrack(sat, t0) for sat in satellites]
+    jd = tracks[0].jd_utc
+    whole = np.full_like(grid, math.floor(jd))
+    fraction = (jd - math.floor(jd)) + grid
+    errors, r, v = SatrecArray([sat.model for sat in satellites]).sgp4(whole, fraction)
+    for sat, error in zip(satellites, errors):
+        if error.any():  # Decayed or bad elements; positions are NaN and yield no passes
+            log.warning(f"SGP4 error {error.max()} propagating {sat.name}")
+    return [(track, track.use_grid(grid, r[k], v[k] * _DAY)) for k, track in enumerate(tracks)]
+
+
+class ObserverFrame:
+    """
+    Earth-fixed positions and local east/north/up axes of one or more
+    observers, stacked as (M, 3) arrays so one set of satellite positions
+    can be compared against all of them with array math.
+    """
+
+    def __init__(self, observers):
+        if hasattr(observers, "latitude"):  # A single observer
+            observers = [observers]
+        lat = np.array([o.latitude.radians for o in observers])
+        lon = np.array([o.longitude.radians for o in observers])
+        self.position = np.array([o.itrs_xyz.km for o in observers]).reshape(-1, 3)
+        zero = np.zeros_like(lon)
+        self.east = np.column_stack([-np.sin(lon), np.cos(lon), zero])
+        self.north = np.column_stack([-np.sin(lat) * np.cos(lon), -np.sin(lat) * np.sin(lon), np.cos(lat)])
+        self.up = np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+    def __len__(self) -> int:
+        return len(self.position)
+
+    def grid_altitude(self, itrf_km: np.ndarray, rows=slice(None)) -> np.ndarray:
+        """
+        Geometric altitude in degrees of every position for every observer
+        in rows, shape (observers, positions). Built from matrix products so
+        no (observers, positions, 3) intermediate is allocated.
+        """
+        position, up = self.position[rows], self.up[rows]
+        height = up @ itrf_km.T - np.einsum("ij,ij->i", position, up)[:, None]
+        range_sq = ((itrf_km ** 2).sum(axis=1)[None, :] - 2 * position @ itrf_km.T
+                    + (position ** 2).sum(axis=1)[:, None])
+        return np.degrees(np.arcsin(height / np.sqrt(range_sq)))
+
+    def altitude(self, itrf_km: np.ndarray, which) -> np.ndarray:
+        """Geometric altitude in degrees of each position seen by observer which[i]."""
+        d = itrf_km - self.position[which]
+        return np.degrees(np.arcsin(np.einsum("ij,ij->i", d, self.up[which]) / np.linalg.norm(d, axis=-1)))
+
+    def azimuth(self, itrf_km: np.ndarray, which) -> np.ndarray:
+        d = itrf_km - self.position[which]
+        east = np.einsum("ij,ij->i", d, self.east[which])
+        north = np.einsum("ij,ij->i", d, self.north[which])
+        return np.degrees(np.arctan2(east, north)) % 360.0
+
+
+def find_passes(satellite, observer_topos: Topos, t0, t1, min_elevation: float,
+                ephemeris=None, step: float = GRID_STEP) -> list:
+    """
+    Find every complete pass (rise, peak and set all inside t0..t1) whose
+    peak reaches min_elevation.
+
+    Args:
+        satellite: Skyfield EarthSatellite
+        observer_topos: Observer's location
+        t0, t1: Skyfield Times bounding the search
+        min_elevation: Elevation mask in degrees
+        ephemeris: Optional ephemeris for the night/sunlit flags
+        step: Grid spacing in seconds; passes must last longer than this
+    """
+    return find_passes_many([satellite], [observer_topos], t0, t1, min_elevation, ephemeris, step)[0][0]
+
+
+def find_passes_multi(satellite, observers: list, t0, t1, min_elevation: float,
+                      ephemeris=None, step: float = GRID_STEP) -> list:
+    """
+    find_passes() for many observers against one shared propagation.
+
+    Returns:
+        One list of Pass per observer, in the order given
+    """
+    return find_passes_many([satellite], observers, t0, t1, min_elevation, ephemeris, step)[0]
+
+
+def find_passes_satellites(satellites: list, observer_topos: Topos, t0, t1, min_elevation: float,
+                           ephemeris=None, step: float = GRID_STEP) -> list:
+    """
+    find_passes() for several satellites propagated together.
+
+    Returns:
+        All passes of all satellites, sorted by rise time
+    """
+    found = find_passes_many(satellites, [observer_topos], t0, t1, min_elevation, ephemeris, step)
+    return sorted((p for per_observer in found for p in per_observer[0]), key=lambda p: p.rise.tt)
+
+
+def find_passes_many(satellites: list, observers: list, t0, t1, min_elevation: float,
+                     ephemeris=None, step: float = GRID_STEP) -> list:
+    """
+    Passes of every satellite for every observer.
+
+    All satellites are propagated once over the grid in one SatrecArray
+    call, and every observer's altitude is array math on those positions.
+    Refinement interpolates that same propagation, for all observers'
+    candidates in one call per iteration, so extra observers cost array
+    math only and extra satellites little more.
+
+    Args:
+        satellites: Sequence of Skyfield EarthSatellite
+        observers: Sequence of Topos
+        (others as for find_passes)
+
+    Returns:
+        results[satellite][observer] -> list of Pass, in the orders given
+    """
+    frame = ObserverFrame(observers)
+    span = t1.tt - t0.tt
+    count = int(math.ceil(span * _DAY / step)) + 1
+    if count < 3:
+        return [[[] for _ in range(len(frame))] for _ in satellites]
+
+    # 1. Coarse grid: the only SGP4 run, interpolated for everything below
+    grid = np.minimum(np.arange(count) * (step / _DAY), span)
+    propagated = propagate_satellites(satellites, t0, grid)
+    sun = SunTrack(propagated[0][0], span, ephemeris) if ephemeris is not None else None
+    return [
+        _find_passes(track, frame, grid, grid_itrf, min_elevation, sun)
+        for track, grid_itrf in propagated
+    ]
+
+
+def _find_passes(track: SatelliteTrack, frame: ObserverFrame, grid, grid_itrf,
+                 min_elevation: float, sun: SunTrack = None) -> list:
+    """find_passes_many() for one propagated satellite."""
+    results = [[] for _ in range(len(frame))]
+    count = len(grid)
+
+    def altitude(days, which):
+        return frame.altitude(track.itrf_km(days), which)
+
+    # 2. Per block of observers: local maxima of each altitude row, plus the
+    # grid samples below the mask either side of them (the brackets for
+    # rise and set, taken before the altitude block is dropped)
+    index = np.arange(count)
+    block = max(1, OBSERVER_BLOCK_SAMPLES // count)
+    owner, peak_k, rise_pair, set_pair = [], [], [], []
+    for first in range(0, len(frame), block):
+        rows = slice(first, first + block)
+        alt = frame.grid_altitude(grid_itrf, rows)
+        rising = np.diff(alt, axis=1) > 0
+        o, k = np.nonzero(rising[:, :-1] & ~rising[:, 1:])
+        k += 1
+        # Within a grid step of its peak, a pass that clears the horizon
+        # can't be this far below it; skips the orbits on the far side
+        near = alt[o, k] > min(min_elevation, 0.0) - PEAK_PRUNE
+        o, k = o[near], k[near]
+
+        below = alt < min_elevation
+        last_below = np.maximum.accumulate(np.where(below, index, -1), axis=1)
+        next_below = np.minimum.accumulate(np.where(below, index, count)[:, ::-1], axis=1)[:, ::-1]
+        owner.append(o + first)
+        peak_k.append(k)
+        rise_pair.append(np.column_stack([last_below[o, k - 1], last_below[o, k]]))
+        set_pair.append(np.column_stack([next_below[o, k], next_below[o, k + 1]]))
+
+    owner, peak_k = np.concatenate(owner), np.concatenate(peak_k)
+    rise_pair, set_pair = np.concatenate(rise_pair), np.concatenate(set_pair)
+    if len(peak_k) == 0:
+        return results
+
+    # 3. Refine every candidate peak together (golden-section search)
+    lo = grid[peak_k - 1]
+    hi = grid[peak_k + 1]
+    c = hi - _GOLDEN * (hi - lo)
+    d = lo + _GOLDEN * (hi - lo)
+    fc = altitude(c, owner)
+    fd = altitude(d, owner)
+    for _ in range(PEAK_ITERATIONS):
+        left = fc > fd  # Maximum lies in [lo, d]
+        hi = np.where(left, d, hi)
+        lo = np.where(left, lo, c)
+        # The surviving interior point is reused; only one new one is evaluated
+        new_c = np.where(left, hi - _GOLDEN * (hi - lo), d)
+        new_d = np.where(left, c, lo + _GOLDEN * (hi - lo))
+        probe = altitude(np.where(left, new_c, new_d), owner)
+        fc, fd = np.where(left, probe, fd), np.where(left, fc, probe)
+        c, d = new_c, new_d
+    peak = (lo + hi) / 2
+    peak_alt = np.maximum(fc, fd)
+
+    # 4. Rise and set brackets: the nearest samples below the mask either
+    # side of the refined peak, which may sit on either side of sample k
+    past_k = peak > grid[peak_k]
+    rise_lo = np.where(past_k, rise_pair[:, 1], rise_pair[:, 0])
+    set_hi = np.where(past_k, set_pair[:, 1], set_pair[:, 0])
+
+    # Keep passes reaching the mask, skip those already up at t0 or still
+    # up at t1, and drop duplicate peaks of the same pass
+    keep = (peak_alt >= min_elevation) & (rise_lo >= 0) & (set_hi < count)
+    owner, peak, peak_alt = owner[keep], peak[keep], peak_alt[keep]
+    rise_lo, set_hi = rise_lo[keep], set_hi[keep]
+    _, first = np.unique(owner * (count + 1) + rise_lo, return_index=True)  # Sorted by observer, then time
+    owner, peak, peak_alt = owner[first], peak[first], peak_alt[first]
+    rise_lo, set_hi = rise_lo[first], set_hi[first]
+    n = len(peak)
+    if n == 0:
+        return results
+
+    # 5. Bisect rise (below -> peak) and set (peak -> below) together
+    which = np.concatenate([owner, owner])
+    outside = np.concatenate([grid[rise_lo], grid[set_hi]])
+    inside = np.concatenate([peak, peak])
+    for _ in range(EDGE_ITERATIONS):
+        mid = (outside + inside) / 2
+        up = altitude(mid, which) >= min_elevation
+        inside = np.where(up, mid, inside)
+        outside = np.where(up, outside, mid)
+    edges = (outside + inside) / 2
+    az = frame.azimuth(track.itrf_km(edges), which)
+
+    # 6. Night/sunlit flags at the peaks, for all observers at once
+    night = sunlit = [None] * n
+    if sun is not None:
+        sun_km = sun.itrf_km(peak)
+        night = frame.altitude(sun_km, owner) < NIGHT_SUN_ALTITUDE
+        sunlit = _sunlit(track.itrf_km(peak), sun_km)
+
+    for i in range(n):
+        results[owner[i]].append(Pass(
+            rise=track.time(edges[i]),
+            peak=track.time(peak[i]),
+            set=track.time(edges[n + i]),
+            max_altitude=float(peak_alt[i]),
+            rise_azimuth=float(az[i]),
+            set_azimuth=float(az[n + i]),
+            night=None if night[i] is None else bool(night[i]),
+            sunlit=None if sunlit[i] is None else bool(sunlit[i]),
+            satellite=track.satellite.name,
+        ))
+    return results
+
+
+def sample_track(satellite, observer_topos: Topos, rise, set_, step: float) -> tuple:
+    """
+    Geometric altitude and azimuth (degrees) every step seconds from rise
+    through set, inclusive, for direction LEDs or a schedule's track.
+    """
+    track = SatelliteTrack(satellite, rise)
+    frame = ObserverFrame(observer_topos)
+    count = int(math.ceil((set_.tt - rise.tt) * _DAY / step)) + 1
+    days = np.arange(count) * (step / _DAY)
+    itrf = track.itrf_km(days)
+    which = np.zeros(count, dtype=int)
+    return frame.altitude(itrf, which), frame.azimuth(itrf, which)
+
+
+def merge_schedule(passes: list, priority: list, guard: float = 0.0) -> list:
+    """
+    Merge passes of several satellites into one schedule the hardware can
+    follow, one pass at a time.
+
+    Two passes conflict when the later one rises less than guard seconds
+    after the earlier one sets (its alerts would start mid-pass). The
+    satellite earlier in priority keeps its pass; between equals the
+    earlier pass wins.
+
+    Args:
+        passes: Pass list, any order
+        priority: Satellite names, most wanted first; others rank last
+        guard: Seconds needed between one set and the next rise
+
+    Returns:
+        (schedule, dropped), both sorted by rise time
+    """
+    rank = {name: i for i, name in enumerate(priority)}
+
+    def outranks(a, b):
+        return rank.get(a.satellite, len(rank)) < rank.get(b.satellite, len(rank))
+
+    schedule, dropped = [], []
+    for p in sorted(passes, key=lambda p: p.rise.tt):
+        clashes = 0
+        while clashes < len(schedule) and (p.rise.tt - schedule[-1 - clashes].set.tt) * _DAY < guard:
+            clashes += 1
+        # A winner may displace several lower-priority passes before it
+        if all(outranks(p, q) for q in schedule[len(schedule) - clashes:]):
+            dropped.extend(schedule[len(schedule) - clashes:])
+            del schedule[len(schedule) - clashes:]
+            schedule.append(p)
+        else:
+            dropped.append(p)
+    return schedule, sorted(dropped, key=lambda p: p.rise.tt)
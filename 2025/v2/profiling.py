@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""profiling.py
+Opt-in cProfile/tracemalloc hooks for phases of the tracker loop.
+
+Enable with the environment variable PIESS_PROFILE=1 (e.g. an
+Environment= line in iss_tracker.service). Each wrapped phase then writes a
+.prof file (open with `python3 -m pstats`) and a tracemalloc snapshot to
+PIESS_PROFILE_DIR, keeping only the newest PROFILE_KEEP files, and logs a
+short summary with the memory the phase added. Allocations are only traced
+while a phase runs.
+
+When disabled, phase() returns a shared no-op context manager, so the
+wrapped code runs exactly as before.
+"""
+
+import contextlib
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+from datetime import datetime
+
+log = logging.getLogger("profiling")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+PROFILE_ENABLED = os.environ.get("PIESS_PROFILE", "").lower() in ("1", "true", "yes", "on")
+PROFILE_DIR = os.environ.get("PIESS_PROFILE_DIR", "profiles")
+PROFILE_KEEP = 40          # Newest files kept in PROFILE_DIR
+SUMMARY_FUNCTIONS = 5      # Functions listed in the printed summary
+TRACEMALLOC_FRAMES = 10    # Stack depth recorded per allocation
+
+_NOOP = contextlib.nullcontext()
+
+
+class _ProfiledPhase:
+    """Context manager that profiles one run of a named phase."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.profiler = cProfile.Profile()
+        self.started = 0.0
+        self.owns_tracing = False
+        self.entry = None
+
+    def __enter__(self):
+        # Trace only while a phase runs; a nested phase leaves it to the outer one
+        self.owns_tracing = not tracemalloc.is_tracing()
+        if self.owns_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.entry = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        self.started = time.monotonic()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.disable()
+        elapsed = time.monotonic() - self.started
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if self.owns_tracing:
+            tracemalloc.stop()
+        # Growth over this phase only, not everything traced so far
+        growth = sum(stat.size_diff for stat in snapshot.compare_to(self.entry, "filename"))
+        self.entry = None
+        try:
+            self._write(elapsed, growth, peak, snapshot)
+        except OSError as write_exc:
+            log.warning(f"Could not write {self.name} profile ({write_exc})")
+        return False
+
+    def _write(self, elapsed: float, growth: int, peak: int, snapshot) -> None:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        base = os.path.join(PROFILE_DIR, f"{stamp}_{self.name}")
+
+        self.profiler.dump_stats(f"{base}.prof")
+        snapshot.dump(f"{base}.snap")
+        _rotate()
+
+        out = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=out)
+        stats.sort_stats("cumulative").print_stats(SUMMARY_FUNCTIONS)
+        top = [line.strip() for line in out.getvalue().splitlines()
+               if line.strip()[:1].isdigit() and "function calls" not in line]
+
+        log.info(
+            f"{self.name}: {elapsed:.3f}s, "
+            f"memory {growth / 1024:+.0f} KiB (peak {peak / 1024:.0f} KiB) -> {base}.prof"
+        )
+        for line in top[:SUMMARY_FUNCTIONS]:
+            log.info(f"  {line}")
+
+
+def _rotate() -> None:
+    """Delete all but the newest PROFILE_KEEP files in PROFILE_DIR."""
+    paths = [os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR)]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[PROFILE_KEEP:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def phase(name: str):
+    """Return a context manager that profiles the named phase if enabled."""
+    if not PROFILE_ENABLED:
+        return _NOOP
+    return _ProfiledPhase(name)
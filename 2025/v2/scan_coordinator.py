@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""scan_coordinator.py
+Serialise and coalesce Wi-Fi scans for the setup portal.
+
+Only one scan runs at a time. Requests that arrive while a scan is running
+join it and share its result. Requests that arrive within min_interval of
+the last finished scan get the cached result instead of touching the radio
+again. The scan itself is any callable returning a list of networks, so the
+coordinator can be exercised with a stub in place of nmcli/iw.
+"""
+
+import logging
+import threading
+import time
+
+log = logging.getLogger("scan_coordinator")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+MIN_SCAN_INTERVAL = 10.0  # Seconds between real scans; faster requests reuse the last result
+
+
+class ScanCoordinator:
+    """Run scan_fn at most once at a time and at most once per min_interval."""
+
+    def __init__(self, scan_fn, min_interval: float = MIN_SCAN_INTERVAL, on_result=None):
+        """
+        Args:
+            scan_fn: Callable performing one scan, returning its result
+                     (e.g. a list of networks), or None on failure
+            min_interval: Minimum seconds between the end of one real scan
+                          and the start of the next
+            on_result: Optional callable(result) run after each successful scan
+        """
+        self.scan_fn = scan_fn
+        self.min_interval = min_interval
+        self.on_result = on_result
+
+        self._cond = threading.Condition()
+        self.scanning = False
+        self.generation = 0        # Incremented every time a scan finishes
+        self.result = None         # Result of the last successful scan
+        self.last_finished = None  # time.monotonic() of the last successful scan
+
+        # Statistics; durations cover successful scans only
+        self.scan_count = 0
+        self.failed_count = 0      # Scans refused or failed (no result)
+        self.coalesced_count = 0
+        self.last_duration = 0.0
+        self.total_duration = 0.0
+
+    def request(self, wait: bool = False, timeout: float = None):
+        """
+        Ask for fresh scan results.
+
+        Starts a background scan unless one is already running (join it) or
+        the last one finished less than min_interval ago (reuse it).
+
+        Args:
+            wait: Block until the in-flight or newly started scan finishes
+            timeout: Longest time to block when wait is True (seconds)
+
+        Returns:
+            (started, networks): started is True if this call launched a new
+            scan; networks is the latest result (None if none yet).
+        """
+        with self._cond:
+            generation = self.generation
+            started = False
+
+            if self.scanning:
+                self.coalesced_count += 1
+            elif (self.last_finished is not None and self.result is not None and
+                  time.monotonic() - self.last_finished < self.min_interval):
+                self.coalesced_count += 1
+                return False, self.result
+            else:
+                self.scanning = True
+                started = True
+                threading.Thread(target=self._run, name="wifi-scan", daemon=True).start()
+
+            if wait:
+                self._cond.wait_for(lambda: self.generation > generation, timeout)
+            return started, self.result
+
+    def _run(self) -> None:
+        started = time.monotonic()
+        networks = None
+        try:
+            networks = self.scan_fn()
+        except Exception as exc:
+            log.error(f"Scan error: {exc}")
+
+        # Publish before clearing `scanning` so pollers never see stale data
+        if networks is not None and self.on_result:
+            try:
+                self.on_result(networks)
+            except Exception as exc:
+                log.error(f"Scan result handler failed: {exc}")
+
+        duration = time.monotonic() - started
+        with self._cond:
+            self.scanning = False
+            self.generation += 1
+            if networks is not None:
+                self.result = networks
+                self.last_finished = time.monotonic()
+                self.scan_count += 1
+                self.last_duration = duration
+                self.total_duration += duration
+            else:
+                self.failed_count += 1
+            self._cond.notify_all()
+
+        if networks is not None:
+            log.info(f"Scan #{self.scan_count} took {duration:.1f}s")
+        else:
+            log.info(f"Scan refused or failed after {duration:.1f}s ({self.failed_count} so far)")
+
+    def stats(self) -> dict:
+        """Scan counters and timings for status pages and logs."""
+        with self._cond:
+            return {
+                "scanning": self.scanning,
+                "scan_count": self.scan_count,
+                "failed_count": self.failed_count,
+                "coalesced_count": self.coalesced_count,
+                "last_duration": round(self.last_duration, 2),
+                "average_duration": round(self.total_duration / self.scan_count, 2) if self.scan_count else 0.0,
+            }
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""schedule_client.py
+Thin consumer of schedule_server.py for PieSS devices.
+
+Registers this device's location with the server and fetches its pass
+schedule: compact JSON with each pass's times, LED/servo event timeline
+and alt/az track samples. The last good schedule is kept on disk, so a
+reboot without network still has one. Standard library only: a device
+following the server never imports Skyfield or loads de421.bsp.
+
+    PIESS_SCHEDULE_URL=http://server:8090 python3 schedule_client.py
+"""
+
+import json
+import logging
+import os
+import socket
+import sys
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+log = logging.getLogger("schedule_client")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEDULE_URL = os.environ.get("PIESS_SCHEDULE_URL", "")  # Empty: always predict locally
+DEVICE_ID = os.environ.get("PIESS_DEVICE_ID") or socket.gethostname()
+SCHEDULE_CACHE = os.path.join(SCRIPT_DIR, "schedule_cache.json")
+REQUEST_TIMEOUT = 5      # Seconds per request to the server
+
+FORMAT = 1               # Schedule document layout; bumped on incompatible changes
+TRACK_STEP = 10          # Seconds between track samples
+
+# Alerts before each rise: (seconds before rise, LED, blink period in seconds).
+# Each step blinks until the next one; the flag goes up with the last.
+ALERT_PLAN = (
+    (1800, "led_30m", 4.0),
+    (1500, "led_30m", 3.0),
+    (1200, "led_30m", 2.0),
+    (900, "led_30m", 1.0),
+    (600, "led_10m", 3.0),
+    (480, "led_10m", 2.0),
+    (360, "led_10m", 1.0),
+    (300, "led_5m", 2.0),
+    (180, "led_5m", 1.0),
+    (60, "led_5m", 0.5),
+)
+FLAG_LEAD = 60           # Seconds before rise the servo raises the flag
+
+# TLE error model: the rise-time error (seconds) of elements d days old at
+# the pass is about RISE_ERROR_BASE + RISE_ERROR_RATE*d + RISE_ERROR_DRAG*d².
+# Alerts are widened by it; past MAX_RISE_ERROR the flag stays down.
+RISE_ERROR_BASE = 2.0
+RISE_ERROR_RATE = 2.0    # Seconds per day of age
+RISE_ERROR_DRAG = 1.0    # Seconds per day², drag mismodelling in low orbit
+MAX_RISE_ERROR = 120.0
+
+# Seconds a pass must set before the next one rises: the next pass's first
+# alert, widened by the largest rise error still alerted for, may not start
+# before the previous pass has set. The guard devices register with.
+SCHEDULE_GUARD = ALERT_PLAN[0][0] + MAX_RISE_ERROR
+
+
+def alert_timeline(duration: float) -> list:
+    """
+    Event timeline for one pass, as [seconds after rise, target, value]:
+    LED targets blink with period value, "servo" goes "up" or "down",
+    "direction" starts the direction LEDs.
+    """
+    events = []
+    for lead, led, period in ALERT_PLAN:
+        if lead == FLAG_LEAD:
+            events.append([-lead, "servo", "up"])
+        events.append([-lead, led, period])
+    events.append([0, "direction", "on"])
+    events.append([round(duration, 1), "servo", "down"])
+    return events
+
+
+def rise_uncertainty(age_days: float) -> float:
+    """Expected rise-time error in seconds for elements age_days old at the pass."""
+    age_days = max(age_days, 0.0)
+    return RISE_ERROR_BASE + RISE_ERROR_RATE * age_days + RISE_ERROR_DRAG * age_days ** 2
+
+
+def widen_timeline(events: list, margin: float, flag: bool = True) -> list:
+    """
+    alert_timeline() events moved margin seconds earlier before rise, and
+    the flag lowered margin seconds later. Without flag the servo events
+    are dropped, leaving the LED countdown.
+    """
+    widened = []
+    for offset, target, value in events:
+        if target == "servo" and not flag:
+            continue
+        if offset < 0:
+            offset -= margin
+        elif target == "servo":
+            offset += margin
+        widened.append([round(offset, 1), target, value])
+    return widened
+
+
+def _timestamp(dt: datetime) -> float:
+    return round(dt.timestamp(), 1)
+
+
+def _utc(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+def _round(value, digits: int = 1):
+    """round() that passes None through, for fields a pass feed didn't give."""
+    return None if value is None else round(value, digits)
+
+
+class ScheduledPass(NamedTuple):
+    """
+    One pass as a device follows it; no Skyfield objects. Passes from a
+    feed (pass_providers.py) may have None altitude, azimuths and night,
+    and an empty track.
+    """
+
+    satellite: str
+    rise: datetime           # Timezone-aware UTC
+    peak: datetime
+    set: datetime
+    max_altitude: float
+    rise_azimuth: float
+    set_azimuth: float
+    night: bool
+    sunlit: bool
+    events: list             # alert_timeline()
+    track_alt: list          # Degrees every TRACK_STEP seconds from rise
+    track_az: list
+    track_step: float = TRACK_STEP
+    tle_epoch: float = None  # Unix time of the elements used; None from feeds
+
+    def uncertainty(self):
+        """rise_uncertainty() for this pass, or None when its TLE epoch is unknown."""
+        if self.tle_epoch is None:
+            return None
+        return rise_uncertainty((self.rise.timestamp() - self.tle_epoch) / 86400)
+
+    def position_at(self, when: datetime):
+        """Interpolated (altitude, azimuth) at when, or None outside the track."""
+        offset = (when - self.rise).total_seconds() / self.track_step
+        i = int(offset)
+        if offset < 0 or i >= len(self.track_alt) - 1:
+            return None
+        f = offset - i
+        alt = self.track_alt[i] + f * (self.track_alt[i + 1] - self.track_alt[i])
+        step = (self.track_az[i + 1] - self.track_az[i] + 180) % 360 - 180  # Across north the short way
+        return alt, (self.track_az[i] + f * step) % 360
+
+    def as_record(self) -> dict:
+        """Same shape as predictor.Pass.as_record(), for /status."""
+        return {
+            "satellite": self.satellite,
+            "rise": self.rise.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "peak": self.peak.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "set": self.set.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "duration_s": round((self.set - self.rise).total_seconds()),
+            "max_altitude": _round(self.max_altitude),
+            "rise_azimuth": _round(self.rise_azimuth),
+            "set_azimuth": _round(self.set_azimuth),
+            "visible": self.night,
+            "sunlit": self.sunlit,
+        }
+
+    def to_compact(self) -> dict:
+        """Entry in a schedule document (unix times, tenths of a degree)."""
+        return {
+            "sat": self.satellite,
+            "rise": _timestamp(self.rise),
+            "peak": _timestamp(self.peak),
+            "set": _timestamp(self.set),
+            "alt": _round(self.max_altitude),
+            "az": [_round(self.rise_azimuth), _round(self.set_azimuth)],
+            "night": self.night,
+            "sunlit": self.sunlit,
+            "events": self.events,
+            "track": {
+                "step": self.track_step,
+                "alt": [round(a * 10) for a in self.track_alt],
+                "az": [round(a * 10) for a in self.track_az],
+            },
+            "epoch": self.tle_epoch,
+        }
+
+    @classmethod
+    def from_compact(cls, entry: dict) -> "ScheduledPass":
+        track = entry["track"]
+        return cls(
+            satellite=entry["sat"],
+            rise=_utc(entry["rise"]),
+            peak=_utc(entry["peak"]),
+            set=_utc(entry["set"]),
+            max_altitude=entry["alt"],
+            rise_azimuth=entry["az"][0],
+            set_azimuth=entry["az"][1],
+            night=entry["night"],
+            sunlit=entry["sunlit"],
+            events=entry["events"],
+            track_alt=[a / 10 for a in track["alt"]],
+            track_az=[a / 10 for a in track["az"]],
+            track_step=track["step"],
+            tle_epoch=entry.get("epoch"),
+        )
+
+
+def from_prediction(p, track_alt, track_az, step: float = TRACK_STEP, tle_epoch: float = None) -> ScheduledPass:
+    """ScheduledPass from a predictor.Pass, its sampled track and the epoch (unix time) of its elements."""
+    rise, set_ = p.rise.utc_datetime(), p.set.utc_datetime()
+    return ScheduledPass(
+        satellite=p.satellite,
+        rise=rise,
+        peak=p.peak.utc_datetime(),
+        set=set_,
+        max_altitude=p.max_altitude,
+        rise_azimuth=p.rise_azimuth,
+        set_azimuth=p.set_azimuth,
+        night=p.night,
+        sunlit=p.sunlit,
+        events=alert_timeline((set_ - rise).total_seconds()),
+        track_alt=[float(a) for a in track_alt],
+        track_az=[float(a) for a in track_az],
+        track_step=step,
+        tle_epoch=tle_epoch,
+    )
+
+
+def parse_schedule(document: dict, now: datetime = None) -> list:
+    """Passes in a schedule document that haven't set yet. Raises ValueError if unusable."""
+    if document.get("format") != FORMAT:
+        raise ValueError(f"Unsupported schedule format {document.get('format')}")
+    now = now or datetime.now(timezone.utc)
+    passes = [ScheduledPass.from_compact(entry) for entry in document["passes"]]
+    return [p for p in passes if p.set > now]
+
+
+def _load_cache(path: str):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cache(path: str, document: dict) -> None:
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(document, f)
+        os.replace(tmp, path)
+    except OSError as exc:
+        log.warning(f"Could not cache schedule: {exc}")
+
+
+def _request(url: str, method: str = "GET", body: dict = None, headers: dict = None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers=dict(headers or {}))
+    if data is not None:
+        request.add_header("Content-Type", "application/json")
+    return urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT)
+
+
+def fetch_schedule(registration: dict, url: str = SCHEDULE_URL, device_id: str = DEVICE_ID,
+                   cache_file: str = SCHEDULE_CACHE):
+    """
+    Register with the server and return this device's upcoming passes.
+
+    Falls back to the cached schedule while it is still valid. Returns None
+    when neither is available, so the caller can predict locally.
+
+    Args:
+        registration: Location and preferences (latitude, longitude,
+            elevation_m, min_elevation, satellites, guard)
+    """
+    cached = _load_cache(cache_file)
+    base = f"{url.rstrip('/')}/devices/{device_id}"
+    document = None
+    try:
+        _request(base, method="PUT", body=registration).close()
+        headers = {"If-None-Match": f'"{cached["version"]}"'} if cached and "version" in cached else {}
+        try:
+            with _request(f"{base}/schedule", headers=headers) as resp:
+                document = json.loads(resp.read().decode())
+            _save_cache(cache_file, document)
+            log.info(f"Fetched schedule {document.get('version')} from {url}")
+        except urllib.error.HTTPError as exc:
+            if exc.code != 304:
+                raise
+            document = cached
+    except (OSError, ValueError) as exc:
+        log.warning(f"Schedule server unavailable ({exc})")
+        now = datetime.now(timezone.utc).timestamp()
+        if cached and cached.get("valid_until", 0) > now:
+            log.info("Using cached schedule")
+            document = cached
+
+    if document is None:
+        return None
+    try:
+        return parse_schedule(document)
+    except (KeyError, TypeError, ValueError) as exc:
+        log.warning(f"Ignoring unusable schedule ({exc})")
+        return None
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format="[schedule_client] %(message)s")
+    if not SCHEDULE_URL:
+        print("Set PIESS_SCHEDULE_URL to the schedule server, e.g. http://server:8090")
+        return 1
+    cached = _load_cache(SCHEDULE_CACHE) or {}
+    registration = cached.get("registration") or {"latitude": 43.577090, "longitude": -79.727520, "elevation_m": 128.0}
+    passes = fetch_schedule(registration)
+    if passes is None:
+        print("No schedule available")
+        return 1
+    for p in passes:
+        print(f"{p.satellite}: Rise: {p.rise:%Y-%m-%d %H:%M:%S} | Set: {p.set:%H:%M:%S} UTC "
+              f"(alt: {p.max_altitude:.1f}°) | {len(p.events)} events, {len(p.track_alt)} track samples")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
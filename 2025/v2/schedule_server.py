@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""schedule_server.py
+Central pass schedules for a fleet of PieSS devices.
+
+Devices register their location (PUT /devices/<id>) and fetch a compact,
+versioned schedule (GET /devices/<id>/schedule, with ETag) of the passes
+they should alert for: times, the LED/servo event timeline and alt/az
+track samples every few seconds. schedule_client.py on the device follows
+it without Skyfield or de421.bsp, so a Pi Zero only blinks LEDs.
+
+All devices are predicted together (predictor.find_passes_many), one
+propagation per group of devices sharing satellites and elevation mask.
+
+Run it on any machine with the tracker's Python dependencies:
+    python3 schedule_server.py --port 8090
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import timedelta
+
+from flask import Flask, jsonify, request
+from skyfield.api import Topos, load
+
+import predictor
+import schedule_client
+
+log = logging.getLogger("schedule_server")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_HOST = "0.0.0.0"
+SERVER_PORT = 8090
+SERVER_THREADS = 4
+
+DEVICES_FILE = os.environ.get("PIESS_SCHEDULE_DEVICES", os.path.join(SCRIPT_DIR, "schedule_devices.json"))
+TLE_FILE = os.path.join(SCRIPT_DIR, "stations.tle")
+TLE_URL = "https://celestrak.org/NORAD/elements/gp.php?GROUP=stations&FORMAT=tle"
+TLE_REFRESH_HOURS = 12
+EPHEMERIS_FILE = os.path.join(SCRIPT_DIR, "de421.bsp")
+
+SCHEDULE_DAYS = 2            # Days of passes in each schedule
+SCHEDULE_REFRESH_HOURS = 6   # Schedules older than this are recomputed
+
+# Registration defaults, matching iss_tracker.py
+DEFAULT_SATELLITES = ["ISS (ZARYA)"]
+DEFAULT_MIN_ELEVATION = 15.0
+DEFAULT_GUARD = schedule_client.SCHEDULE_GUARD
+
+DEVICE_ID = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+def normalize_registration(data: dict) -> dict:
+    """Validated registration with defaults filled in. Raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    try:
+        registration = {
+            "latitude": float(data["latitude"]),
+            "longitude": float(data["longitude"]),
+            "elevation_m": float(data.get("elevation_m", 0.0)),
+            "min_elevation": float(data.get("min_elevation", DEFAULT_MIN_ELEVATION)),
+            "satellites": [str(name) for name in data.get("satellites") or DEFAULT_SATELLITES],
+            "guard": float(data.get("guard", DEFAULT_GUARD)),
+        }
+    except (KeyError, TypeError, ValueError) as exc:
+        raise ValueError(f"bad registration ({exc})")
+    if not (-90 <= registration["latitude"] <= 90 and -180 <= registration["longitude"] <= 180):
+        raise ValueError("latitude/longitude out of range")
+    if not 0 <= registration["min_elevation"] < 90:
+        raise ValueError("min_elevation must be 0-90")
+    return registration
+
+
+class ScheduleStore:
+    """Registered devices and their computed schedule documents."""
+
+    def __init__(self, devices_file: str = DEVICES_FILE, days: float = SCHEDULE_DAYS):
+        self.devices_file = devices_file
+        self.days = days
+        self.lock = threading.Lock()
+        self.devices = self._load_devices()
+        self.documents = {}
+        self.by_name = None
+        self.ts = None
+        self.eph = None
+        self.tle_loaded = 0.0
+
+    def _load_devices(self) -> dict:
+        try:
+            with open(self.devices_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_devices(self) -> None:
+        tmp = f"{self.devices_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.devices, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.devices_file)
+
+    def _elements(self) -> None:
+        """(Re)load TLEs when stale; new elements invalidate every schedule."""
+        if self.by_name is not None and time.time() - self.tle_loaded < TLE_REFRESH_HOURS * 3600:
+            return
+        self.by_name, self.ts, _ = predictor.load_satellites(TLE_FILE, TLE_URL, TLE_REFRESH_HOURS)
+        if self.eph is None:
+            self.eph = load(EPHEMERIS_FILE)
+        self.tle_loaded = time.time()
+        self.documents.clear()
+
+    def register(self, device_id: str, data: dict) -> dict:
+        registration = normalize_registration(data)
+        with self.lock:
+            if self.devices.get(device_id) != registration:
+                log.info(f"Registered {device_id}: {registration}")
+                self.devices[device_id] = registration
+                self.documents.pop(device_id, None)
+                self._save_devices()
+        return registration
+
+    def schedule(self, device_id: str):
+        """The device's schedule document, computing it if missing or stale. None if unknown."""
+        with self.lock:
+            if device_id not in self.devices:
+                return None
+            self._elements()
+            document = self.documents.get(device_id)
+            if document is None or time.time() - document["generated"] > SCHEDULE_REFRESH_HOURS * 3600:
+                self._compute([device_id])
+            return self.documents[device_id]
+
+    def refresh_all(self) -> None:
+        with self.lock:
+            self._elements()
+            self._compute(list(self.devices))
+
+    def _compute(self, device_ids: list) -> None:
+        """Predict schedules, one find_passes_many() call per group of similar devices."""
+        groups = {}
+        for device_id in device_ids:
+            reg = self.devices[device_id]
+            groups.setdefault((tuple(reg["satellites"]), reg["min_elevation"]), []).append(device_id)
+
+        t0 = self.ts.now()
+        t1 = self.ts.from_datetime(t0.utc_datetime() + timedelta(days=self.days))
+        for (names, min_elevation), members in groups.items():
+            satellites = [self.by_name[name] for name in names if name in self.by_name]
+            observers = [Topos(self.devices[d]["latitude"], self.devices[d]["longitude"],
+                               elevation_m=self.devices[d]["elevation_m"]) for d in members]
+            started = time.monotonic()
+            found = predictor.find_passes_many(satellites, observers, t0, t1, min_elevation, self.eph) \
+                if satellites else []
+            by_name = {sat.name: sat for sat in satellites}
+            for k, device_id in enumerate(members):
+                passes = [p for per_satellite in found for p in per_satellite[k] if p.night]
+                schedule, _ = predictor.merge_schedule(passes, list(names), self.devices[device_id]["guard"])
+                scheduled = [
+                    schedule_client.from_prediction(p, *predictor.sample_track(
+                        by_name[p.satellite], observers[k], p.rise, p.set, schedule_client.TRACK_STEP),
+                        tle_epoch=round(by_name[p.satellite].epoch.utc_datetime().timestamp(), 1))
+                    for p in schedule
+                ]
+                self.documents[device_id] = self._document(device_id, scheduled, satellites, names, t1)
+            log.info(f"Computed {len(members)} schedule(s) for {', '.join(names)} "
+                     f"in {time.monotonic() - started:.2f}s")
+
+    def _document(self, device_id: str, scheduled: list, satellites: list, names: tuple, t1) -> dict:
+        content = {
+            "format": schedule_client.FORMAT,
+            "device": device_id,
+            "registration": self.devices[device_id],
+            "valid_until": int(t1.utc_datetime().timestamp()),
+            "tle_epoch": int(min(s.epoch.utc_datetime().timestamp() for s in satellites)) if satellites else None,
+            "missing": [name for name in names if name not in self.by_name],
+            "passes": [p.to_compact() for p in scheduled],
+        }
+        # The version covers what the device acts on, so a recompute with the
+        # same passes keeps its ETag and the device gets a 304
+        digest = json.dumps([content["registration"], content["passes"]], sort_keys=True)
+        content["version"] = hashlib.sha1(digest.encode()).hexdigest()[:12]
+        content["generated"] = int(time.time())
+        return content
+
+
+store = None
+app = Flask(__name__)
+
+
+@app.route("/devices", methods=["GET"])
+def list_devices():
+    return jsonify(store.devices)
+
+
+@app.route("/devices/<device_id>", methods=["PUT"])
+def register_device(device_id):
+    if not DEVICE_ID.match(device_id):
+        return jsonify({"error": "bad device id"}), 400
+    try:
+        registration = store.register(device_id, request.get_json(silent=True))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify({"device": device_id, "registration": registration})
+
+
+@app.route("/devices/<device_id>/schedule", methods=["GET"])
+def device_schedule(device_id):
+    document = store.schedule(device_id)
+    if document is None:
+        return jsonify({"error": "unknown device, PUT /devices/<id> first"}), 404
+    if request.if_none_match.contains(document["version"]):
+        return "", 304
+    response = jsonify(document)
+    response.set_etag(document["version"])
+    return response
+
+
+def _refresher(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            store.refresh_all()
+        except Exception as exc:
+            log.exception(f"Schedule refresh failed: {exc}")
+
+
+def main() -> int:
+    global store
+    parser = argparse.ArgumentParser(description="Serve PieSS pass schedules to devices")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--days", type=float, default=SCHEDULE_DAYS, help="days per schedule")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[schedule_server] %(message)s")
+    store = ScheduleStore(days=args.days)
+    store.refresh_all()
+    threading.Thread(target=_refresher, args=(SCHEDULE_REFRESH_HOURS * 3600,),
+                     name="schedule-refresh", daemon=True).start()
+
+    from waitress import serve
+    log.info(f"Serving schedules for {len(store.devices)} device(s) on {args.host}:{args.port}")
+    serve(app, host=args.host, port=args.port, threads=SERVER_THREADS)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""sd_notify.py
+Minimal systemd notify protocol (READY=1, WATCHDOG=1, STATUS=...) and a
+loop heartbeat that only pings the watchdog while the loop keeps up.
+
+With Type=notify and WatchdogSec= in the unit file, systemd sets
+NOTIFY_SOCKET and WATCHDOG_USEC. If the tracker stops calling
+Heartbeat.beat() on time (hung HTTP request, wedged pigpiod socket), pings
+stop and systemd kills and restarts the service. Outside systemd every call
+is a no-op.
+
+Fake systemd for local testing:
+    python3 sd_notify.py --listen /tmp/piess-notify.sock
+    NOTIFY_SOCKET=/tmp/piess-notify.sock WATCHDOG_USEC=30000000 python3 iss_tracker.py
+"""
+
+import logging
+import os
+import socket
+import sys
+import time
+
+import metrics
+
+log = logging.getLogger("sd_notify")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+STALL_BUDGET = 20.0  # Longest acceptable gap between beats (seconds)
+
+loop_latency_seconds = metrics.Summary("piess_loop_latency_seconds", "Gap between scheduler loop heartbeats")
+watchdog_stalls = metrics.Counter("piess_watchdog_stalls_total", "Loop iterations that exceeded the stall budget")
+
+
+def notify(state: str) -> bool:
+    """Send a state string to systemd. Returns False if not under systemd."""
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return False
+    if address.startswith("@"):
+        address = "\0" + address[1:]  # Abstract namespace socket
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(state.encode())
+        return True
+    except OSError as exc:
+        log.warning(f"sd_notify failed ({exc})")
+        return False
+
+
+def watchdog_interval() -> float:
+    """Watchdog timeout requested by systemd in seconds (0 if disabled)."""
+    try:
+        return int(os.environ.get("WATCHDOG_USEC", "0")) / 1e6
+    except ValueError:
+        return 0.0
+
+
+class Heartbeat:
+    """Track scheduler loop latency and ping the watchdog while on time."""
+
+    def __init__(self, stall_budget: float = STALL_BUDGET):
+        timeout = watchdog_interval()
+        self.enabled = timeout > 0
+        # Never allow a stall longer than the watchdog itself would tolerate
+        self.stall_budget = min(stall_budget, timeout * 0.75) if self.enabled else stall_budget
+        self.ping_interval = timeout / 4 if self.enabled else 0.0
+        self.last_beat = time.monotonic()
+        self.last_ping = 0.0
+
+    def ready(self, status: str = "") -> None:
+        """Tell systemd start-up is finished."""
+        self.last_beat = time.monotonic()
+        notify("READY=1" + (f"\nSTATUS={status}" if status else ""))
+
+    def status(self, text: str) -> None:
+        """Update the status line shown by `systemctl status`."""
+        notify(f"STATUS={text}")
+
+    def beat(self) -> None:
+        """Call once per scheduler iteration."""
+        now = time.monotonic()
+        latency = now - self.last_beat
+        self.last_beat = now
+        loop_latency_seconds.observe(latency)
+
+        if latency > self.stall_budget:
+            watchdog_stalls.inc()
+            log.warning(
+                f"Loop iteration took {latency:.1f}s (budget {self.stall_budget:.1f}s), "
+                f"withholding watchdog ping"
+            )
+            return
+
+        if self.enabled and now - self.last_ping >= self.ping_interval:
+            notify("WATCHDOG=1")
+            self.last_ping = now
+
+
+def _listen(path: str) -> None:
+    """Stand-in for systemd: print every notify message received on path."""
+    if os.path.exists(path):
+        os.remove(path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.bind(path)
+        print(f"Listening for sd_notify messages on {path}")
+        last = time.monotonic()
+        while True:
+            data = sock.recv(4096).decode(errors="replace")
+            now = time.monotonic()
+            print(f"+{now - last:6.2f}s {data!r}")
+            last = now
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--listen":
+        try:
+            _listen(sys.argv[2])
+        except KeyboardInterrupt:
+            pass
+    else:
+        print("Usage: python3 sd_notify.py --listen /tmp/piess-notify.sock")
+        sys.exit(2)
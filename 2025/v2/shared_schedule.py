@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""shared_schedule.py
+The tracker's current schedule as a fixed-layout binary file, which other
+processes (check_passes.py, a status UI) memory-map read-only instead of
+keeping their own copy or predicting again.
+
+Layout, little-endian without padding:
+    HEADER (64 bytes)   magic b"PIESSSCH", layout VERSION, header size,
+                        record size, record count, generated (unix time),
+                        source provider name
+    count x RECORD      one pass each, times as unix seconds, unknown values
+                        as NaN or -1, its alt/az track in MAX_TRACK slots
+
+Records match numpy_dtype(), so with NumPy they map without copying:
+    np.memmap(path, dtype=numpy_dtype(), mode="r", offset=HEADER.size, shape=(count,))
+SharedSchedule reads them with mmap and struct only, since a unit
+following the schedule server never imports NumPy.
+
+write() builds the new file beside the old one and swaps it in with
+os.replace(), so a mapping always holds one whole snapshot; readers call
+SharedSchedule.refresh() to pick up the next one. No locks needed.
+"""
+
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from datetime import datetime, timezone
+
+import schedule_client
+
+log = logging.getLogger("shared_schedule")
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SHARED_SCHEDULE_FILE = os.environ.get("PIESS_SHARED_SCHEDULE", os.path.join(SCRIPT_DIR, "schedule.bin"))
+
+MAGIC = b"PIESSSCH"
+VERSION = 1              # Bumped on any change to HEADER or RECORD_FIELDS
+MAX_TRACK = 128          # Track samples per pass: 21 minutes at 10 s, longer than any LEO pass
+
+HEADER = struct.Struct("<8sHHIId16s20x")
+RECORD_FIELDS = [
+    ("satellite", "24s"),
+    ("rise", "d"),
+    ("peak", "d"),
+    ("set", "d"),
+    ("tle_epoch", "d"),
+    ("max_altitude", "f"),
+    ("rise_azimuth", "f"),
+    ("set_azimuth", "f"),
+    ("night", "b"),      # 1, 0, or -1 when unknown
+    ("sunlit", "b"),
+    ("track_step", "f"),
+    ("track_len", "H"),
+    ("track_alt", f"{MAX_TRACK}f"),
+    ("track_az", f"{MAX_TRACK}f"),
+]
+RECORD = struct.Struct("<" + "".join(fmt for _, fmt in RECORD_FIELDS))
+
+
+def numpy_dtype():
+    """NumPy structured dtype of one record (NumPy imported here, on first use)."""
+    import numpy as np
+
+    types = {"d": "<f8", "f": "<f4", "b": "i1", "H": "<u2"}
+    fields = []
+    for name, fmt in RECORD_FIELDS:
+        if fmt.endswith("s"):
+            fields.append((name, f"S{fmt[:-1]}"))
+        elif fmt[:-1]:
+            fields.append((name, types[fmt[-1]], (int(fmt[:-1]),)))
+        else:
+            fields.append((name, types[fmt]))
+    return np.dtype(fields)
+
+
+def _number(value) -> float:
+    return math.nan if value is None else value
+
+
+def _flag(value) -> int:
+    return -1 if value is None else int(bool(value))
+
+
+def _pack(p, buffer: bytearray, offset: int) -> None:
+    n = min(len(p.track_alt), MAX_TRACK)
+    if len(p.track_alt) > MAX_TRACK:
+        log.warning(f"{p.satellite} track cut to {MAX_TRACK} samples")
+    pad = [0.0] * (MAX_TRACK - n)
+    RECORD.pack_into(
+        buffer, offset,
+        p.satellite.encode()[:24],
+        p.rise.timestamp(), p.peak.timestamp(), p.set.timestamp(), _number(p.tle_epoch),
+        _number(p.max_altitude), _number(p.rise_azimuth), _number(p.set_azimuth),
+        _flag(p.night), _flag(p.sunlit),
+        p.track_step, n,
+        *p.track_alt[:n], *pad,
+        *p.track_az[:n], *pad,
+    )
+
+
+def write(passes: list, source: str, path: str = SHARED_SCHEDULE_FILE) -> None:
+    """
+    Replace the shared file with passes (schedule_client.ScheduledPass).
+
+    Args:
+        source: Provider the passes came from, stored in the header
+    """
+    buffer = bytearray(HEADER.size + RECORD.size * len(passes))
+    HEADER.pack_into(buffer, 0, MAGIC, VERSION, HEADER.size, RECORD.size, len(passes),
+                     time.time(), source.encode()[:16])
+    for i, p in enumerate(passes):
+        _pack(p, buffer, HEADER.size + i * RECORD.size)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(buffer)
+    os.replace(tmp, path)
+
+
+def _unknown(value):
+    return None if math.isnan(value) else value
+
+
+class SharedSchedule:
+    """Read-only mapping of the shared file; empty until the tracker has written one."""
+
+    def __init__(self, path: str = SHARED_SCHEDULE_FILE):
+        self.path = path
+        self.count = 0
+        self.generated = None
+        self.source = None
+        self._map = None
+        self._identity = None
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Map the file again if it was replaced. True when a new snapshot was mapped."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if identity == self._identity:
+            return False
+
+        with open(self.path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_size, record_size, count, generated, source = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != VERSION or (header_size, record_size) != (HEADER.size, RECORD.size):
+            mapped.close()
+            raise ValueError(f"{self.path} is not a version {VERSION} shared schedule")
+        if len(mapped) < header_size + count * record_size:
+            mapped.close()
+            raise ValueError(f"{self.path} is truncated")
+
+        self.close()
+        self._map, self._identity = mapped, identity
+        self.count = count
+        self.generated = datetime.fromtimestamp(generated, tz=timezone.utc)
+        self.source = source.rstrip(b"\0").decode()
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, i: int) -> tuple:
+        """Raw values of record i, in RECORD_FIELDS order with the tracks flattened."""
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return RECORD.unpack_from(self._map, HEADER.size + i * RECORD.size)
+
+    def get(self, i: int) -> schedule_client.ScheduledPass:
+        values = self.record(i)
+        satellite, rise, peak, set_, epoch, max_alt, rise_az, set_az, night, sunlit, step, n = values[:12]
+        track = values[12:]
+
+        def utc(seconds):
+            return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+        return schedule_client.ScheduledPass(
+            satellite=satellite.rstrip(b"\0").decode(),
+            rise=utc(rise),
+            peak=utc(peak),
+            set=utc(set_),
+            max_altitude=_unknown(max_alt),
+            rise_azimuth=_unknown(rise_az),
+            set_azimuth=_unknown(set_az),
+            night=None if night < 0 else bool(night),
+            sunlit=None if sunlit < 0 else bool(sunlit),
+            events=schedule_client.alert_timeline(set_ - rise),
+            track_alt=list(track[:n]),
+            track_az=list(track[MAX_TRACK:MAX_TRACK + n]),
+            track_step=step,
+            tle_epoch=_unknown(epoch),
+        )
+
+    def passes(self) -> list:
+        return [self.get(i) for i in range(self.count)]
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            self._identity = None
+
+
+def main() -> int:
+    path = sys.argv[1] if len(sys.argv) > 1 else SHARED_SCHEDULE_FILE
+    shared = SharedSchedule(path)
+    if shared.generated is None:
+        print(f"No shared schedule at {path}")
+        return 1
+    print(f"{path}: {len(shared)} pass(es) from {shared.source}, written {shared.generated:%Y-%m-%d %H:%M:%S} UTC")
+    for p in shared.passes():
+        print(f"  {p.satellite}: Rise: {p.rise:%Y-%m-%d %H:%M:%S} | Set: {p.set:%H:%M:%S} UTC | "
+              f"{len(p.track_alt)} track samples")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,24 +4,55 @@ WiFi Configuration Portal for PieSS
 Handles network scanning and connection with proper AP mode management
 """
 
+import hashlib
+import json
+import logging
 import os
+import re
 import subprocess
+import threading
 import time
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, abort, stream_with_context
+
+import boot_timeline
+import buffered_log
+import ap_led_indicator
+import captive_portal
+import known_networks
+import nm_monitor
+from nm_client import NMClient
+from connect_jobs import ConnectJobs
+from portal_events import EventBroker
+from scan_coordinator import ScanCoordinator
 
 APP_HOST = "0.0.0.0"
 APP_PORT = 8080
 WIFI_IFACE = "wlan0"
 LOGO_PATH = "/home/piess/PieSS/2025/v2/templates/logo.png"
+PORTAL_THREADS = 8  # waitress worker threads (several phones, long-lived requests)
+LOGO_MAX_AGE = 86400  # Browser cache lifetime for /logo.png (seconds)
+SCAN_SNAPSHOT_FILE = "/tmp/piess_scan_snapshot.txt"  # Written by boot_decider.sh
+SCAN_SNAPSHOT_MAX_AGE = 900  # Ignore snapshots older than this (seconds)
+CONNECT_TIMEOUT = 45  # Longest time for one connect attempt (seconds)
+CONNECT_SETTLE_TIMEOUT = 15  # Longest wait for wlan0 to report "connected" (seconds)
+MIN_SCAN_INTERVAL = 10  # Taps on "Refresh" faster than this reuse the last scan (seconds)
+CACHED_SCAN_MAX_AGE = 60  # Cached iw/NM lists older than this need a real scan (seconds)
+SCAN_STALE_AGE = 300  # The page warns about results older than this (seconds)
 
 app = Flask(__name__, template_folder="templates")
+captive_portal.register(app)  # Answer OS connectivity probes with a redirect here
+nm = NMClient()  # Persistent D-Bus client; every call falls back to nmcli on failure
+log = logging.getLogger("wifi_portal")
+events = EventBroker()  # Live scan/AP updates for GET /events
+# Held for a whole scan (including an AP teardown) and a whole connect
+# attempt, so a scan never restarts hostapd while NetworkManager is joining
+radio_lock = threading.Lock()
 
 # Cache for scan results
 scan_cache = {
     'networks': [],
-    'timestamp': None,
-    'scanning': False
+    'timestamp': None
 }
 
 
@@ -49,7 +80,7 @@ def run_cmd(cmd, timeout=30, check_sudo=False):
 
 def stop_ap_mode():
     """Temporarily stop AP mode to allow WiFi scanning"""
-    print("[wifi_portal] Stopping AP mode for scan...")
+    log.info("Stopping AP mode for scan...")
     run_cmd(["systemctl", "stop", "hostapd"], check_sudo=True)
     run_cmd(["systemctl", "stop", "dnsmasq"], check_sudo=True)
     time.sleep(2)
@@ -57,7 +88,7 @@ def stop_ap_mode():
 
 def start_ap_mode():
     """Restart AP mode"""
-    print("[wifi_portal] Restarting AP mode...")
+    log.info("Restarting AP mode...")
     
     # Make sure wlan0 still has the right IP
     run_cmd(["ip", "addr", "add", "192.168.4.1/24", "dev", "wlan0"], check_sudo=True)
@@ -66,95 +97,261 @@ def start_ap_mode():
     time.sleep(1)
     run_cmd(["systemctl", "start", "hostapd"], check_sudo=True)
     time.sleep(3)
-    print("[wifi_portal] AP mode restarted")
+    log.info("AP mode restarted")
+    events.publish("ap-restored")
 
 
-def scan_networks_background():
+def _sort_networks(networks):
+    """Drop empty/duplicate SSIDs (keeping the strongest) and sort by signal"""
+    best = {}
+    for n in networks:
+        if not n["ssid"]:
+            continue
+        current = best.get(n["ssid"])
+        if current is None or n["signal"] > current["signal"] or n["in_use"]:
+            best[n["ssid"]] = n
+    return sorted(best.values(), key=lambda n: (-n["signal"], n["ssid"].lower()))
+
+
+def parse_nmcli_networks(out):
+    """Parse `nmcli -t -f IN-USE,SSID,SIGNAL,SECURITY dev wifi list` output"""
+    networks = []
+    for line in out.splitlines():
+        # Terse mode escapes ':' inside fields as '\:'
+        parts = [p.replace("\\:", ":") for p in re.split(r"(?<!\\):", line)]
+        if len(parts) < 4:
+            continue
+        
+        signal = parts[2].strip()
+        security = parts[3].strip()
+        networks.append({
+            "ssid": parts[1].strip(),
+            "signal": int(signal) if signal.isdigit() else 0,
+            "security": security if security and security != "--" else "Open",
+            "in_use": parts[0].strip() == "*"
+        })
+    return _sort_networks(networks)
+
+
+def parse_iw_scan(out):
+    """Parse `iw dev <iface> scan` / `scan dump` output into network dicts"""
+    networks = []
+    current = None
+    for raw in out.splitlines():
+        line = raw.strip()
+        if raw.startswith("BSS "):
+            current = {"ssid": "", "signal": 0, "security": "Open",
+                       "in_use": "associated" in raw, "age": None, "_wpa": [], "_privacy": False}
+            networks.append(current)
+        elif current is None:
+            continue
+        elif line.startswith("SSID:"):
+            current["ssid"] = line[5:].strip()
+        elif line.startswith("signal:"):
+            try:
+                dbm = float(line.split()[1])
+                # Same dBm -> percent mapping NetworkManager uses
+                current["signal"] = max(0, min(100, int(2 * (dbm + 100))))
+            except (IndexError, ValueError):
+                pass
+        elif line.startswith("last seen:"):
+            try:
+                current["age"] = float(line.split()[2]) / 1000  # "last seen: 320 ms ago"
+            except (IndexError, ValueError):
+                pass
+        elif line.startswith("RSN:"):
+            current["_wpa"].append("WPA2")
+        elif line.startswith("WPA:"):
+            current["_wpa"].insert(0, "WPA1")
+        elif line.startswith("capability:") and "Privacy" in line:
+            current["_privacy"] = True
+    
+    for n in networks:
+        wpa = n.pop("_wpa")
+        privacy = n.pop("_privacy")
+        if wpa:
+            n["security"] = " ".join(wpa)
+        elif privacy:
+            n["security"] = "WEP"
+    return _sort_networks(networks)
+
+
+def _scan_time(networks):
     """
-    Scan for WiFi networks in background. Updates the cache.
-    This is designed to be called and return immediately, doing work in background.
+    When a cached list was last refreshed, from its freshest entry's "age"
+    (dropped from the dicts). None if no entry says.
     """
-    global scan_cache
+    ages = [n.pop("age") for n in networks if "age" in n]
+    ages = [age for age in ages if age is not None]
+    return datetime.now() - timedelta(seconds=min(ages)) if ages else None
+
+
+def _usable_cache(networks, source):
+    """(networks, scanned_at) if a cached list is recent enough to stand in for a scan, else None."""
+    scanned_at = _scan_time(networks)
+    if not networks:
+        return None
+    if scanned_at is None:
+        log.info(f"{source} has no age, not using it")
+        return None
+    age = (datetime.now() - scanned_at).total_seconds()
+    if age > CACHED_SCAN_MAX_AGE:
+        log.info(f"{source} is {age:.0f}s old, not using it")
+        return None
+    log.info(f"Using {source} from {age:.0f}s ago (AP kept up)")
+    return networks, scanned_at
+
+
+def scan_without_ap_teardown():
+    """
+    Scan while hostapd keeps running. Returns (networks, scanned_at), or
+    None if no non-disruptive method gave recent enough results.
     
-    if scan_cache['scanning']:
-        print("[wifi_portal] Scan already in progress, skipping")
-        return
+    Tries, in order: an active `iw` scan forced on the AP interface, the
+    kernel's cached `iw` scan results, and NetworkManager's existing list.
+    Cached lists are only used when younger than CACHED_SCAN_MAX_AGE, and
+    are stamped with their real age, not the time they were read.
+    """
+    rc, out, err = run_cmd(["iw", "dev", WIFI_IFACE, "scan", "ap-force"], timeout=15, check_sudo=True)
+    if rc == 0 and out:
+        networks = parse_iw_scan(out)
+        for n in networks:
+            n.pop("age", None)
+        if networks:
+            log.info("Scanned with iw (AP kept up)")
+            return networks, datetime.now()
+    log.info(f"iw active scan unavailable ({err or 'no results'}), trying cached results")
     
-    scan_cache['scanning'] = True
+    rc, out, _ = run_cmd(["iw", "dev", WIFI_IFACE, "scan", "dump"], timeout=5, check_sudo=True)
+    if rc == 0 and out:
+        cached = _usable_cache(parse_iw_scan(out), "cached iw scan")
+        if cached:
+            return cached
     
-    # Stop AP mode temporarily
+    # NM's D-Bus list has LastSeen; `nmcli --rescan no` doesn't say how old it is
+    networks = nm.access_points(WIFI_IFACE)
+    if networks is not None:
+        cached = _usable_cache(_sort_networks(networks), "NetworkManager's scan list")
+        if cached:
+            return cached
+    
+    return None
+
+
+def scan_with_ap_teardown():
+    """Fallback scan: stop the AP, rescan with nmcli, restart the AP"""
     stop_ap_mode()
     
     try:
         # Request fresh scan
-        print("[wifi_portal] Running nmcli scan...")
-        run_cmd(["nmcli", "dev", "wifi", "rescan"], timeout=20, check_sudo=True)
+        log.info("Running nmcli scan...")
+        if nm.request_scan(WIFI_IFACE) is None:
+            run_cmd(["nmcli", "dev", "wifi", "rescan"], timeout=20, check_sudo=True)
         time.sleep(3)
         
         # Get network list
+        networks = nm.access_points(WIFI_IFACE)
+        if networks is not None:
+            for n in networks:
+                n.pop("age", None)
+            return _sort_networks(networks), datetime.now()
         rc, out, err = run_cmd([
             "nmcli", "-t", "-f", "IN-USE,SSID,SIGNAL,SECURITY", 
             "dev", "wifi", "list"
         ], check_sudo=True)
         
         if rc != 0:
-            print(f"[wifi_portal] Scan failed: {err or out}")
-            scan_cache['networks'] = []
-        else:
-            networks = []
-            seen_ssids = set()
-            
-            for line in out.splitlines():
-                parts = line.split(":")
-                if len(parts) < 4:
-                    continue
-                
-                in_use = parts[0].strip() == "*"
-                ssid = parts[1].strip()
-                signal = parts[2].strip()
-                security = parts[3].strip()
-                
-                # Skip empty SSIDs and duplicates
-                if not ssid or ssid in seen_ssids:
-                    continue
-                
-                seen_ssids.add(ssid)
-                
-                try:
-                    signal_int = int(signal) if signal.isdigit() else 0
-                except:
-                    signal_int = 0
-                
-                networks.append({
-                    "ssid": ssid,
-                    "signal": signal_int,
-                    "security": security if security else "Open",
-                    "in_use": in_use
-                })
-            
-            # Sort by signal strength
-            networks.sort(key=lambda n: (-n["signal"], n["ssid"].lower()))
-            scan_cache['networks'] = networks
-            scan_cache['timestamp'] = datetime.now()
-            print(f"[wifi_portal] Scan complete, found {len(networks)} networks")
-        
-    except Exception as e:
-        print(f"[wifi_portal] Scan error: {e}")
-        scan_cache['networks'] = []
+            log.warning(f"Scan failed: {err or out}")
+            return [], datetime.now()
+        return parse_nmcli_networks(out), datetime.now()
     finally:
         # Always restart AP mode after scan
         start_ap_mode()
-        scan_cache['scanning'] = False
+
+
+def scan_networks():
+    """
+    Run one scan, keeping the AP up if at all possible.
+    Returns (networks, scanned_at), or None while a connect job owns the radio.
+    """
+    if connect_jobs.busy() or not radio_lock.acquire(blocking=False):
+        log.info("Connect attempt in progress, not scanning")
+        events.publish("scan-finished", dict(_results_payload(), scanning=False))  # Page stops waiting
+        return None
+    try:
+        events.publish("scan-started")
+        result = scan_without_ap_teardown()
+        if result is None:
+            log.warning("No recent scan without the AP, falling back to stopping the AP")
+            result = scan_with_ap_teardown()
+    finally:
+        radio_lock.release()
+    log.info(f"Scan complete, found {len(result[0])} networks")
+    return result
+
+
+def store_scan_results(result):
+    """Publish a finished scan to the page cache, stamped with when it was actually scanned"""
+    networks, scanned_at = result
+    scan_cache['networks'] = networks
+    scan_cache['timestamp'] = scanned_at
+    # Sent before the coordinator clears its scanning flag, so say it here
+    events.publish("scan-finished", dict(_results_payload(), scanning=False))
+
+
+scanner = ScanCoordinator(scan_networks, min_interval=MIN_SCAN_INTERVAL, on_result=store_scan_results)
+
+
+def scan_networks_background():
+    """
+    Start a background scan, or join the one already running. Returns
+    immediately; results land in scan_cache when the scan finishes.
+    Returns True if a new scan was started.
+    """
+    started, _ = scanner.request()
+    if not started:
+        log.info("Scan already in progress or just finished, reusing it")
+    return started
+
+
+def load_scan_snapshot():
+    """
+    Preload scan_cache from the scan boot_decider.sh took in client mode,
+    before the radio switched to AP mode. Returns True if it was used.
+    """
+    global scan_cache
+    
+    try:
+        mtime = os.path.getmtime(SCAN_SNAPSHOT_FILE)
+        with open(SCAN_SNAPSHOT_FILE, 'r') as f:
+            out = f.read()
+    except OSError:
+        return False
+    
+    age = time.time() - mtime
+    if age > SCAN_SNAPSHOT_MAX_AGE:
+        log.info(f"Ignoring scan snapshot from {int(age / 60)} minutes ago")
+        return False
+    
+    scan_cache['networks'] = parse_nmcli_networks(out)
+    scan_cache['timestamp'] = datetime.fromtimestamp(mtime)
+    log.info(f"Loaded {len(scan_cache['networks'])} networks from pre-AP scan snapshot")
+    return True
 
 
 def stop_ap_led_indicator():
-    """Stop the AP mode LED indicator by killing the background process"""
+    """Stop the AP mode LED indicator daemon through its control socket"""
+    if ap_led_indicator.send_command("stop") == "OK":
+        log.info("Stopped AP mode LED indicator")
+        return
+    
+    # Older indicator (or socket missing): fall back to the PID file
     try:
-        with open('/tmp/piess_ap_led.pid', 'r') as f:
+        with open(ap_led_indicator.PID_FILE, 'r') as f:
             pid = int(f.read().strip())
         run_cmd(["kill", str(pid)], check_sudo=True)
-        run_cmd(["rm", "-f", "/tmp/piess_ap_led.pid"], check_sudo=True)
-        print("[wifi_portal] Stopped AP mode LED indicator")
+        run_cmd(["rm", "-f", ap_led_indicator.PID_FILE], check_sudo=True)
+        log.info("Stopped AP mode LED indicator")
     except:
         pass  # PID file might not exist
 
@@ -170,44 +367,109 @@ def connect_to_network(ssid, password):
     # Stop AP mode before attempting connection
     stop_ap_mode()
     
-    # Build connection command
-    cmd = ["nmcli", "dev", "wifi", "connect", ssid, "ifname", WIFI_IFACE]
-    if password:
-        cmd.extend(["password", password])
-    
-    print(f"[wifi_portal] Attempting to connect to '{ssid}'...")
-    rc, out, err = run_cmd(cmd, timeout=45, check_sudo=True)
-    
-    # Give NetworkManager time to connect
-    time.sleep(5)
-    
-    # Check if actually connected
-    rc2, out2, _ = run_cmd([
-        "nmcli", "-t", "-f", "DEVICE,STATE", "dev", "status"
-    ], check_sudo=True)
+    log.info(f"Attempting to connect to '{ssid}'...")
+    started = time.monotonic()
+    result = nm.connect(ssid, password, WIFI_IFACE)
+    if result is not None:
+        rc, out, err = result
+        # D-Bus returns once activation starts, so allow the full connect time
+        settle_timeout = CONNECT_TIMEOUT
+    else:
+        # Build connection command
+        cmd = ["nmcli", "dev", "wifi", "connect", ssid, "ifname", WIFI_IFACE]
+        if password:
+            cmd.extend(["password", password])
+        rc, out, err = run_cmd(cmd, timeout=CONNECT_TIMEOUT, check_sudo=True)
+        settle_timeout = CONNECT_SETTLE_TIMEOUT
     
-    connected = False
-    for line in out2.splitlines():
-        if ":" in line:
-            dev, state = line.split(":", 1)
-            if dev == WIFI_IFACE and state == "connected":
-                connected = True
-                break
+    # Wait for NetworkManager to report the device connected, returning the
+    # moment it does (only a quick check if the connect call already failed)
+    connected = nm_monitor.wait_for_device_state(
+        WIFI_IFACE, timeout=settle_timeout if rc == 0 else 2
+    )
     
     if connected:
-        print(f"[wifi_portal] Successfully connected to '{ssid}'")
+        elapsed = time.monotonic() - started
+        log.info(f"Successfully connected to '{ssid}' in {elapsed:.1f}s")
+        # Ranked history so boot_orchestrator.py tries this network first next boot
+        known_networks.record_success(ssid, elapsed)
         # Stop the AP mode LED indicator
         stop_ap_led_indicator()
         # Keep AP mode off - we're now a client
         return True, f"Successfully connected to {ssid}"
     else:
-        print(f"[wifi_portal] Failed to connect to '{ssid}': {err or out}")
+        log.warning(f"Failed to connect to '{ssid}': {err or out}")
         # Restart AP since connection failed
         start_ap_mode()
         error_msg = err or out or "Connection failed"
         return False, f"Failed to connect: {error_msg}"
 
 
+def network_status():
+    """Current device status table from NetworkManager, for the result page"""
+    table = nm.device_status_table()
+    if table is not None:
+        return table
+    rc, out, _ = run_cmd([
+        "nmcli", "-t", "-f", "DEVICE,TYPE,STATE,CONNECTION", "dev", "status"
+    ], check_sudo=True)
+    return out if rc == 0 else "Unable to retrieve status"
+
+
+def connect_holding_radio(ssid, password):
+    """connect_to_network() for a connect job, after any running scan has restored the AP"""
+    with radio_lock:
+        return connect_to_network(ssid, password)
+
+
+connect_jobs = ConnectJobs(connect_holding_radio, status_fn=network_status)
+
+
+def _results_payload():
+    """Scan results as sent by /results and the scan-finished event"""
+    scan_time = scan_cache.get('timestamp')
+    return {
+        "ok": True,
+        "networks": scan_cache.get('networks', []),
+        "scanning": scanner.scanning,
+        "timestamp": scan_time.isoformat() if scan_time else None,
+        "stats": scanner.stats(),
+        "nm_latency_ms": nm.stats()
+    }
+
+
+def _scan_etag():
+    """ETag for anything rendered from scan_cache: changes only with a new scan"""
+    scan_time = scan_cache.get('timestamp')
+    stamp = scan_time.timestamp() if scan_time else 0
+    return f"{stamp:.3f}-{int(scanner.scanning)}-{scanner.generation}"
+
+
+def _conditional(etag, build, mimetype=None):
+    """
+    Answer 304 if the client already has this ETag, otherwise build the body.
+    Bodies are memoised per endpoint and ETag, so unchanged results are not
+    re-rendered for every phone that asks.
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        key = (request.endpoint, etag)
+        body = _render_cache.get(key)
+        if body is None:
+            body = build()
+            if len(_render_cache) > 16:
+                _render_cache.clear()
+            _render_cache[key] = body
+        response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"  # Always revalidate, usually 304
+    return response
+
+
+_render_cache = {}
+
+
 @app.route("/")
 def index():
     """Main portal page - shows cached scan results if available"""
@@ -217,89 +479,140 @@ def index():
     scan_time = scan_cache.get('timestamp')
     
     scan_error = None
+    stale_minutes = 0
     if scan_time:
         age = (datetime.now() - scan_time).total_seconds()
-        if age > 300:  # Older than 5 minutes
-            scan_error = f"Scan results are {int(age/60)} minutes old. Press Refresh for current networks."
+        if age > SCAN_STALE_AGE:
+            stale_minutes = int(age / 60)
+            scan_error = f"Scan results are {stale_minutes} minutes old. Press Refresh for current networks."
     
-    return render_template(
-        "wifi_portal.html",
-        networks=networks,
-        scan_error=scan_error
+    return _conditional(
+        f"{_scan_etag()}-{stale_minutes}",
+        lambda: render_template("wifi_portal.html", networks=networks, scan_error=scan_error),
+        mimetype="text/html"
     )
 
 
 @app.route("/scan")
 def scan():
-    """Trigger a background scan and return current cached results"""
-    global scan_cache
+    """Trigger a background scan (or join the running one) and return immediately"""
+    started = scan_networks_background()
     
-    # Trigger scan in background (doesn't block)
-    import threading
-    scan_thread = threading.Thread(target=scan_networks_background)
-    scan_thread.daemon = True
-    scan_thread.start()
-    
-    # Return immediately with message
     return jsonify({
         "ok": True,
-        "scanning": True,
-        "message": "Scan started. AP will restart. Please reconnect and reload the page in 10 seconds."
+        "scanning": scanner.scanning,
+        "started": started,
+        "message": "Scan started. Results will appear in a few seconds."
     })
 
 
 @app.route("/results")
 def results():
     """Get current scan results from cache"""
-    global scan_cache
-    return jsonify({
-        "ok": True,
-        "networks": scan_cache.get('networks', []),
-        "scanning": scan_cache.get('scanning', False),
-        "timestamp": scan_cache.get('timestamp').isoformat() if scan_cache.get('timestamp') else None
-    })
+    return _conditional(_scan_etag(), lambda: json.dumps(_results_payload()), mimetype="application/json")
+
+
+@app.route("/events")
+def event_stream():
+    """
+    Server-sent events: scan-started, scan-finished (with the results) and
+    ap-restored. A new stream starts with the current results.
+    """
+    q = events.subscribe()
+    if q is None:
+        # Too many open streams; the page falls back to polling /results
+        return jsonify({"ok": False, "message": "Too many event streams"}), 503
+    
+    response = Response(
+        stream_with_context(events.stream(q, initial=("results", _results_payload()))),
+        mimetype="text/event-stream"
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 
 @app.route("/connect", methods=["POST"])
 def connect():
-    """Handle connection request"""
+    """Start a background connect job and show a page that polls its status"""
     ssid = request.form.get("ssid", "").strip()
     password = request.form.get("password", "").strip()
     
-    success, message = connect_to_network(ssid, password)
-    
-    # Get current network status
-    rc, out, _ = run_cmd([
-        "nmcli", "-t", "-f", "DEVICE,TYPE,STATE,CONNECTION", "dev", "status"
-    ], check_sudo=True)
+    if not ssid:
+        job = {"id": None, "ssid": "", "state": "failed", "message": "SSID is required", "status": ""}
+        return render_template("wifi_result.html", job=job)
     
-    status = out if rc == 0 else "Unable to retrieve status"
+    job, created = connect_jobs.submit(ssid, password)
+    if not created:
+        log.info(f"Connect request for '{ssid}' attached to existing job {job['id']}")
     
-    return render_template(
-        "wifi_result.html",
-        ok=success,
-        message=message,
-        status=status
-    )
+    return render_template("wifi_result.html", job=job)
+
+
+@app.route("/connect/status/<job_id>")
+def connect_status(job_id):
+    """Poll a connect job started by /connect"""
+    job = connect_jobs.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "message": "Unknown connect job"}), 404
+    return jsonify({"ok": True, "job": job})
+
+
+@app.route("/logs")
+def logs():
+    """Dump the in-memory log ring buffer (local requests only)"""
+    if request.remote_addr not in ("127.0.0.1", "::1"):
+        abort(404)
+    content_type, body = buffered_log.dump_text()
+    return body, 200, {"Content-Type": content_type}
 
 
 @app.route("/logo.png")
 def logo():
-    """Serve the logo image"""
-    if os.path.exists(LOGO_PATH):
-        return send_file(LOGO_PATH, mimetype="image/png")
-    return "Logo not found", 404
+    """Serve the logo image from memory with long-lived cache headers"""
+    global _logo
+    
+    if _logo is None:
+        try:
+            with open(LOGO_PATH, "rb") as f:
+                data = f.read()
+        except OSError:
+            return "Logo not found", 404
+        _logo = (data, hashlib.sha1(data).hexdigest()[:16])
+    
+    data, etag = _logo
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(data, mimetype="image/png")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={LOGO_MAX_AGE}"
+    return response
+
+
+_logo = None  # (bytes, etag) once loaded
 
 
 if __name__ == "__main__":
-    print(f"[wifi_portal] Starting on {APP_HOST}:{APP_PORT}")
+    buffered_log.setup("wifi_portal")
+    log.info(f"Starting on {APP_HOST}:{APP_PORT}")
+    
+    load_scan_snapshot()
     
     # Only do initial scan if AP services are already running
     # (This prevents stopping AP during boot)
     rc, _, _ = run_cmd(["systemctl", "is-active", "hostapd"])
     if rc == 0:
-        print("[wifi_portal] AP already running, skipping initial scan")
-        print("[wifi_portal] Users can press 'Refresh' button to scan")
+        log.info("AP already running, skipping initial scan")
+        log.info("Users can press 'Refresh' button to scan")
     
-    print("[wifi_portal] Ready to accept connections")
-    app.run(host=APP_HOST, port=APP_PORT, debug=False)
+    log.info("Ready to accept connections")
+    try:
+        from waitress import create_server
+    except ImportError:
+        log.warning("waitress not installed, using Flask's development server")
+        app.run(host=APP_HOST, port=APP_PORT, debug=False, threaded=True)
+    else:
+        server = create_server(app, host=APP_HOST, port=APP_PORT, threads=PORTAL_THREADS)
+        boot_timeline.mark("portal_listening")  # Socket is bound and listening here
+        server.run()